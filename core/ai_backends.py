@@ -0,0 +1,258 @@
+"""
+AI backends — Formal interface for AITrainerEngine's `vision_learner`.
+
+AITrainerEngine only needs two calls, described by `VisionBackend`:
+    understand_text(prompt, context="")             -> str | dict
+    understand_image(image_b64, prompt, context="") -> str | dict
+
+Shipped implementations:
+  - LocalRuleBackend: offline and deterministic. Parses the DOM outline
+    built by core.ai_context and, for selector healing, ranks the
+    outlined elements against the tokens of the element description
+    (text > css > class, tag hints, unique css preferred).
+    Same prompt → same answer, no network.
+  - RecordReplayBackend: wraps another backend and stores every response
+    on disk keyed by a hash of (method, context, prompt, image); in replay
+    mode answers come from the recordings only, optionally re-playing the
+    recorded latency, so the heal pipeline can be benchmarked and
+    regression-tested offline.
+
+build_backend(config) picks one from config.yaml (default none: the
+trainer keeps whatever real backend it was given, or none at all):
+    ai:
+      backend: none             # none | local | record | replay
+      recordings_dir: data/ai_recordings
+      replay_latency: false
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import collections
+from typing import Optional, Protocol, Union, runtime_checkable
+
+from core.config_paths import ROOT_DIR
+
+DEFAULT_RECORDINGS_DIR = os.path.join(str(ROOT_DIR), "data", "ai_recordings")
+
+_DOM_BLOCK_RE = re.compile(r"--- DOM Snapshot ---\n(.*?)\n--- End DOM ---", re.S)
+_OUTLINE_RE = re.compile(r'^\s*<([a-z0-9-]+)(#[^.\s>]+)?((?:\.[^\s.>]+)*)((?: [a-z-]+="[^"]*")*)>\s?(.*)$')
+_ATTR_RE = re.compile(r'([a-z-]+)="([^"]*)"')
+_HEAL_TARGET_RE = re.compile(r"The element it was looking for: (.*)")
+_HEAL_BROKEN_RE = re.compile(r"The CSS selector '(.*?)' no longer works")
+_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+_CAMEL_RE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+# Peso di una parola trovata per sorgente; dentro un token composto ("bet" → "betslip") vale meno
+_SOURCE_WEIGHTS = (("text", 1.0), ("css", 0.8), ("class", 0.6))
+_PARTIAL_MATCH = 0.6
+
+# Parole che non aiutano a distinguere un elemento
+_STOPWORDS = frozenset({"the", "and", "for", "con", "per", "del", "della", "dei", "che", "una", "uno",
+                        "pulsante", "button", "elemento", "element", "campo", "field", "link"})
+# Indizi sul tag nella descrizione dell'elemento
+_TAG_HINTS = {
+    "button": ("pulsante", "button", "bottone", "tasto"),
+    "input": ("campo", "input", "field", "casella", "importo", "stake"),
+    "a": ("link",),
+    "select": ("menu", "select", "tendina"),
+}
+
+ResponseT = Union[str, dict]
+
+
+def tokenize(value: str) -> list:
+    """Token minuscoli: separa camelCase, trattini, underscore e simboli CSS."""
+    if not value:
+        return []
+    return _TOKEN_RE.findall(_CAMEL_RE.sub(" ", value).lower())
+
+
+def _best_element(elements: list, words: list, tag_weights: dict) -> Optional[dict]:
+    """Elemento con il punteggio più alto (a parità, il primo in pagina); None se nessuna parola compare.
+
+    score = Σ parole trovate × peso sorgente + peso del tag + 1 / occorrenze della css in pagina
+    """
+    css_counts = collections.Counter(el["css"] for el in elements)
+    best, best_score = None, 0.0
+    for el in elements:
+        hits = 0.0
+        for source, weight in _SOURCE_WEIGHTS:
+            tokens = tokenize(el.get(source))
+            for word in words:
+                if word in tokens:
+                    hits += weight
+                elif any(word in token for token in tokens):
+                    hits += weight * _PARTIAL_MATCH
+        if not hits:
+            continue
+        score = hits + tag_weights.get(el["tag"], 0.0) + 1.0 / css_counts[el["css"]]
+        if score > best_score:
+            best, best_score = el, score
+    return best
+
+
+@runtime_checkable
+class VisionBackend(Protocol):
+    def understand_text(self, prompt: str, context: str = "") -> ResponseT: ...
+
+    def understand_image(self, image_b64: str, prompt: str = "", context: str = "") -> ResponseT: ...
+
+
+def parse_outline(prompt: str) -> list:
+    """Elementi {tag, css, text, class} dal blocco DOM (outline di core.ai_context) del prompt."""
+    m = _DOM_BLOCK_RE.search(prompt or "")
+    if not m:
+        return []
+    elements = []
+    for line in m.group(1).splitlines():
+        lm = _OUTLINE_RE.match(line)
+        if not lm:
+            continue
+        tag, el_id, classes, attr_str, text = lm.groups()
+        attrs = dict(_ATTR_RE.findall(attr_str or ""))
+        class_list = [c for c in (classes or "").split(".") if c]
+        if el_id:
+            css = el_id
+        elif attrs.get("name"):
+            css = f"{tag}[name='{attrs['name']}']"
+        elif class_list:
+            css = f"{tag}.{class_list[0]}"
+        elif attrs.get("aria-label"):
+            css = f"{tag}[aria-label='{attrs['aria-label']}']"
+        else:
+            continue
+        label = " ".join(attrs.get(k, "") for k in ("aria-label", "placeholder", "title", "value"))
+        elements.append({"tag": tag, "css": css, "text": f"{text} {label}".strip(), "class": " ".join(class_list)})
+    return elements
+
+
+class LocalRuleBackend:
+    """Backend offline deterministico basato su regole (nessuna rete, nessun modello)."""
+    name = "local"
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("LocalRuleBackend")
+
+    def understand_text(self, prompt: str, context: str = "") -> str:
+        elements = parse_outline(prompt)
+        if context == "selector-healing":
+            return self.suggest_selector(prompt, elements) or ""
+        if not elements:
+            return "[local] Nessun elemento interattivo nel contesto."
+        top = ", ".join(el["css"] for el in elements[:5])
+        return f"[local] {len(elements)} elementi interattivi. Principali: {top}"
+
+    def understand_image(self, image_b64: str, prompt: str = "", context: str = "") -> str:
+        # Nessuna analisi visiva offline: risposta dal solo testo (DOM) del prompt
+        return self.understand_text(prompt, context)
+
+    @staticmethod
+    def suggest_selector(prompt: str, elements: list) -> Optional[str]:
+        target = _HEAL_TARGET_RE.search(prompt or "")
+        broken = _HEAL_BROKEN_RE.search(prompt or "")
+        description = target.group(1) if target else ""
+        words = [w for w in tokenize(f"{description} {broken.group(1) if broken else ''}")
+                 if len(w) >= 3 and w not in _STOPWORDS]
+        if not elements or not words:
+            return None
+        desc_low = description.lower()
+        tag_weights = {tag: 1.0 for tag, hints in _TAG_HINTS.items() if any(h in desc_low for h in hints)}
+        best = _best_element(elements, list(dict.fromkeys(words)), tag_weights)
+        return best["css"] if best else None
+
+
+class RecordReplayBackend:
+    """Registra le risposte di un backend reale su disco e le riproduce offline."""
+    name = "record_replay"
+
+    def __init__(self, inner=None, directory=DEFAULT_RECORDINGS_DIR, mode="record",
+                 replay_latency=False, logger=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode non valido: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("mode=record richiede un backend da registrare")
+        self.inner = inner
+        self.directory = str(directory)
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.logger = logger or logging.getLogger("RecordReplayBackend")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(method: str, prompt: str, context: str, image_b64: str = "") -> str:
+        h = hashlib.sha256()
+        for part in (method, context or "", prompt or "", image_b64 or ""):
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _call(self, method, prompt, context, image_b64=""):
+        key = self.key(method, prompt, context, image_b64)
+        if self.mode == "replay":
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    rec = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                raise LookupError(f"Nessuna registrazione per {method}/{context} ({key})")
+            self.hits += 1
+            if self.replay_latency:
+                time.sleep(rec.get("latency_ms", 0) / 1000)
+            return rec["response"]
+
+        started = time.perf_counter()
+        if method == "image":
+            response = self.inner.understand_image(image_b64, prompt=prompt, context=context)
+        else:
+            response = self.inner.understand_text(prompt, context=context)
+        rec = {
+            "method": method,
+            "context": context,
+            "prompt_chars": len(prompt or ""),
+            "response": response,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "recorded_at": time.time(),
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump(rec, f, ensure_ascii=False, indent=2)
+        except (OSError, TypeError) as exc:
+            self.logger.warning(f"Registrazione AI non salvata: {exc}")
+        return response
+
+    def understand_text(self, prompt: str, context: str = "") -> ResponseT:
+        return self._call("text", prompt, context)
+
+    def understand_image(self, image_b64: str, prompt: str = "", context: str = "") -> ResponseT:
+        return self._call("image", prompt, context, image_b64)
+
+
+def build_backend(config, logger=None, inner=None) -> Optional[VisionBackend]:
+    """Backend da config.yaml (sezione `ai`). `inner` è il backend reale da registrare, se presente."""
+    conf = (config or {}).get("ai", {}) or {}
+    kind = (conf.get("backend") or "none").lower()
+    directory = conf.get("recordings_dir") or DEFAULT_RECORDINGS_DIR
+    if not os.path.isabs(directory):
+        directory = os.path.join(str(ROOT_DIR), directory)
+
+    if kind == "none":
+        return inner
+    if kind == "local":
+        return inner or LocalRuleBackend(logger)
+    if kind == "record":
+        # Senza un backend reale si registra quello locale (utile per fixture deterministiche)
+        return RecordReplayBackend(inner or LocalRuleBackend(logger), directory, "record", logger=logger)
+    if kind == "replay":
+        return RecordReplayBackend(None, directory, "replay",
+                                   replay_latency=bool(conf.get("replay_latency", False)), logger=logger)
+    if logger:
+        logger.warning(f"[AI] Backend sconosciuto '{kind}', nessun backend offline attivato")
+    return inner
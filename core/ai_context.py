@@ -0,0 +1,261 @@
+"""
+AI prompt context — DOM minifier, token budget and screenshot re-encoding.
+
+Used by AITrainerEngine to keep each LLM call small:
+  - minify_dom(): drops <head>, script/style/svg/noscript/template and
+    hidden nodes (hidden, aria-hidden, display:none, type=hidden) and
+    collapses the page into an indented outline of interactive elements
+    (links, buttons, inputs, selects, role=button, *btn* classes) with
+    their id/classes/name/labels and short text
+  - PromptContextBuilder.build(): splits a token budget between history
+    (rolling digest + newest turns first) and DOM outline; unused history
+    budget flows to the DOM, and cuts happen on line boundaries
+  - prepare_screenshot(): downscales and re-encodes the screenshot as JPEG
+    until it fits the byte target (Pillow); without Pillow an oversize
+    image is dropped rather than cut mid-string
+
+Token counts are estimates (~4 chars per token), good enough for budgeting.
+"""
+import io
+import re
+import base64
+import logging
+from html.parser import HTMLParser
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+CHARS_PER_TOKEN = 4
+
+SKIP_TAGS = frozenset({"head", "script", "style", "svg", "noscript", "template", "iframe", "canvas"})
+VOID_TAGS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                       "param", "source", "track", "wbr"})
+INTERACTIVE_TAGS = frozenset({"a", "button", "input", "select", "textarea", "label"})
+INTERACTIVE_ROLES = frozenset({"button", "link", "tab", "checkbox", "menuitem", "option", "textbox"})
+OUTLINE_ATTRS = ("name", "type", "role", "aria-label", "placeholder", "title", "href", "value")
+
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden")
+_WS = re.compile(r"\s+")
+_MAX_TEXT = 60
+_MAX_ATTR = 40
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def _is_hidden(tag, attrs) -> bool:
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    if tag == "input" and (attrs.get("type") or "").lower() == "hidden":
+        return True
+    return bool(_HIDDEN_STYLE.search(attrs.get("style") or ""))
+
+
+def _is_interactive(tag, attrs) -> bool:
+    return (tag in INTERACTIVE_TAGS
+            or (attrs.get("role") or "") in INTERACTIVE_ROLES
+            or "onclick" in attrs
+            or "btn" in (attrs.get("class") or ""))
+
+
+class _OutlineParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []          # [(tag, line index or None)]
+        self.skip_depth = None   # profondità dello stack in cui è iniziato un sottoalbero da scartare
+        self.lines = []          # [[indent, head, text]]
+
+    def _depth(self):
+        return sum(1 for _, idx in self.stack if idx is not None)
+
+    def handle_starttag(self, tag, attrs_list):
+        if self.skip_depth is not None:
+            if tag not in VOID_TAGS:
+                self.stack.append((tag, None))
+            return
+        attrs = {k: (v if v is not None else "") for k, v in attrs_list}
+        if tag in SKIP_TAGS or _is_hidden(tag, attrs):
+            if tag not in VOID_TAGS:
+                self.skip_depth = len(self.stack)
+                self.stack.append((tag, None))
+            return
+
+        idx = None
+        if _is_interactive(tag, attrs):
+            head = tag
+            if attrs.get("id"):
+                head += f"#{attrs['id']}"
+            classes = (attrs.get("class") or "").split()
+            if classes:
+                head += "." + ".".join(classes[:3])
+            extra = " ".join(f'{k}="{attrs[k][:_MAX_ATTR]}"' for k in OUTLINE_ATTRS if attrs.get(k))
+            if extra:
+                head += " " + extra
+            idx = len(self.lines)
+            self.lines.append([self._depth(), head, ""])
+
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, idx))
+
+    def handle_startendtag(self, tag, attrs_list):
+        self.handle_starttag(tag, attrs_list)
+        if tag not in VOID_TAGS and self.stack and self.stack[-1][0] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # HTML malformato: chiude fino al tag corrispondente, ignora end tag orfani
+        for pos in range(len(self.stack) - 1, -1, -1):
+            if self.stack[pos][0] == tag:
+                del self.stack[pos:]
+                if self.skip_depth is not None and pos <= self.skip_depth:
+                    self.skip_depth = None
+                return
+
+    def handle_data(self, data):
+        if self.skip_depth is not None:
+            return
+        text = _WS.sub(" ", data).strip()
+        if not text:
+            return
+        # Il testo va all'elemento interattivo più vicino
+        for _, idx in reversed(self.stack):
+            if idx is not None:
+                line = self.lines[idx]
+                if len(line[2]) < _MAX_TEXT:
+                    line[2] = (line[2] + " " + text).strip()[:_MAX_TEXT]
+                return
+
+
+def minify_dom(html: str) -> str:
+    """Outline indentato degli elementi interattivi visibili."""
+    if not html:
+        return ""
+    parser = _OutlineParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+    out = []
+    for depth, head, text in parser.lines:
+        line = "  " * min(depth, 8) + f"<{head}>"
+        if text:
+            line += f" {text}"
+        out.append(line)
+    return "\n".join(out)
+
+
+def _clip_lines(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens * CHARS_PER_TOKEN
+    cut = text.rfind("\n", 0, budget)
+    kept = text[:cut if cut > 0 else budget]
+    omitted = text.count("\n", len(kept)) + 1
+    return f"{kept}\n... [{omitted} righe omesse]"
+
+
+class PromptContextBuilder:
+    """Assembla il prompt testuale entro `max_tokens` (immagine esclusa, ha il suo tetto in byte)."""
+    DEFAULT_MAX_TOKENS = 6000
+    HISTORY_SHARE = 0.3
+    IMAGE_MAX_SIDE = 1280
+    IMAGE_MAX_BYTES = 250_000
+    JPEG_QUALITIES = (80, 65, 50, 35)
+
+    def __init__(self, max_tokens=None, history_share=None, image_max_side=None,
+                 image_max_bytes=None, logger=None):
+        self.max_tokens = int(max_tokens or self.DEFAULT_MAX_TOKENS)
+        self.history_share = float(history_share if history_share is not None else self.HISTORY_SHARE)
+        self.image_max_side = int(image_max_side or self.IMAGE_MAX_SIDE)
+        self.image_max_bytes = int(image_max_bytes or self.IMAGE_MAX_BYTES)
+        self.logger = logger or logging.getLogger("AIContext")
+        self.last = {}
+
+    def _history_block(self, history, max_tokens, digest=""):
+        """Digest delle conversazioni vecchie + turni più recenti che stanno nel budget."""
+        used = 0
+        digest_block = ""
+        if digest:
+            digest = _clip_lines(digest, max_tokens // 3)
+            digest_block = f"--- Conversation digest ---\n{digest}\n"
+            used = estimate_tokens(digest_block)
+        lines = []
+        for turn in reversed(list(history or [])):
+            line = f"{turn.get('role', '?')}: {turn.get('content', '')}"
+            # Stima per turno calcolata una volta sola quando il turno è memorizzato
+            cost = turn.get("tokens") or estimate_tokens(line)
+            cost += 2
+            if used + cost > max_tokens:
+                break
+            lines.append(line)
+            used += cost
+        if not lines and not digest_block:
+            return ""
+        lines.reverse()
+        return ("--- Previous conversation ---\n" + digest_block + "\n".join(lines)
+                + "\n--- End history ---\n")
+
+    def build(self, system_prompt, user_message, history=None, dom=None, minify=True, digest="") -> str:
+        fixed = [system_prompt, "", f"User: {user_message}"]
+        remaining = max(0, self.max_tokens - estimate_tokens("\n".join(fixed)))
+
+        dom_text = (minify_dom(dom) if minify else dom) if dom else ""
+        history_budget = int(remaining * self.history_share) if dom_text else remaining
+        history_block = self._history_block(history, history_budget, digest)
+        # Marcatori "--- DOM Snapshot ---" / "--- End DOM ---" inclusi nel conto
+        dom_budget = remaining - estimate_tokens(history_block) - 12
+
+        parts = [system_prompt, ""]
+        if history_block:
+            parts.append(history_block)
+        dom_block = ""
+        if dom_text and dom_budget > 0:
+            dom_block = _clip_lines(dom_text, dom_budget)
+            parts.append(f"--- DOM Snapshot ---\n{dom_block}\n--- End DOM ---\n")
+        parts.append(f"User: {user_message}")
+        prompt = "\n".join(parts)
+
+        self.last = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "history_tokens": estimate_tokens(history_block),
+            "dom_tokens": estimate_tokens(dom_block),
+            "dom_raw_chars": len(dom or ""),
+        }
+        return prompt
+
+    def prepare_screenshot(self, screenshot_b64):
+        """Ridimensiona/ricomprime a JPEG entro image_max_bytes. None se non è possibile farlo stare."""
+        if not screenshot_b64:
+            return None
+        if not PIL_AVAILABLE:
+            if len(screenshot_b64) * 3 // 4 <= self.image_max_bytes:
+                return screenshot_b64
+            self.logger.warning("[AIContext] Screenshot troppo grande e Pillow assente: immagine scartata")
+            return None
+        try:
+            img = Image.open(io.BytesIO(base64.b64decode(screenshot_b64)))
+            img.thumbnail((self.image_max_side, self.image_max_side))
+            img = img.convert("RGB")
+            data = b""
+            for quality in self.JPEG_QUALITIES:
+                buf = io.BytesIO()
+                img.save(buf, format="JPEG", quality=quality, optimize=True)
+                data = buf.getvalue()
+                if len(data) <= self.image_max_bytes:
+                    break
+                # Ultima qualità non basta: si riduce anche la risoluzione
+                if quality == self.JPEG_QUALITIES[-1]:
+                    img.thumbnail((img.width // 2, img.height // 2))
+                    buf = io.BytesIO()
+                    img.save(buf, format="JPEG", quality=quality, optimize=True)
+                    data = buf.getvalue()
+            self.last["image_bytes"] = len(data)
+            return base64.b64encode(data).decode("ascii")
+        except Exception as exc:
+            self.logger.warning(f"[AIContext] Screenshot non valido: {exc}")
+            return None
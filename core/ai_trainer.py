@@ -9,12 +9,24 @@ Features:
   - V4: train_step() full pipeline (Snapshot→Vision→LLM→Memory)
   - V4: heal_selector() self-healing protocol
   - V4: set_executor() for direct executor reference
+  - Prompt context budget: minified DOM outline, bounded history,
+    screenshots re-encoded to a size target (core.ai_context)
+  - heal_selector(): single-flight per (selector, DOM fingerprint) and a
+    persisted result cache validated by re-resolving before reuse
+  - Memory compaction: turns leaving the window are folded into a rolling
+    digest, long turns are kept by reference with a short inline excerpt
 """
+import os
 import json
 import time
+import threading
 from collections import deque
 from typing import Optional
 
+from core.ai_context import PromptContextBuilder, estimate_tokens
+from core.dom_fingerprint import compute_fingerprint
+from core.config_paths import HEAL_CACHE_FILE
+
 
 SYSTEM_PROMPT_UNIVERSAL = """You are SuperAgent, an AI assistant specialized in:
 - RPA automation on live betting platforms
@@ -30,10 +42,6 @@ Rules:
 4. Do not invent information — if unsure, say so
 """
 
-# Maximum screenshot payload size (500KB base64)
-MAX_SCREENSHOT_B64_SIZE = 500_000
-
-
 class AITrainerEngine:
     """AI engine with memory for multi-turn conversations and DOM/visual analysis.
 
@@ -50,14 +58,34 @@ class AITrainerEngine:
     """
 
     MAX_MEMORY = 10  # last N conversation turns
-    DOM_MAX_LENGTH = 20000  # max chars for DOM snapshot truncation
+    LONG_TURN_TOKENS = 200  # longer turns are stored by reference
+    EXCERPT_CHARS = 300  # inline excerpt kept for long turns
+    MAX_STORED_TURNS = 50  # full texts of long turns kept by reference
+    DIGEST_MAX_LINES = 30  # rolling digest of turns that left the window
+    DIGEST_LINE_CHARS = 120
+    CONTEXT_MAX_TOKENS = 6000  # text prompt budget (history + DOM outline)
+    HEAL_MAX_TOKENS = 4000  # prompt budget for selector healing (no history)
+    HEAL_WAIT_S = 90  # max wait for a follower on an in-flight heal
+    HEAL_CACHE_PER_SELECTOR = 5  # fingerprints remembered per broken selector
 
     def __init__(self, vision_learner=None, logger=None):
         self.vision = vision_learner
         self.logger = logger
-        self._memory: deque = deque(maxlen=self.MAX_MEMORY)
+        self._memory: deque = deque()
+        self._digest: deque = deque(maxlen=self.DIGEST_MAX_LINES)
+        self._turn_store: dict = {}
+        self._turn_seq = 0
         self._system_prompt = SYSTEM_PROMPT_UNIVERSAL
         self._executor = None  # V4: direct executor reference
+        self._context = PromptContextBuilder(max_tokens=self.CONTEXT_MAX_TOKENS, logger=logger)
+        self._heal_context = PromptContextBuilder(max_tokens=self.HEAL_MAX_TOKENS, logger=logger)
+        # Heal in volo per (selettore, fingerprint) e cache persistita {selettore: {fingerprint: {...}}}
+        self._heal_lock = threading.Lock()
+        # Serializza le scritture su disco (stesso file .tmp) senza tenere _heal_lock durante l'I/O
+        self._heal_save_lock = threading.Lock()
+        self._heal_inflight = {}
+        self._heal_cache_file = str(HEAL_CACHE_FILE)
+        self._heal_cache = self._load_heal_cache()
 
     # ------------------------------------------------------------------
     #  V4: Dependency injection
@@ -73,9 +101,40 @@ class AITrainerEngine:
         """Return current conversation memory as list."""
         return list(self._memory)
 
+    @property
+    def digest(self) -> str:
+        """Rolling digest of the turns that left the memory window."""
+        return "\n".join(self._digest)
+
+    def get_turn(self, ref: str) -> Optional[str]:
+        """Full text of a long turn stored by reference (None if evicted)."""
+        return self._turn_store.get(ref)
+
+    def _remember(self, role: str, content: str):
+        """Append a turn, compacting long content and folding evicted turns into the digest."""
+        content = content or ""
+        turn = {"role": role, "content": content, "ts": time.time()}
+        if estimate_tokens(content) > self.LONG_TURN_TOKENS:
+            self._turn_seq += 1
+            ref = f"t{self._turn_seq}"
+            self._turn_store[ref] = content
+            while len(self._turn_store) > self.MAX_STORED_TURNS:
+                self._turn_store.pop(next(iter(self._turn_store)))
+            turn["ref"] = ref
+            turn["content"] = f"{content[:self.EXCERPT_CHARS].rstrip()}… [ref:{ref}, {len(content)} chars]"
+        turn["tokens"] = estimate_tokens(f"{role}: {turn['content']}")
+        self._memory.append(turn)
+
+        while len(self._memory) > self.MAX_MEMORY:
+            old = self._memory.popleft()
+            line = " ".join(old["content"].split())[:self.DIGEST_LINE_CHARS]
+            self._digest.append(f"{old['role']}: {line}")
+
     def clear_memory(self):
         """Reset conversation memory."""
         self._memory.clear()
+        self._digest.clear()
+        self._turn_store.clear()
         if self.logger:
             self.logger.info("[AITrainer] Memory cleared")
 
@@ -89,38 +148,18 @@ class AITrainerEngine:
         if not self.vision:
             return "AI not available (VisionLearner not initialized)"
 
-        # Build context from memory
-        context_parts = [self._system_prompt, ""]
-
-        # Add conversation history
-        if self._memory:
-            context_parts.append("--- Previous conversation ---")
-            for turn in self._memory:
-                role = turn.get("role", "?")
-                content = turn.get("content", "")
-                context_parts.append(f"{role}: {content}")
-            context_parts.append("--- End history ---\n")
-
-        # Add DOM snapshot if provided
-        if dom_snapshot:
-            # Truncate if too long
-            if len(dom_snapshot) > self.DOM_MAX_LENGTH:
-                dom_snapshot = dom_snapshot[:self.DOM_MAX_LENGTH] + "\n... [TRUNCATED]"
-            context_parts.append(f"--- DOM Snapshot ---\n{dom_snapshot}\n--- End DOM ---\n")
-
-        # Add screenshot description if provided (with size cap)
-        if screenshot_b64:
-            if len(screenshot_b64) > MAX_SCREENSHOT_B64_SIZE:
-                screenshot_b64 = screenshot_b64[:MAX_SCREENSHOT_B64_SIZE]
-                if self.logger:
-                    self.logger.warning(f"[AITrainer] Screenshot truncated to {MAX_SCREENSHOT_B64_SIZE} chars")
-            context_parts.append("[Screenshot attached for visual analysis]")
+        # Build context within the token budget: newest history first, DOM as outline
+        full_context = self._context.build(
+            self._system_prompt, user_message,
+            history=self._memory, dom=dom_snapshot, digest=self.digest
+        )
 
-        context_parts.append(f"User: {user_message}")
-        full_context = "\n".join(context_parts)
+        # Screenshot downscaled/re-encoded to the size target (never cut mid-string)
+        if screenshot_b64:
+            screenshot_b64 = self._context.prepare_screenshot(screenshot_b64)
 
         # Store user message in memory
-        self._memory.append({"role": "User", "content": user_message, "ts": time.time()})
+        self._remember("User", user_message)
 
         try:
             # Use vision learner for the query
@@ -147,7 +186,7 @@ class AITrainerEngine:
                 response_text = str(result) if result else "No response from AI."
 
             # Store AI response in memory
-            self._memory.append({"role": "AI", "content": response_text, "ts": time.time()})
+            self._remember("AI", response_text)
 
             return response_text
 
@@ -155,7 +194,7 @@ class AITrainerEngine:
             error_msg = f"AI Error: {e}"
             if self.logger:
                 self.logger.error(f"[AITrainer] {error_msg}")
-            self._memory.append({"role": "AI", "content": error_msg, "ts": time.time()})
+            self._remember("AI", error_msg)
             return error_msg
 
     def analyze_dom(self, dom_snapshot: str, question: str = "Analyze the DOM and suggest selectors for interactive elements.") -> str:
@@ -230,8 +269,114 @@ class AITrainerEngine:
         a description of what it should match, analyze the current DOM
         and return a new working selector.
 
+        A cached result that still resolves on the page is returned without
+        calling the AI. Concurrent callers healing the same selector on the
+        same page structure share a single in-flight request.
+
         Returns the new CSS selector string, or None if healing failed.
         """
+        if not self._executor:
+            if self.logger:
+                self.logger.warning("[AITrainer] heal_selector: no executor")
+            return None
+
+        page = getattr(self._executor, "page", None)
+        fingerprint = (compute_fingerprint(page, logger=self.logger) if page else None) or ""
+
+        cached = self._cached_heal(broken_selector, fingerprint)
+        if cached:
+            if self.logger:
+                self.logger.info(f"[AITrainer] Heal cache hit: {broken_selector} -> {cached}")
+            return cached
+
+        key = (broken_selector, fingerprint)
+        with self._heal_lock:
+            flight = self._heal_inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._heal_inflight[key] = {"done": threading.Event(), "result": None}
+
+        if not leader:
+            if self.logger:
+                self.logger.info(f"[AITrainer] Heal already in flight, waiting: {broken_selector}")
+            flight["done"].wait(self.HEAL_WAIT_S)
+            return flight["result"]
+
+        result = None
+        try:
+            result = self._heal_uncached(broken_selector, element_description)
+            if result and self._selector_resolves(result):
+                self._store_heal(broken_selector, fingerprint, result)
+        finally:
+            flight["result"] = result
+            with self._heal_lock:
+                self._heal_inflight.pop(key, None)
+            flight["done"].set()
+        return result
+
+    # ------------------------------------------------------------------
+    #  Heal cache
+    # ------------------------------------------------------------------
+    def _load_heal_cache(self) -> dict:
+        try:
+            with open(self._heal_cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_heal_cache(self):
+        # Copia a due livelli sotto lock: le voci {selector, ts} vengono sostituite, mai modificate
+        with self._heal_lock:
+            snapshot = {broken: dict(entries) for broken, entries in self._heal_cache.items()}
+        try:
+            with self._heal_save_lock:
+                os.makedirs(os.path.dirname(self._heal_cache_file), exist_ok=True)
+                tmp = self._heal_cache_file + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, indent=2)
+                os.replace(tmp, self._heal_cache_file)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"[AITrainer] Heal cache save failed: {e}")
+
+    def _selector_resolves(self, selector: str) -> bool:
+        page = getattr(self._executor, "page", None)
+        if not page:
+            return False
+        try:
+            return page.locator(selector).count() > 0
+        except Exception:
+            return False
+
+    def _cached_heal(self, broken_selector: str, fingerprint: str) -> Optional[str]:
+        """Selettore in cache che risolve ancora: prima quello del fingerprint attuale, poi i più recenti."""
+        with self._heal_lock:
+            entries = dict(self._heal_cache.get(broken_selector, {}))
+        if not entries:
+            return None
+        order = sorted(entries, key=lambda fp: (fp != fingerprint, -entries[fp].get("ts", 0)))
+        for fp in order:
+            selector = entries[fp].get("selector")
+            if selector and self._selector_resolves(selector):
+                return selector
+            if fp == fingerprint:
+                # Non risolve più sulla stessa struttura: voce obsoleta
+                with self._heal_lock:
+                    self._heal_cache.get(broken_selector, {}).pop(fp, None)
+                self._save_heal_cache()
+        return None
+
+    def _store_heal(self, broken_selector: str, fingerprint: str, selector: str):
+        with self._heal_lock:
+            entries = self._heal_cache.setdefault(broken_selector, {})
+            entries[fingerprint] = {"selector": selector, "ts": time.time()}
+            while len(entries) > self.HEAL_CACHE_PER_SELECTOR:
+                entries.pop(min(entries, key=lambda fp: entries[fp].get("ts", 0)))
+        self._save_heal_cache()
+
+    def _heal_uncached(self, broken_selector: str, element_description: str) -> Optional[str]:
+        """Heal via AI (DOM + screenshot → LLM), senza cache."""
         if not self._executor:
             if self.logger:
                 self.logger.warning("[AITrainer] heal_selector: no executor")
@@ -271,16 +416,18 @@ class AITrainerEngine:
         )
 
         try:
+            full_prompt = self._heal_context.build(self._system_prompt, prompt, dom=dom)
+            screenshot = self._heal_context.prepare_screenshot(screenshot)
             # Try with screenshot first
             if screenshot:
                 result = self.vision.understand_image(
                     screenshot,
-                    prompt=f"{self._system_prompt}\n\nDOM:\n{dom[:self.DOM_MAX_LENGTH // 2]}\n\n{prompt}",
+                    prompt=full_prompt,
                     context="selector-healing"
                 )
             else:
                 result = self.vision.understand_text(
-                    f"{self._system_prompt}\n\nDOM:\n{dom[:self.DOM_MAX_LENGTH]}\n\n{prompt}",
+                    full_prompt,
                     context="selector-healing"
                 )
 
@@ -133,6 +133,10 @@ class SessionGuardian:
 
     def _do_recovery(self):
         """Delegates the recovery process to the executor."""
+        lifecycle = getattr(self.executor, "lifecycle", None)
+        if lifecycle and lifecycle.is_busy():
+            self.logger.warning("Recovery postponed: agent is navigating/betting.")
+            return
         self.logger.warning("Automatic recovery in progress...")
         try:
             if hasattr(self.executor, "recover_session"):
@@ -8,6 +8,45 @@ from core.config_paths import CONFIG_DIR
 # Nessun import di classi Core qui (es. DomExecutor)
 # Riceve 'executor' come oggetto generico nel costruttore
 
+INTERACTIVE_TAGS = frozenset({"BUTTON", "INPUT", "A"})
+_VOLATILE_ID = re.compile(r'\d{5,}')
+
+# Estrazione in un solo passaggio in-page (shadow DOM incluso): attraversano
+# il confine CDP solo i candidati, con le stesse regole di _is_interactive/_css.
+EXTRACT_JS = r"""
+() => {
+    const out = [];
+    const volatile = /\d{5,}/;
+    const visit = root => {
+        for (const el of root.querySelectorAll('button, input, a, [class*="btn"]')) {
+            const tag = el.tagName.toLowerCase();
+            const id = el.getAttribute('id');
+            const name = el.getAttribute('name');
+            const cls = el.getAttribute('class');
+            let css = null;
+            if (id !== null && !volatile.test(id)) css = '#' + id;
+            else if (name !== null) css = `${tag}[name='${name}']`;
+            else {
+                const first = (cls || '').split(/\s+/).filter(Boolean)[0];
+                if (first) css = `${tag}.${first}`;
+            }
+            if (!css) continue;
+            out.push({
+                tag, css,
+                text: (el.getAttribute('aria-label') || '') + (el.getAttribute('value') || ''),
+                class: cls || ''
+            });
+        }
+        for (const host of root.querySelectorAll('*')) {
+            if (host.shadowRoot) visit(host.shadowRoot);
+        }
+    };
+    visit(document);
+    return out;
+}
+"""
+
+
 class AutoMapperWorker(QObject):
     finished = Signal(dict)
     log = Signal(str)
@@ -18,7 +57,6 @@ class AutoMapperWorker(QObject):
         self.url = url
 
     def run(self):
-        cdp = None
         try:
             self.log.emit(f"🚀 AI Auto-Mapping: {self.url}")
 
@@ -42,17 +80,12 @@ class AutoMapperWorker(QObject):
 
             self._auto_scroll(page)
 
-            cdp = page.context.new_cdp_session(page)
-            cdp.send("DOM.enable")
-
             start_scan = time.time()
-            resp = cdp.send("DOM.getFlattenedDocument", {"depth": -1, "pierce": True})
-            
+            elements = self.scan_page(page)
+
             if time.time() - start_scan > 20:
                 self.log.emit("⚠️ CDP Scan lento")
 
-            nodes = resp.get("nodes", [])
-            elements = self._extract(nodes)
             selectors = self._ai_match(elements)
             self._save(selectors)
 
@@ -62,29 +95,53 @@ class AutoMapperWorker(QObject):
         except Exception as e:
             self.log.emit(f"❌ Mapper error: {e}")
             self.finished.emit({})
-        
+
+    def scan_page(self, page):
+        """Elementi interattivi della pagina: passaggio JS in-page, fallback CDP getFlattenedDocument."""
+        try:
+            elements = page.evaluate(EXTRACT_JS)
+            if isinstance(elements, list):
+                return elements
+        except Exception:
+            pass
+
+        cdp = page.context.new_cdp_session(page)
+        try:
+            cdp.send("DOM.enable")
+            resp = cdp.send("DOM.getFlattenedDocument", {"depth": -1, "pierce": True})
+            return self._extract(resp.get("nodes", []))
         finally:
-            if cdp:
-                try: cdp.detach()
-                except: pass
+            try: cdp.detach()
+            except: pass
 
-    def _auto_scroll(self, page):
-        for _ in range(5):
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(1)
+    def _auto_scroll(self, page, rounds=5, settle_ms=1000):
+        """Scrolla in fondo finché la pagina cresce (lazy load): si ferma appena l'altezza non cambia."""
+        for _ in range(rounds):
+            height = page.evaluate("() => { window.scrollTo(0, document.body.scrollHeight); return document.body.scrollHeight; }")
+            try:
+                page.wait_for_function("h => document.body.scrollHeight > h", arg=height, timeout=settle_ms)
+            except Exception:
+                break
 
     def _extract(self, nodes):
         found = []
         for n in nodes:
-            if self._is_interactive(n):
-                css = self._css(n)
-                if css:
-                    found.append({
-                        "tag": n.get("nodeName","").lower(),
-                        "css": css,
-                        "text": self._text(n),
-                        "class": self._attr(n,"class")
-                    })
+            tag = n.get("nodeName", "")
+            attrs = n.get("attributes")
+            # Scarto rapido: niente attributi e tag non interattivo → niente selettore possibile
+            if not attrs and tag not in INTERACTIVE_TAGS:
+                continue
+            a = dict(zip(attrs[::2], attrs[1::2])) if attrs else {}
+            if tag not in INTERACTIVE_TAGS and "btn" not in a.get("class", ""):
+                continue
+            css = self._css_from(tag.lower(), a)
+            if css:
+                found.append({
+                    "tag": tag.lower(),
+                    "css": css,
+                    "text": a.get("aria-label", "") + a.get("value", ""),
+                    "class": a.get("class", "")
+                })
         return found
 
     def _ai_match(self, elements):
@@ -115,10 +172,11 @@ class AutoMapperWorker(QObject):
     def _attr(self, n, k): return self._attrs(n).get(k, "")
     def _text(self, n): a=self._attrs(n); return a.get("aria-label","")+a.get("value","")
     def _is_interactive(self, n): 
-        tag=n.get("nodeName","").upper()
-        return tag in ["BUTTON","INPUT","A"] or "btn" in self._attr(n,"class")
-    def _css(self, n):
-        a=self._attrs(n); tag=n.get("nodeName","").lower()
-        if "id" in a and not re.search(r'\d{5,}', a["id"]): return f"#{a['id']}"
+        return n.get("nodeName","").upper() in INTERACTIVE_TAGS or "btn" in self._attr(n,"class")
+    def _css(self, n): return self._css_from(n.get("nodeName","").lower(), self._attrs(n))
+
+    @staticmethod
+    def _css_from(tag, a):
+        if "id" in a and not _VOLATILE_ID.search(a["id"]): return f"#{a['id']}"
         if "name" in a: return f"{tag}[name='{a['name']}']"
-        return f"{tag}.{a['class'].split()[0]}" if "class" in a else None
\ No newline at end of file
+        return f"{tag}.{a['class'].split()[0]}" if a.get("class", "").split() else None
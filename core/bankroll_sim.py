@@ -0,0 +1,181 @@
+"""
+Bankroll simulator — Monte Carlo risk estimate for a staking rule.
+
+    sim = BankrollSimulator.from_money_manager(money_manager, robot=robot_cfg)
+    report = sim.run(JournalSource.from_db(db), n_paths=100_000, n_bets=500)
+    report["ruin_probability"], report["max_drawdown"]["p95"], report["curves"]
+
+Paths are generated by a source:
+  - JournalSource: bootstrap of settled bets (odds, won) from the journal,
+    optionally of one robot only
+  - SyntheticSource: odds uniform in a range, win probability (1 + edge) / odds
+
+Each path is staked with the same strategy objects MoneyManager uses
+(core.staking), vectorized across paths; statistics are aggregated step by
+step (running peak, drawdown, ruin, bankroll at checkpoints) so memory stays
+O(paths x checkpoints) instead of O(paths x bets). Paths are processed in
+chunks with independent seeds (SeedSequence.spawn), so results are the same
+whether chunks run in-process or on a process pool (`processes` > 1).
+"""
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from core.staking import NUMPY_AVAILABLE, StakingStrategy, iter_steps, strategy_from_config
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class SyntheticSource:
+    """Quote uniformi in [odds_low, odds_high], probabilità di vincita (1 + edge) / quota."""
+
+    def __init__(self, odds_low=1.5, odds_high=2.5, edge=0.0):
+        if odds_low <= 1.0 or odds_high < odds_low:
+            raise ValueError(f"Intervallo quote non valido: {odds_low}-{odds_high}")
+        self.odds_low = float(odds_low)
+        self.odds_high = float(odds_high)
+        self.edge = float(edge)
+
+    def sample(self, rng, n_paths, n_bets):
+        odds = rng.uniform(self.odds_low, self.odds_high, (n_paths, n_bets))
+        won = rng.random((n_paths, n_bets)) < np.minimum(1.0, (1.0 + self.edge) / odds)
+        return odds, won
+
+
+class JournalSource:
+    """Bootstrap delle scommesse refertate: ogni passo estrae una coppia (quota, esito) reale."""
+
+    def __init__(self, odds, won):
+        self.odds = np.asarray(odds, dtype=float)
+        self.won = np.asarray(won, dtype=bool)
+        if not len(self.odds) or self.odds.shape != self.won.shape:
+            raise ValueError("Storico vuoto o incoerente: nessuna scommessa da ricampionare")
+
+    @classmethod
+    def from_db(cls, db, robot=None):
+        """Scommesse SETTLED con quota nota (colonna odds del journal)."""
+        rows = [r for r in db.history(robot=robot) if r.get("odds")]
+        if not rows:
+            raise ValueError(f"Nessuna scommessa refertata con quota nel journal{f' per {robot}' if robot else ''}")
+        return cls([r["odds"] for r in rows], [(r.get("payout") or 0) > 0 for r in rows])
+
+    def sample(self, rng, n_paths, n_bets):
+        idx = rng.integers(0, len(self.odds), (n_paths, n_bets))
+        return self.odds[idx], self.won[idx]
+
+    def stats(self):
+        return {"bets": int(len(self.odds)), "win_rate": round(float(self.won.mean()), 4),
+                "avg_odds": round(float(self.odds.mean()), 3),
+                "roi_flat": round(float((self.won * self.odds).mean() - 1.0), 4)}
+
+
+def _run_chunk(strategy, source, bankroll, ruin_level, n_paths, n_bets, checkpoints, seed):
+    """Un blocco di percorsi: ritorna solo gli aggregati per percorso (eseguibile in un altro processo)."""
+    rng = np.random.default_rng(seed)
+    odds, won = source.sample(rng, n_paths, n_bets)
+    marks = {int(c): j for j, c in enumerate(checkpoints)}
+    at = np.empty((n_paths, len(checkpoints)), dtype=np.float32)
+    if 0 in marks:
+        at[:, marks[0]] = bankroll
+    peak = np.full(n_paths, float(bankroll))
+    max_dd = np.zeros(n_paths)
+    ruined = np.zeros(n_paths, dtype=bool)
+    turnover = np.zeros(n_paths)
+    br = peak.copy()
+    for i, br, stake in iter_steps(strategy, odds, won, bankroll, stop_below=ruin_level):
+        np.maximum(peak, br, out=peak)
+        np.maximum(max_dd, (peak - br) / peak, out=max_dd)
+        ruined |= br < ruin_level
+        turnover += stake
+        j = marks.get(i + 1)
+        if j is not None:
+            at[:, j] = br
+    return {"at": at, "final": np.asarray(br, dtype=float), "max_dd": max_dd,
+            "ruined": ruined, "turnover": turnover}
+
+
+class BankrollSimulator:
+    DEFAULT_CHUNK = 20_000
+    DEFAULT_CHECKPOINTS = 50
+
+    def __init__(self, strategy: StakingStrategy, bankroll=1000.0, ruin_level=None,
+                 chunk_size=None, checkpoints=None, seed=None, logger=None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("NumPy non installato: simulazione non disponibile")
+        self.strategy = strategy
+        self.bankroll = float(bankroll)
+        # Rovina: bankroll sotto l'1% di quello iniziale (o soglia esplicita in euro)
+        self.ruin_level = float(ruin_level) if ruin_level is not None else self.bankroll * 0.01
+        self.chunk_size = int(chunk_size or self.DEFAULT_CHUNK)
+        self.checkpoints = int(checkpoints or self.DEFAULT_CHECKPOINTS)
+        self.seed = seed
+        self.logger = logger or logging.getLogger("BankrollSim")
+
+    @classmethod
+    def from_money_manager(cls, money_manager, robot=None, **kwargs):
+        """Stessa strategia e stesso bankroll che userebbe MoneyManager.get_stake."""
+        kwargs.setdefault("bankroll", money_manager.bankroll())
+        return cls(money_manager.strategy_for(robot), **kwargs)
+
+    @classmethod
+    def from_robot(cls, robot, **kwargs):
+        return cls(strategy_from_config(robot), **kwargs)
+
+    def _checkpoint_steps(self, n_bets):
+        return np.unique(np.linspace(0, n_bets, min(self.checkpoints, n_bets) + 1).astype(int))
+
+    def run(self, source, n_paths=100_000, n_bets=500, processes=1, percentiles=DEFAULT_PERCENTILES) -> dict:
+        started = time.perf_counter()
+        steps = self._checkpoint_steps(n_bets)
+        sizes = [min(self.chunk_size, n_paths - off) for off in range(0, n_paths, self.chunk_size)]
+        seeds = np.random.SeedSequence(self.seed).spawn(len(sizes))
+        jobs = [(self.strategy, source, self.bankroll, self.ruin_level, size, n_bets, steps, seed)
+                for size, seed in zip(sizes, seeds)]
+
+        # processes=None/0: tutti i core
+        processes = min(int(processes or os.cpu_count() or 1), len(jobs))
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                chunks = list(pool.map(_run_chunk, *zip(*jobs)))
+        else:
+            chunks = [_run_chunk(*job) for job in jobs]
+
+        at = np.concatenate([c["at"] for c in chunks])
+        final = np.concatenate([c["final"] for c in chunks])
+        max_dd = np.concatenate([c["max_dd"] for c in chunks])
+        ruined = np.concatenate([c["ruined"] for c in chunks])
+        turnover = np.concatenate([c["turnover"] for c in chunks])
+
+        pct = np.percentile(at, percentiles, axis=0)
+        report = {
+            "strategy": self.strategy.config(),
+            "paths": int(n_paths),
+            "bets": int(n_bets),
+            "bankroll": self.bankroll,
+            "ruin_level": self.ruin_level,
+            "ruin_probability": round(float(ruined.mean()), 5),
+            "prob_profit": round(float((final > self.bankroll).mean()), 5),
+            "final": self._dist(final, 2),
+            "max_drawdown": self._dist(max_dd, 4),
+            "avg_turnover": round(float(turnover.mean()), 2),
+            "curves": {"steps": steps.tolist(),
+                       **{f"p{p}": np.round(pct[k], 2).tolist() for k, p in enumerate(percentiles)}},
+            "processes": processes,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        self.logger.info(
+            f"🎲 Monte Carlo {self.strategy.name}: {n_paths} percorsi x {n_bets} bet in {report['seconds']}s | "
+            f"rovina {report['ruin_probability']:.2%} | max DD p95 {report['max_drawdown']['p95']:.1%}"
+        )
+        return report
+
+    @staticmethod
+    def _dist(values, digits):
+        p5, p50, p95, p99 = np.percentile(values, (5, 50, 95, 99))
+        return {"mean": round(float(values.mean()), digits), "p5": round(float(p5), digits),
+                "p50": round(float(p50), digits), "p95": round(float(p95), digits),
+                "p99": round(float(p99), digits)}
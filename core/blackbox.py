@@ -0,0 +1,173 @@
+"""
+BlackboxRecorder — Crash evidence writer running off the Playwright thread.
+
+The executor only captures the minimum on its own thread (viewport JPEG
+bytes + DOM string + metadata) and hands it over with `submit()`, which
+never blocks. A daemon writer thread then:
+  - compresses the dump (zstd if `zstandard` is installed, gzip otherwise)
+  - writes logs/blackbox_<tx>.json.zst|.json.gz and logs/blackbox_<tx>.jpg
+  - maintains logs/blackbox_index.json
+  - applies count- and size-based retention to the blackbox_* files
+"""
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import logging
+import threading
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+INDEX_FILE = "blackbox_index.json"
+_TX_RE = re.compile(r"^blackbox_(.+?)\.(json(?:\.gz|\.zst)?|png|jpg)$")
+
+
+class BlackboxRecorder:
+    DEFAULT_MAX_FILES = 200          # dump (tx) conservati
+    DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+    QUEUE_SIZE = 32
+
+    def __init__(self, directory="logs", max_files=None, max_bytes=None, logger=None):
+        self.logger = logger or logging.getLogger("Blackbox")
+        self.directory = str(directory)
+        self.max_files = int(max_files or self.DEFAULT_MAX_FILES)
+        self.max_bytes = int(max_bytes or self.DEFAULT_MAX_BYTES)
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    #  Producer side (Playwright thread)
+    # ------------------------------------------------------------------
+    def submit(self, tx, meta, html="", screenshot=None) -> bool:
+        """Accoda un dump senza bloccare. Ritorna False se la coda è piena (dump scartato)."""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((tx, meta, html or "", screenshot, time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.logger.warning(f"⚠️ Coda blackbox piena: dump {tx} scartato")
+            return False
+
+    def flush(self, timeout=10.0) -> bool:
+        """Attende che la coda sia svuotata (utile in shutdown/test)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="Blackbox_Writer")
+            self._thread.start()
+
+    # ------------------------------------------------------------------
+    #  Writer side
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(*item)
+            except Exception as exc:
+                self.logger.error(f"Errore scrittura blackbox: {exc}")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _compress(raw: bytes):
+        if ZSTD_AVAILABLE:
+            return zstandard.ZstdCompressor(level=6).compress(raw), ".json.zst"
+        return gzip.compress(raw, compresslevel=6), ".json.gz"
+
+    def _write(self, tx, meta, html, screenshot, ts):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+
+        dump = dict(meta)
+        dump["tx_id"] = tx
+        dump["timestamp"] = ts
+        dump["html"] = html
+        blob, ext = self._compress(json.dumps(dump, ensure_ascii=False).encode("utf-8"))
+        dump_path = os.path.join(self.directory, f"blackbox_{tx}{ext}")
+        with open(dump_path, "wb") as f:
+            f.write(blob)
+        files.append(os.path.basename(dump_path))
+
+        if screenshot:
+            shot_path = os.path.join(self.directory, f"blackbox_{tx}.jpg")
+            with open(shot_path, "wb") as f:
+                f.write(screenshot)
+            files.append(os.path.basename(shot_path))
+
+        self.written += 1
+        self._update_index(tx, ts, meta.get("error", ""), files)
+        self.logger.critical(f"📦 BLACKBOX COMPLETA SALVATA: {dump_path}")
+
+    def _scan(self) -> dict:
+        """Ricostruisce {tx: {files, bytes, ts}} dai file blackbox_* su disco (inclusi i vecchi formati)."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            m = _TX_RE.match(name)
+            if not m or name == INDEX_FILE:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            e = entries.setdefault(m.group(1), {"files": [], "bytes": 0, "ts": st.st_mtime})
+            e["files"].append(name)
+            e["bytes"] += st.st_size
+            e["ts"] = min(e["ts"], st.st_mtime)
+        return entries
+
+    def _update_index(self, tx, ts, error, files):
+        on_disk = self._scan()
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        known = {}
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                known = {e["tx"]: e for e in json.load(f)}
+        except Exception:
+            known = {}
+        known[tx] = {"tx": tx, "ts": ts, "error": str(error)[:300]}
+
+        # Retention: dal più vecchio finché si superano numero o dimensione totale
+        ordered = sorted(on_disk.items(), key=lambda kv: known.get(kv[0], {}).get("ts", kv[1]["ts"]))
+        total = sum(e["bytes"] for _, e in ordered)
+        while ordered and (len(ordered) > self.max_files or total > self.max_bytes):
+            if ordered[0][0] == tx:
+                break
+            old_tx, old = ordered.pop(0)
+            for name in old["files"]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            total -= old["bytes"]
+            known.pop(old_tx, None)
+
+        index = []
+        for t, e in ordered:
+            row = dict(known.get(t, {"tx": t, "ts": e["ts"], "error": ""}))
+            row["files"] = sorted(e["files"])
+            row["bytes"] = e["bytes"]
+            index.append(row)
+        tmp = index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, index_path)
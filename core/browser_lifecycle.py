@@ -0,0 +1,216 @@
+"""
+BrowserLifecycleManager — Memory sampling and trend-based recycle scheduling.
+
+Single owner of the "when do we recycle the browser" decision, replacing the
+reactive RAM checks that used to live in place_bet and SystemWatchdog:
+  - samples own-process RSS and Chrome children RSS on a daemon thread
+  - fits a least-squares trend (MB/s) over the recent window
+  - when the limit is projected within STANDBY_HORIZON_S, asks the executor
+    to prepare the warm standby context
+  - when it is projected within RECYCLE_HORIZON_S (or already exceeded),
+    schedules a recycle as a housekeeping task on the Playwright worker,
+    so it runs in the next idle window between bets, never in the middle
+
+While the agent is busy a scheduled recycle is skipped (and retried on the
+next sample). Busy means the `busy` callable returns True (e.g. the
+ExecutionEngine in-flight flag) or a given StateManager is NAVIGATING or
+BETTING.
+
+The sampled series is kept in memory for dashboards via `series()`.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from core.state_machine import AgentState
+
+BUSY_STATES = (AgentState.NAVIGATING, AgentState.BETTING)
+
+
+class BrowserLifecycleManager:
+    SAMPLE_INTERVAL_S = 15
+    MAX_SAMPLES = 240               # 1h di storico a 15s
+    TREND_SAMPLES = 20              # finestra per la regressione
+    LIMIT_MB = 1500                 # processo + figli Chrome
+    STANDBY_HORIZON_S = 900
+    RECYCLE_HORIZON_S = 300
+
+    def __init__(self, executor, schedule=None, state_manager=None, busy=None, limit_mb=None,
+                 interval_s=None, logger=None):
+        self.logger = logger or logging.getLogger("BrowserLifecycle")
+        self.executor = executor
+        # Callable che esegue fn sul thread Playwright (es. Controller._defer_housekeeping)
+        self.schedule = schedule
+        self.state_manager = state_manager
+        # Callable → bool: True mentre un segnale è in lavorazione (es. ExecutionEngine.in_flight)
+        self.busy = busy
+        self.limit_mb = float(limit_mb or self.LIMIT_MB)
+        self.interval_s = float(interval_s or self.SAMPLE_INTERVAL_S)
+
+        self._samples = deque(maxlen=self.MAX_SAMPLES)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._recycle_pending = False
+        self.recycles = 0
+        self.deferred = 0
+
+    # ------------------------------------------------------------------
+    #  Thread
+    # ------------------------------------------------------------------
+    def start(self):
+        if not PSUTIL_AVAILABLE:
+            self.logger.warning("psutil non installato — lifecycle browser disattivato")
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="BrowserLifecycle")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.sample()
+                self.evaluate()
+            except Exception as exc:
+                self.logger.warning(f"[Lifecycle] Sample failed: {exc}")
+
+    # ------------------------------------------------------------------
+    #  Sampling & trend
+    # ------------------------------------------------------------------
+    def sample(self, now=None):
+        """Legge RSS del processo e dei figli Chrome (MB) e lo accoda alla serie."""
+        proc = psutil.Process(os.getpid())
+        process_mb = proc.memory_info().rss / (1024 * 1024)
+        browser = 0
+        for child in proc.children(recursive=True):
+            try:
+                if "chrome" in child.name().lower():
+                    browser += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        point = (now if now is not None else time.time(), process_mb, browser / (1024 * 1024))
+        with self._lock:
+            self._samples.append(point)
+        return point
+
+    def add_sample(self, ts, process_mb, browser_mb):
+        """Inserisce un campione esterno (test, replay di serie salvate)."""
+        with self._lock:
+            self._samples.append((ts, float(process_mb), float(browser_mb)))
+
+    def trend(self):
+        """Pendenza (MB/s) del totale sugli ultimi TREND_SAMPLES campioni, None se troppo pochi."""
+        with self._lock:
+            pts = list(self._samples)[-self.TREND_SAMPLES:]
+        if len(pts) < 3:
+            return None
+        xs = [p[0] for p in pts]
+        ys = [p[1] + p[2] for p in pts]
+        mx = sum(xs) / len(xs)
+        my = sum(ys) / len(ys)
+        den = sum((x - mx) ** 2 for x in xs)
+        if den == 0:
+            return None
+        return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / den
+
+    def eta_to_limit(self):
+        """Secondi stimati al raggiungimento di limit_mb (0 se già oltre, None se non in crescita)."""
+        with self._lock:
+            if not self._samples:
+                return None
+            _, p, b = self._samples[-1]
+        total = p + b
+        if total >= self.limit_mb:
+            return 0.0
+        slope = self.trend()
+        if not slope or slope <= 0:
+            return None
+        return (self.limit_mb - total) / slope
+
+    # ------------------------------------------------------------------
+    #  Decisions
+    # ------------------------------------------------------------------
+    def is_busy(self) -> bool:
+        if self.busy and self.busy():
+            return True
+        sm = self.state_manager
+        return bool(sm and sm.is_state(*BUSY_STATES))
+
+    def evaluate(self):
+        """Decide se preparare lo standby o pianificare un recycle. Ritorna l'azione scelta."""
+        eta = self.eta_to_limit()
+        if eta is None:
+            return None
+        if eta <= self.RECYCLE_HORIZON_S:
+            self.schedule_recycle(eta)
+            return "recycle"
+        if eta <= self.STANDBY_HORIZON_S:
+            self._run(self.executor.request_standby)
+            return "standby"
+        return None
+
+    def schedule_recycle(self, eta=None):
+        if self._recycle_pending:
+            return
+        self._recycle_pending = True
+        self.logger.warning(
+            f"♻️ Recycle browser pianificato (limite {self.limit_mb:.0f}MB "
+            f"{'superato' if not eta else f'previsto tra {eta:.0f}s'})"
+        )
+        self._run(self.lifecycle_recycle)
+
+    def lifecycle_recycle(self):
+        """Eseguito sul thread Playwright nel primo momento libero tra un task e l'altro."""
+        self._recycle_pending = False
+        if self.is_busy():
+            self.deferred += 1
+            self.logger.info("♻️ Recycle rimandato: agente in navigazione/scommessa")
+            return False
+        ok = self.executor.recycle_browser()
+        if ok:
+            self.recycles += 1
+        return ok
+
+    def _run(self, fn):
+        if self.schedule:
+            self.schedule(fn)
+        else:
+            self.logger.debug(f"[Lifecycle] Nessuno scheduler: {fn.__name__} non eseguito")
+
+    # ------------------------------------------------------------------
+    #  Dashboard
+    # ------------------------------------------------------------------
+    def series(self, last_n=None) -> list:
+        with self._lock:
+            pts = list(self._samples)
+        if last_n:
+            pts = pts[-last_n:]
+        return [{"ts": t, "process_mb": round(p, 1), "browser_mb": round(b, 1), "total_mb": round(p + b, 1)}
+                for t, p, b in pts]
+
+    def stats(self) -> dict:
+        slope = self.trend()
+        eta = self.eta_to_limit()
+        last = self.series(1)
+        return {
+            "limit_mb": self.limit_mb,
+            "last": last[0] if last else None,
+            "trend_mb_per_min": round(slope * 60, 2) if slope is not None else None,
+            "eta_to_limit_s": round(eta, 1) if eta is not None else None,
+            "recycle_pending": self._recycle_pending,
+            "recycles": self.recycles,
+            "deferred": self.deferred,
+        }
@@ -26,6 +26,7 @@ HISTORY_FILE = CONFIG_DIR / "bet_history.json"
 MONEY_CONFIG_FILE = CONFIG_DIR / "money_config.json"
 ROSERPINA_STATE_FILE = CONFIG_DIR / "roserpina_real_state.json"
 ROBOTS_FILE = CONFIG_DIR / "my_robots.json"
+HEAL_CACHE_FILE = CONFIG_DIR / "heal_cache.json"
 
 # --- ASSETS ---
 CHROME_ICON = DATA_DIR / "chrome_icon.png"
@@ -8,14 +8,18 @@ from typing import Dict, Any
 from PySide6.QtCore import QObject, Signal
 
 from core.event_bus import bus
-from core.playwright_worker import PlaywrightWorker
+from core.playwright_worker import PlaywrightWorker, PRIORITY_LIVE, PRIORITY_SETTLEMENT, PRIORITY_HOUSEKEEPING
 from core.telegram_worker import TelegramWorker
 from core.execution_engine import ExecutionEngine
 from core.money_management import MoneyManager
+from core.staking import STAKING_KEYS
 from core.dom_executor_playwright import DomExecutorPlaywright
 from core.database import Database
 from core.config_loader import ConfigLoader
 from core.secure_storage import RobotManager
+from core.signal_dedup import SignalDeduplicator
+from core.resource_policy import ResourcePolicy
+from core.browser_lifecycle import BrowserLifecycleManager
 
 class SuperAgentController(QObject):
     log_message = Signal(str)
@@ -32,9 +36,33 @@ class SuperAgentController(QObject):
         self.db = Database()
         self.money_manager = MoneyManager(self.db)
         
-        self.worker = PlaywrightWorker(logger)
-        self.worker.executor = DomExecutorPlaywright(logger=logger, allow_place=allow_bets)
+        self.worker = PlaywrightWorker(logger, bus=bus)
+        self.worker.executor = DomExecutorPlaywright(
+            logger=logger, allow_place=allow_bets,
+            resource_policy=ResourcePolicy.from_config(self.config, logger)
+        )
+        # Lavori di manutenzione del browser (es. standby pre-caldo) in coda a priorità minima
+        self.worker.executor.defer = self._defer_housekeeping
         self.engine = ExecutionEngine(bus, self.worker.executor, logger)
+        # Unico punto di decisione per i recycle del browser (trend memoria, mai a metà bet)
+        self.lifecycle = BrowserLifecycleManager(
+            self.worker.executor,
+            schedule=self._defer_housekeeping,
+            busy=lambda: self.engine.in_flight,
+            limit_mb=self.config.get("rpa", {}).get("memory_limit_mb"),
+            logger=logger
+        )
+        self.worker.executor.lifecycle = self.lifecycle
+
+        # Filtro anti-duplicati: stesso tip da più chat o edit ravvicinati
+        dedup_conf = self.config.get("signals", {}) or {}
+        self.dedup = SignalDeduplicator(
+            window_s=dedup_conf.get("dedup_window_s"),
+            max_distance=dedup_conf.get("dedup_max_distance"),
+            logger=logger
+        )
+        # Oltre questa età un segnale live non vale più il click
+        self.live_signal_ttl = float(dedup_conf.get("live_ttl_s", 45))
 
         # Inizializza Telegram Worker ma non farlo partire
         self.telegram = TelegramWorker(self.config)
@@ -79,6 +107,8 @@ class SuperAgentController(QObject):
         if not getattr(self.worker, "running", False):
             self.worker.start()
 
+        self.lifecycle.start()
+
         if hasattr(self, "telegram") and self.telegram:
             if not getattr(self.telegram, "running", False):
                 self.telegram.start()
@@ -99,6 +129,12 @@ class SuperAgentController(QObject):
             self.telegram.stop()
             self.logger.info("Worker disconnesso. Nessun nuovo segnale verrà processato.")
 
+        # Niente più campionamenti né recycle pianificati a motore spento
+        self.lifecycle.stop()
+
+    def _defer_housekeeping(self, fn):
+        self.worker.submit(fn, priority=PRIORITY_HOUSEKEEPING, key=("housekeeping", fn.__name__))
+
     def _load_robots(self):
         return RobotManager().all()
 
@@ -140,7 +176,7 @@ class SuperAgentController(QObject):
         if not self.worker.running:
             self.logger.error("❌ Worker Playwright spento. Segnale droppato.")
             return False
-            
+
         robots = self._load_robots()
         if not robots:
             self.logger.warning("Nessun robot configurato nel Vault. Segnale droppato.")
@@ -153,12 +189,25 @@ class SuperAgentController(QObject):
                 continue
                 
             if self._match_robot(payload, r):
+                # Nella finestra di dedup entra solo un segnale che diventa una bet
+                if self.dedup.is_duplicate(payload, register=self.dedup.is_bet(payload)):
+                    return False
                 self.logger.info(f"🤖 Match Robot Triggered: {r.get('name')}")
                 
                 payload["is_active"] = True
                 payload["robot_name"] = r.get("name")
+                # Config staking del robot per MoneyManager.get_stake (strategia + stato per robot)
+                payload["robot"] = {k: r[k] for k in STAKING_KEYS if k in r}
+                payload["robot"]["name"] = r.get("name")
+                if r.get("max_stake"):
+                    # Limite del robot applicato dall'engine allo stake calcolato
+                    payload["max_stake"] = r.get("max_stake")
                 
-                self.worker.submit(self.engine.process_signal, payload, self.money_manager)
+                # Più segnali sulla stessa partita ancora in coda → resta solo il più recente
+                self.worker.submit(
+                    self.engine.process_signal, payload, self.money_manager,
+                    priority=PRIORITY_LIVE, ttl=self.live_signal_ttl, key=self.dedup.queue_key(payload)
+                )
                 matched = True
                 return True
 
@@ -206,7 +255,8 @@ class SuperAgentController(QObject):
                         self.logger.error(f"Errore lettura referti bookmaker: {e}")
                 
                 if getattr(self, "is_running", False) and getattr(self.worker, "running", False):
-                    self.worker.submit(check_job)
+                    # Il prossimo giro del watchdog ri-accoda comunque il controllo
+                    self.worker.submit(check_job, priority=PRIORITY_SETTLEMENT, ttl=120)
                 
             except Exception as e:
                 self.logger.error(f"Errore Loop Watchdog PENDING: {e}")
\ No newline at end of file
@@ -1,9 +1,11 @@
 import sqlite3
 import os
+import json
 import time
 import logging
 import threading
 from pathlib import Path
+from core.tracing import traced
 
 DB_DIR = os.path.join(str(Path.home()), ".superagent_data")
 os.makedirs(DB_DIR, exist_ok=True)
@@ -47,7 +49,23 @@ class Database:
                 )
             """)
             self.conn.execute("INSERT OR IGNORE INTO balance (id, current_balance) VALUES (1, 1000.0)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS staking_state (
+                    robot TEXT PRIMARY KEY,
+                    state TEXT,
+                    updated INTEGER
+                )
+            """)
+            self._migrate_journal()
+
+    def _migrate_journal(self):
+        # DB creati prima dello staking per robot: aggiunge le colonne mancanti
+        cols = {row["name"] for row in self.conn.execute("PRAGMA table_info(journal)")}
+        for name, ddl in (("robot", "TEXT"), ("odds", "REAL")):
+            if name not in cols:
+                self.conn.execute(f"ALTER TABLE journal ADD COLUMN {name} {ddl}")
 
+    @traced("db.get_balance")
     def get_balance(self):
         with self._lock:
             cur = self.conn.execute("SELECT current_balance FROM balance WHERE id = 1")
@@ -57,6 +75,7 @@ class Database:
                 return float(row["current_balance"])
             return 0.0
 
+    @traced("db.update_bankroll")
     def update_bankroll(self, amount):
         with self._lock:
             self.conn.execute("BEGIN TRANSACTION")
@@ -67,19 +86,24 @@ class Database:
                 self.conn.execute("ROLLBACK")
                 raise
 
-    def reserve(self, tx_id, amount):
+    @traced("db.reserve")
+    def reserve(self, tx_id, amount, robot=None, odds=None):
         ts = int(time.time())
         amount = float(amount)
+        odds = float(odds) if odds else None
         with self._lock:
             self.conn.execute("BEGIN TRANSACTION")
             try:
-                self.conn.execute("INSERT INTO journal (tx_id, amount, status, timestamp) VALUES (?, ?, 'PENDING', ?)", (tx_id, amount, ts))
+                self.conn.execute(
+                    "INSERT INTO journal (tx_id, amount, status, timestamp, robot, odds) VALUES (?, ?, 'PENDING', ?, ?, ?)",
+                    (tx_id, amount, ts, robot, odds))
                 self.conn.execute("UPDATE balance SET current_balance = current_balance - ? WHERE id = 1", (amount,))
                 self.conn.execute("COMMIT")
             except Exception:
                 self.conn.execute("ROLLBACK")
                 raise
 
+    @traced("db.commit")
     def commit(self, tx_id, payout):
         payout = float(payout)
         with self._lock:
@@ -93,6 +117,7 @@ class Database:
                 self.conn.execute("ROLLBACK")
                 raise
 
+    @traced("db.rollback")
     def rollback(self, tx_id):
         with self._lock:
             self.conn.execute("BEGIN TRANSACTION")
@@ -108,11 +133,53 @@ class Database:
                 self.conn.execute("ROLLBACK")
                 raise
 
+    @traced("db.pending")
     def pending(self):
         with self._lock:
             cur = self.conn.execute("SELECT * FROM journal WHERE status = 'PENDING' ORDER BY timestamp ASC")
             return [dict(row) for row in cur.fetchall()]
 
+    @traced("db.get_tx")
+    def get_tx(self, tx_id):
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM journal WHERE tx_id = ?", (tx_id,)).fetchone()
+            return dict(row) if row else None
+
+    @traced("db.history")
+    def history(self, robot=None, limit=None):
+        """Scommesse refertate (più vecchie prima), opzionalmente di un solo robot."""
+        sql = "SELECT * FROM journal WHERE status = 'SETTLED'"
+        args = []
+        if robot:
+            sql += " AND robot = ?"
+            args.append(robot)
+        sql += " ORDER BY timestamp ASC, id ASC"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, args).fetchall()]
+
+    @traced("db.get_staking_state")
+    def get_staking_state(self, robot):
+        with self._lock:
+            row = self.conn.execute("SELECT state FROM staking_state WHERE robot = ?", (robot,)).fetchone()
+        if not row or not row["state"]:
+            return None
+        try:
+            return json.loads(row["state"])
+        except ValueError:
+            self.logger.warning(f"Stato staking corrotto per {robot}: ignorato")
+            return None
+
+    @traced("db.save_staking_state")
+    def save_staking_state(self, robot, state):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO staking_state (robot, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(robot) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+                (robot, json.dumps(state), int(time.time())))
+
     def close(self) -> None:
         try:
             if self.conn:
@@ -3,14 +3,34 @@ import threading
 import logging
 import re
 import os
-import json
 import random
+import base64
 from typing import Any
 from playwright.sync_api import sync_playwright
 from core.human_mouse import HumanMouse
 from core.anti_detect import STEALTH_INJECTION_V4
+from core.dom_waits import DomWaiter
+from core.selector_registry import SelectorRegistry
+from core.dom_probe import DomProbe, css_only
+from core.blackbox import BlackboxRecorder
+
+HOME_URL = "https://www.bet365.it"
+
 
 class DomExecutorPlaywright:
+    # Soglie RAM (MB, processo) per standby pre-caldo e recycle preventivo
+    STANDBY_RAM_MB = 900
+    RECYCLE_RAM_MB = 1200
+    # Ogni N swap a caldo si fa comunque un recycle completo (browser + driver)
+    FULL_RECYCLE_EVERY = 5
+    # Lo standby aspetta solo il primo byte della home: il resto carica mentre il worker serve altro
+    STANDBY_GOTO_TIMEOUT_MS = 10000
+    # La lista "in corso" arriva da una XHR: si aspetta una bet o il messaggio "nessuna bet"
+    MYBETS_LIST_TIMEOUT_MS = 1500
+    MYBETS_NETWORK_TIMEOUT_MS = 2000
+    # Oltre questa età il saldo letto in precedenza non vale più: si rilegge dal DOM
+    BALANCE_MAX_AGE_S = 3.0
+
     def __init__(self, logger=None, headless=False, allow_place=False, **kwargs):
         self.logger = logger or logging.getLogger("Executor")
         self.headless = headless
@@ -23,10 +43,50 @@ class DomExecutorPlaywright:
         
         self._internal_lock = threading.RLock()
         self.start_time = None 
+        # Attese su condizioni reali (selettori, rete, DOM fermo) al posto degli sleep fissi
+        self.waits = DomWaiter(self.logger)
+        # Selettori da config/vault/auto-mapping con locator cachati per pagina
+        self.selectors = SelectorRegistry(logger=self.logger, bookmaker=kwargs.get("bookmaker"), site_url=HOME_URL)
+        # Statistiche selettori dall'esito reale di attese e click; la ricerca del vincente va in housekeeping
+        self.waits.on_outcome = self.selectors.report
+        self.selectors.schedule_discovery = self._schedule_selector_discovery
+        # Letture DOM multiple in un solo page.evaluate
+        self.probe = DomProbe(self.logger)
+        self.blackbox = BlackboxRecorder("logs", logger=self.logger)
+        # Filtro risorse + cache HTTP su disco (ResourcePolicy) applicato a ogni contesto
+        self.resources = kwargs.get("resource_policy")
+        
+        # Contesto di riserva già caricato: il recycle lo scambia al posto di quello attivo
+        self._standby_page: Any = None
+        self._standby_preparing = False
+        self._warm_swaps = 0
+        # Callable per rimandare lavoro sul thread Playwright (impostato dal Controller)
+        self.defer = None
+        # BrowserLifecycleManager (se presente) decide standby/recycle in base al trend di memoria
+        self.lifecycle = None
+        self._balance_snapshot = None  # (monotonic ts, saldo) dal probe di find_odds
         
         self.bet_count = 0
         self.login_fails = 0
 
+    def _new_page(self, storage_state=None):
+        context = self.browser.new_context(viewport={"width": 1280, "height": 720}, storage_state=storage_state)
+        if self.resources:
+            self.resources.install(context)
+        page = context.new_page()
+        page.add_init_script(STEALTH_INJECTION_V4)
+        return page
+
+    def _bind_page(self, page):
+        self.page = page
+        self.waits.attach(page)
+        self.selectors.invalidate()
+        try:
+            self.mouse = HumanMouse(page, self.logger)
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception in mouse init: {exc}")
+            self.mouse = None
+
     def launch_browser(self):
         with self._internal_lock:
             try:
@@ -35,62 +95,195 @@ class DomExecutorPlaywright:
                     
                 self.logger.info(f"🚀 Launching Browser (Headless={self.headless})...")
                 if not self.pw: self.pw = sync_playwright().start()
-                self.browser = self.pw.chromium.launch(headless=self.headless, args=["--no-sandbox"])
-                context = self.browser.new_context(viewport={"width": 1280, "height": 720})
-                self.page = context.new_page()
-                self.page.add_init_script(STEALTH_INJECTION_V4)
-                
-                try:
-                    self.mouse = HumanMouse(self.page, self.logger)
-                except Exception as exc:
-                    self.logger.debug(f"Non-critical exception in mouse init: {exc}")
-                    self.mouse = None
+                if not self.browser or not self.browser.is_connected():
+                    self.browser = self.pw.chromium.launch(headless=self.headless, args=["--no-sandbox"])
+                self._bind_page(self._new_page())
 
                 self.start_time = time.time()
                 
                 try:
-                    self.page.goto("https://www.bet365.it", timeout=60000)
+                    self.page.goto(HOME_URL, timeout=60000)
                     self.page.wait_for_load_state("domcontentloaded")
                 except Exception as exc:
                     self.logger.warning(f"Home load warning: {exc}")
+                if self.resources:
+                    r = self.resources.report(self.page)
+                    self.logger.info(
+                        f"🧹 Home: bloccate {sum(r.get('blocked', {}).values())} risorse "
+                        f"(~{r.get('bytes_saved_est', 0) // 1024} KB), cache {r.get('bytes_from_cache', 0) // 1024} KB"
+                    )
                 return True
             except Exception as exc:
                 self.logger.debug(f"Non-critical exception launch_browser: {exc}")
                 return False
 
+    def _loc(self, key: str, first: bool = False) -> Any:
+        return self.selectors.resolve(self.page, key, first=first)
+
+    def _probe(self, **reads) -> dict:
+        """Legge più chiavi del registry in un solo round-trip: nome=(chiave, lettura).
+
+        Ritorna {} se anche una sola chiave non ha alternative CSS: il chiamante usa i locator.
+        """
+        spec = {}
+        for name, (key, how) in reads.items():
+            alts = css_only(self.selectors.ordered(key))
+            if not alts:
+                return {}
+            spec[name] = (alts, how)
+        return self.probe.read(self.page, spec)
+
+    @staticmethod
+    def _parse_balance(txt):
+        txt = (txt or "").replace("€","").replace("$","").strip()
+        return txt.replace(".", "").replace(",", ".")
+
     def _stealth_click(self, locator: Any):
         if not self.mouse:
             raise RuntimeError("HumanMouse non inizializzato")
-        self.mouse.click(locator)
+        started = time.monotonic()
+        try:
+            self.mouse.click(locator)
+        except Exception:
+            self.selectors.report(locator, False, (time.monotonic() - started) * 1000)
+            raise
+        self.selectors.report(locator, True, (time.monotonic() - started) * 1000)
+
+    def _schedule_selector_discovery(self):
+        if self.defer:
+            self.defer(self._discover_selectors)
+
+    def _discover_selectors(self):
+        """Housekeeping: individua l'alternativa vincente delle chiavi risolte via unione."""
+        with self._internal_lock:
+            if self.page and not self.page.is_closed():
+                self.selectors.discover(self.page)
+
+    def get_dom_snapshot(self) -> str:
+        """HTML corrente della pagina (per AITrainerEngine); stringa vuota se non disponibile."""
+        with self._internal_lock:
+            if not self.page or self.page.is_closed():
+                return ""
+            return self.page.content()
+
+    def take_screenshot_b64(self) -> str:
+        """Screenshot viewport JPEG in base64 (per AITrainerEngine); stringa vuota se non disponibile."""
+        with self._internal_lock:
+            if not self.page or self.page.is_closed():
+                return ""
+            shot = self.page.screenshot(type="jpeg", quality=70, full_page=False)
+        return base64.b64encode(shot).decode("ascii")
 
     def save_blackbox(self, tx_id, error_msg="", data=None, stake=0, quota=0, saldo_db=0, saldo_book=0):
+        # Cattura minima sul thread Playwright; compressione/scrittura/retention nel writer in background
         try:
-            os.makedirs("logs", exist_ok=True)
             tx = tx_id or f"CRASH_{int(time.time())}"
             html = "Page closed/None"
             url = "N/A"
+            shot = None
             try:
                 if self.page and not self.page.is_closed():
-                    self.page.screenshot(path=f"logs/blackbox_{tx}.png", full_page=True)
-                    html = self.page.content()
                     url = self.page.url
+                    shot = self.page.screenshot(type="jpeg", quality=60, full_page=False)
+                    html = self.page.content()
             except Exception as exc:
                 self.logger.debug(f"Non-critical exception blackbox screenshot: {exc}")
-                
-            dump = {
-                "tx_id": tx, "error": str(error_msg), "payload": data or {},
+
+            meta = {
+                "error": str(error_msg), "payload": data or {},
                 "stake": stake, "quota": quota, "saldo_db": saldo_db, "saldo_book": saldo_book,
-                "url": url, "html_snippet": html[:3000] 
+                "url": url
             }
-            with open(f"logs/blackbox_{tx}.json", "w") as f:
-                json.dump(dump, f, indent=4)
-            self.logger.critical(f"📦 BLACKBOX COMPLETA SALVATA: logs/blackbox_{tx}.json")
+            if self.blackbox.submit(tx, meta, html, shot):
+                self.logger.warning(f"📦 Blackbox {tx} accodata per il salvataggio")
         except Exception as exc:
             self.logger.debug(f"Non-critical exception save_blackbox: {exc}")
 
-    def recycle_browser(self):
+    def standby_ready(self) -> bool:
+        try:
+            return bool(self._standby_page and not self._standby_page.is_closed())
+        except Exception:
+            return False
+
+    def prepare_standby(self):
+        """Pre-carica un secondo contesto (stessa sessione/cookie) pronto per lo swap.
+
+        Va eseguito sul thread Playwright, idealmente come task housekeeping in coda.
+        Il lock interno copre solo la copia della sessione e la pubblicazione della
+        pagina: la navigazione avviene fuori, così non blocca chi legge page/standby.
+        """
+        with self._internal_lock:
+            if self.standby_ready() or self._standby_preparing:
+                return True
+            if not self.browser or not self.page or self.page.is_closed():
+                return False
+            try:
+                started = time.time()
+                browser = self.browser
+                state = self.page.context.storage_state()
+                page = self._new_page(storage_state=state)
+            except Exception as exc:
+                self.logger.debug(f"Non-critical exception prepare_standby: {exc}")
+                return False
+            self._standby_preparing = True
+
+        try:
+            try:
+                page.goto(HOME_URL, wait_until="commit", timeout=self.STANDBY_GOTO_TIMEOUT_MS)
+            except Exception as exc:
+                self.logger.warning(f"Standby home load warning: {exc}")
+
+            with self._internal_lock:
+                # Browser riciclato durante la navigazione: il contesto appartiene a quello vecchio
+                if self.browser is not browser or page.is_closed():
+                    try:
+                        page.context.close()
+                    except Exception as exc:
+                        self.logger.debug(f"Non-critical exception closing stale standby: {exc}")
+                    return False
+                self._standby_page = page
+            self.logger.info(f"🔥 Contesto standby pronto in {time.time() - started:.1f}s")
+            return True
+        finally:
+            self._standby_preparing = False
+
+    def request_standby(self):
+        """Chiede la preparazione dello standby senza bloccare il chiamante (se c'è un defer)."""
+        if self.standby_ready():
+            return
+        if self.defer:
+            self.defer(self.prepare_standby)
+        else:
+            self.prepare_standby()
+
+    def _swap_to_standby(self):
+        with self._internal_lock:
+            if not self.standby_ready():
+                return False
+            old_page = self.page
+            self._bind_page(self._standby_page)
+            self._standby_page = None
+            self._warm_swaps += 1
+            self.start_time = time.time()
+        try:
+            if old_page and not old_page.is_closed():
+                old_page.context.close()
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception closing old context: {exc}")
+        self.logger.warning(f"🔄 Recycle a caldo: contesto standby attivo (swap #{self._warm_swaps})")
+        return True
+
+    def recycle_browser(self, full=False):
+        full = full or self._warm_swaps >= self.FULL_RECYCLE_EVERY
+        if not full and self._swap_to_standby():
+            self.bet_count = 0
+            self.login_fails = 0
+            return True
+
         self.logger.warning("🔄 Eseguo Recycle completo del Browser...")
         try:
+            if self._standby_page and not self._standby_page.is_closed():
+                self._standby_page.context.close()
             if self.page and self.page.context:
                 self.page.context.close()
             if self.browser: 
@@ -101,6 +294,8 @@ class DomExecutorPlaywright:
             self.logger.debug(f"Non-critical exception recycle: {exc}")
         
         self.page = None
+        self._standby_page = None
+        self._warm_swaps = 0
         self.browser = None
         self.pw = None
         self.bet_count = 0
@@ -109,8 +304,8 @@ class DomExecutorPlaywright:
 
     def is_logged(self):
         try:
-            if self.page.locator("text='Accedi', text='Login'").count() > 0: return False
-            if self.page.locator(".hm-Balance").count() > 0: return True
+            if self._loc("login_prompt").count() > 0: return False
+            if self._loc("balance").count() > 0: return True
             return True
         except Exception: 
             return False
@@ -119,7 +314,7 @@ class DomExecutorPlaywright:
     def ensure_login(self, account_id="bet365_main"):
         if not self.launch_browser(): return False
         try:
-            if self.is_logged() or self.page.locator(".hm-Balance").count() > 0: 
+            if self.is_logged() or self._loc("balance").count() > 0: 
                 self.login_fails = 0
                 return True
                 
@@ -133,18 +328,19 @@ class DomExecutorPlaywright:
                 self.logger.error(f"❌ Account {account_id} non trovato nel Vault o password illeggibile.")
                 return False
 
-            login_btn = self.page.locator(".hm-MainHeaderRHSLoggedOutWide_Login, text='Login', text='Accedi'").first
+            login_btn = self._loc("login_button", first=True)
             if login_btn.is_visible():
                 self._stealth_click(login_btn)
-                self.page.wait_for_timeout(1500)
 
-            self.page.locator(".lms-StandardLogin_Username, input[type='text']").first.fill(username)
-            self.page.locator(".lms-StandardLogin_Password, input[type='password']").first.fill(password)
+            user_input = self._loc("login_username", first=True)
+            self.waits.for_selector(user_input, "visible", timeout_ms=1500, step="login_form")
+            user_input.fill(username)
+            self._loc("login_password", first=True).fill(password)
             self.page.wait_for_timeout(500)
 
-            btn_submit = self.page.locator(".lms-LoginButton").first
+            btn_submit = self._loc("login_submit", first=True)
             self._stealth_click(btn_submit)
-            self.page.wait_for_selector(".hm-Balance", timeout=10000)
+            self._loc("balance", first=True).wait_for(state="visible", timeout=10000)
             
             self.login_fails = 0
             self.logger.info(f"✅ Login su account {account_id} effettuato con successo!")
@@ -159,16 +355,16 @@ class DomExecutorPlaywright:
         if not self.ensure_login(): return False
         try:
             self.logger.info(f"🔍 Cerco la partita: {teams}")
-            search_btn = self.page.locator(".hm-MainHeaderCentreWide_SearchIcon, .hm-MainHeader_SearchIcon").first
+            search_btn = self._loc("search_button", first=True)
             if search_btn.is_visible(): self._stealth_click(search_btn)
-            self.page.wait_for_timeout(1500)
             
             home_team = teams.split("-")[0].strip() if "-" in teams else teams
-            input_box = self.page.locator("input.hm-MainHeaderCentreWide_SearchInput, input.sml-SearchInput").first
+            input_box = self._loc("search_input", first=True)
+            self.waits.for_selector(input_box, "visible", timeout_ms=1500, step="nav_search_input")
             input_box.fill(home_team)
-            self.page.wait_for_timeout(3000)
 
-            results = self.page.locator(".sml-SearchParticipant_Name, .sml-EventParticipant")
+            results = self._loc("search_result")
+            self.waits.for_selector(results, "visible", timeout_ms=3000, step="nav_search_results")
             if results.count() > 0:
                 self._stealth_click(results.first)
                 self.page.wait_for_load_state("domcontentloaded")
@@ -180,9 +376,19 @@ class DomExecutorPlaywright:
 
     def find_odds(self, teams, market):
         if not self.launch_browser(): return None
+        # Un saldo precedente non deve sopravvivere a una lettura fallita
+        self._balance_snapshot = None
         try:
-            self.page.wait_for_timeout(2000) 
-            odds_elements = self.page.locator(".gl-Participant_General > .gl-Participant_Odds")
+            odds_elements = self._loc("odds_value")
+            self.waits.for_selector(odds_elements, "attached", timeout_ms=2000, step="find_odds")
+            # Quota e saldo nello stesso round-trip: il saldo resta disponibile via cached_balance()
+            snap = self._probe(count=("odds_value", "count"), odds=("odds_value", "text"),
+                               bal_visible=("balance", "visible"), bal_text=("balance", "text"))
+            if snap:
+                self._store_balance(snap.get("bal_text") if snap.get("bal_visible") else None)
+                if not snap.get("count"): return None
+                return float((snap.get("odds") or "").strip().replace(",", "."))
+
             if odds_elements.count() > 0:
                 quota_text = odds_elements.first.inner_text().strip()
                 return float(quota_text.replace(",", "."))
@@ -191,19 +397,39 @@ class DomExecutorPlaywright:
             self.logger.debug(f"Non-critical exception find odds: {exc}")
             return None
 
+    def _store_balance(self, raw_text):
+        try:
+            value = float(self._parse_balance(raw_text)) if raw_text else None
+        except ValueError:
+            value = None
+        self._balance_snapshot = (time.monotonic(), value) if value is not None else None
+
+    def cached_balance(self, max_age_s=None):
+        """Ultimo saldo letto (find_odds o get_balance) se più recente di max_age_s, altrimenti None."""
+        if max_age_s is None:
+            max_age_s = self.BALANCE_MAX_AGE_S
+        snap = getattr(self, "_balance_snapshot", None)
+        if snap and time.monotonic() - snap[0] <= max_age_s:
+            return snap[1]
+        return None
+
     def get_balance(self):
         if not self.launch_browser(): return None
         try:
-            bal_el = self.page.locator(".hm-Balance").first
-            if bal_el.is_visible():
-                txt = bal_el.inner_text()
-                txt = txt.replace("€","").replace("$","").strip()
-                txt = txt.replace(".", "").replace(",", ".")
-                try: return float(txt)
-                except Exception:
-                    self.logger.error(f"Parsing saldo fallito: {txt}")
-                    return None
-            return None
+            snap = self._probe(visible=("balance", "visible"), text=("balance", "text"))
+            if snap:
+                if not snap.get("visible"): return None
+                txt = self._parse_balance(snap.get("text"))
+            else:
+                bal_el = self._loc("balance", first=True)
+                if not bal_el.is_visible(): return None
+                txt = self._parse_balance(bal_el.inner_text())
+            try: value = float(txt)
+            except Exception:
+                self.logger.error(f"Parsing saldo fallito: {txt}")
+                return None
+            self._balance_snapshot = (time.monotonic(), value)
+            return value
         except Exception as exc:
             self.logger.debug(f"Non-critical exception get balance: {exc}")
             return None
@@ -213,7 +439,10 @@ class DomExecutorPlaywright:
         if not self.is_logged(): return False
 
         try:
-            saldo_pre = self.get_balance()
+            # Saldo appena letto dall'engine (find_odds / get_balance): niente secondo round-trip
+            saldo_pre = self.cached_balance()
+            if saldo_pre is None:
+                saldo_pre = self.get_balance()
             if saldo_pre is None:
                 self.logger.error("❌ Saldo bookmaker NON leggibile → abort bet sicurezza")
                 return False
@@ -227,49 +456,58 @@ class DomExecutorPlaywright:
                     return False
             except Exception: pass
 
-            odds_btn = self.page.locator(".gl-Participant_Odds").first
+            odds_btn = self._loc("odds_button", first=True)
             if not odds_btn.is_visible(): raise Exception("Quota non trovata")
             self._stealth_click(odds_btn)
-            self.page.wait_for_timeout(1200)
 
-            popup = self.page.locator(".bs-BetSlip, .bs-Content")
+            popup = self._loc("bet_slip")
+            self.waits.for_selector(popup, "visible", timeout_ms=1200, step="betslip_open")
             if not popup.is_visible(): raise Exception("Popup ticket non aperto")
 
-            stake_input = self.page.locator("input.bs-Stake_Input, input.st-Stake_Input").first
+            stake_input = self._loc("stake_input", first=True)
             self._stealth_click(stake_input)
             stake_input.fill(str(stake))
-            self.page.wait_for_timeout(500)
+            self.waits.for_dom_quiet(quiet_ms=150, timeout_ms=500, step="stake_fill")
 
             bet_placed = False
             for attempt in range(3):
-                body = self.page.inner_text("body").lower()
+                # Stato della sola schedina + bottone in un round-trip (niente inner_text di tutto il body)
+                snap = self._probe(status=("betslip_status", "text"), place_enabled=("place_button", "enabled"))
+                if snap:
+                    body = (snap.get("status") or "").lower()
+                else:
+                    try: body = self._loc("betslip_status", first=True).inner_text().lower()
+                    except Exception: body = ""
                 if "suspended" in body or "quota cambiata" in body or "non disponibile" in body or "accetta modifiche" in body:
-                    close_btn = self.page.locator(".bs-BetSlipHeader_Close").first
+                    close_btn = self._loc("betslip_close", first=True)
                     if close_btn.is_visible(): self._stealth_click(close_btn)
-                    self.page.wait_for_timeout(2000)
+                    self.waits.for_selector(popup, "hidden", timeout_ms=2000, step="betslip_close")
                     if odds_btn.is_visible():
                         self._stealth_click(odds_btn)
-                        self.page.wait_for_timeout(1000)
+                        self.waits.for_selector(stake_input, "visible", timeout_ms=1000, step="betslip_reopen")
                         if stake_input.is_visible(): stake_input.fill(str(stake))
                     continue
 
                 if not self.allow_place:
-                    close_btn = self.page.locator(".bs-BetSlipHeader_Close").first
+                    close_btn = self._loc("betslip_close", first=True)
                     if close_btn.is_visible(): self._stealth_click(close_btn)
                     bet_placed = True
                     break
 
-                place_btn = self.page.locator("button.bs-PlaceBetButton, button.st-PlaceBetButton").first
-                if place_btn.is_enabled():
+                place_btn = self._loc("place_button", first=True)
+                enabled = snap.get("place_enabled") if snap else place_btn.is_enabled()
+                if enabled:
                     self._stealth_click(place_btn)
                     bet_placed = True
                     break
-                else: self.page.wait_for_timeout(2000)
+                # Si ricontrolla lo stato della schedina al giro successivo appena il bottone si abilita
+                self.waits.for_enabled(place_btn, timeout_ms=2000, step="place_enabled")
 
             if not bet_placed: raise Exception("Quota permanentemente sospesa.")
 
-            self.page.wait_for_timeout(3000)
-            receipt = self.page.locator(".bs-Receipt, .st-Receipt")
+            receipt = self._loc("receipt")
+            if self.allow_place:
+                self.waits.for_selector(receipt, "visible", timeout_ms=3000, step="receipt")
             
             if receipt.is_visible() or not self.allow_place:
                 self.logger.info("✅ RICEVUTA CONFERMATA A SCHERMO!")
@@ -292,17 +530,29 @@ class DomExecutorPlaywright:
                         
                     self.logger.info(f"✅ Bet confermata finanziariamente. Saldo: {saldo_pre} → {saldo_post}")
 
-                done_btn = self.page.locator("button.bs-Receipt_Done").first
+                done_btn = self._loc("receipt_done", first=True)
                 if done_btn.is_visible(): self._stealth_click(done_btn)
 
-                try:
-                    import psutil
-                    process = psutil.Process(os.getpid())
-                    ram = process.memory_info().rss / 1024 / 1024
-                    if ram > 1200:
-                        self.logger.critical(f"🚨 RAM alta {ram:.0f}MB → recycle browser preventivo")
-                        self.recycle_browser()
-                except Exception: pass
+                lifecycle = getattr(self, "lifecycle", None)
+                if lifecycle:
+                    # Campione extra a fine bet: l'eventuale recycle parte nel prossimo momento libero
+                    try:
+                        lifecycle.sample()
+                        lifecycle.evaluate()
+                    except Exception as exc:
+                        self.logger.debug(f"Non-critical exception lifecycle sample: {exc}")
+                else:
+                    try:
+                        import psutil
+                        process = psutil.Process(os.getpid())
+                        ram = process.memory_info().rss / 1024 / 1024
+                        if ram > self.RECYCLE_RAM_MB:
+                            self.logger.critical(f"🚨 RAM alta {ram:.0f}MB → recycle browser preventivo")
+                            self.recycle_browser()
+                        elif ram > self.STANDBY_RAM_MB:
+                            # Ci si avvicina alla soglia: contesto di riserva pronto per lo swap
+                            self.request_standby()
+                    except Exception: pass
 
                 return True
             raise Exception("Ricevuta non confermata")
@@ -313,17 +563,24 @@ class DomExecutorPlaywright:
     def check_open_bet(self):
         if not self.launch_browser(): return False
         try:
-            my_bets_btn = self.page.locator(".hm-MainHeaderCentreWide_MyBets, .hm-MainHeader_MyBets").first
+            my_bets_btn = self._loc("my_bets_button", first=True)
             if my_bets_btn.is_visible():
                 self._stealth_click(my_bets_btn)
-                self.page.wait_for_timeout(1500)
-                open_tab = self.page.locator("text='In corso', text='Open'").first
+                open_tab = self._loc("open_bets_tab", first=True)
+                self.waits.for_selector(open_tab, "visible", timeout_ms=1500, step="mybets_open_tab")
                 if open_tab.is_visible(): self._stealth_click(open_tab)
-                self.page.wait_for_timeout(1000)
-                
-                count = self.page.locator(".myb-BetItem, .myb-BetParticipant").count()
+                # Lista vuota ≠ lista non ancora caricata: serve una bet o lo stato vuoto esplicito
+                listed = self._loc("open_bet_item", first=True).or_(self._loc("open_bets_empty", first=True))
+                if not self.waits.for_selector(listed, "visible", timeout_ms=self.MYBETS_LIST_TIMEOUT_MS,
+                                               step="mybets_list"):
+                    # Né bet né stato vuoto: si legge il conteggio solo a XHR delle bet rientrata
+                    self.logger.warning("⚠️ Lista bet aperte non pronta: attendo la rete prima del conteggio")
+                    self.waits.for_network_idle(quiet_ms=300, timeout_ms=self.MYBETS_NETWORK_TIMEOUT_MS,
+                                                step="mybets_network")
+
+                count = self._loc("open_bet_item").count()
                 try:
-                    close = self.page.locator(".myb-CloseButton, .myb-MyBetsHeader_CloseButton").first
+                    close = self._loc("my_bets_close", first=True)
                     if close.is_visible(): self._stealth_click(close)
                 except Exception: pass
 
@@ -334,18 +591,18 @@ class DomExecutorPlaywright:
     def check_settled_bets(self):
         if not self.launch_browser(): return None
         try:
-            my_bets_btn = self.page.locator(".hm-MainHeaderCentreWide_MyBets, .hm-MainHeader_MyBets").first
+            my_bets_btn = self._loc("my_bets_button", first=True)
             if my_bets_btn.is_visible():
                 self._stealth_click(my_bets_btn)
-                self.page.wait_for_timeout(1500)
-            settled_tab = self.page.locator("text='Risolute', text='Settled'").first
+            settled_tab = self._loc("settled_tab", first=True)
+            self.waits.for_selector(settled_tab, "visible", timeout_ms=1500, step="mybets_settled_tab")
+            first_bet = self._loc("settled_bet_item", first=True)
             if settled_tab.is_visible():
                 self._stealth_click(settled_tab)
-                self.page.wait_for_timeout(1500)
-            first_bet = self.page.locator(".myb-SettledBetItem, .myb-BetItem").first
+                self.waits.for_selector(first_bet, "visible", timeout_ms=1500, step="mybets_settled_list")
             if not first_bet.is_visible():
                 try:
-                    close = self.page.locator(".myb-CloseButton, .myb-MyBetsHeader_CloseButton").first
+                    close = self._loc("my_bets_close", first=True)
                     if close.is_visible(): self._stealth_click(close)
                 except Exception: pass
                 return None
@@ -358,7 +615,7 @@ class DomExecutorPlaywright:
 
             payout = 0.0
             if status == "WIN":
-                payout_el = first_bet.locator(".myb-BetItem_Return, .myb-SettledBetItem_Returns").first
+                payout_el = self.selectors.locator(self.page, "settled_payout", first=True, root=first_bet)
                 if payout_el.is_visible():
                     pay_txt = payout_el.inner_text().replace("€","").replace("$","").strip().replace(".", "").replace(",", ".")
                     match = re.search(r"(\d+\.\d+)", pay_txt)
@@ -367,7 +624,7 @@ class DomExecutorPlaywright:
                         except Exception: payout = 0.0
                     
             try:
-                close = self.page.locator(".myb-CloseButton, .myb-MyBetsHeader_CloseButton").first
+                close = self._loc("my_bets_close", first=True)
                 if close.is_visible(): self._stealth_click(close)
             except Exception: pass
             
@@ -376,6 +633,7 @@ class DomExecutorPlaywright:
 
     def close(self):
         try:
+            if self.standby_ready(): self._standby_page.context.close()
             if self.page and self.page.context: self.page.context.close()
             if self.browser: self.browser.close()
             if self.pw: self.pw.stop()
@@ -0,0 +1,65 @@
+"""
+DOM fingerprint — Cheap structural hash of a page, computed in-page.
+
+The fingerprint covers the tag/class skeleton only: text, attribute values
+and numeric class fragments (dynamic ids, hashed CSS-module suffixes) are
+ignored, so odds updates or a ticking clock do not change it while a new
+layout or a redesigned betslip does. Script/style/svg/noscript subtrees are
+skipped, shadow roots are included.
+
+The hash is a 64-bit FNV-1a split into two 32-bit lanes (Math.imul), so the
+whole walk and hash run in one page.evaluate and only ~20 bytes come back.
+"""
+import logging
+from urllib.parse import urlsplit
+
+FINGERPRINT_JS = r"""
+(rootSelectors) => {
+    const SKIP = new Set(['SCRIPT', 'STYLE', 'SVG', 'NOSCRIPT', 'TEMPLATE', 'LINK', 'META']);
+    let h1 = 0x811c9dc5, h2 = 0x01000193 ^ 0x5bd1e995, count = 0;
+    const feed = s => {
+        for (let i = 0; i < s.length; i++) {
+            const c = s.charCodeAt(i);
+            h1 = Math.imul(h1 ^ c, 0x01000193);
+            h2 = Math.imul(h2 ^ c, 0x5bd1e995);
+        }
+    };
+    const walk = (el, depth) => {
+        const tag = el.tagName.toUpperCase();
+        if (SKIP.has(tag)) return;
+        count++;
+        const cls = (el.getAttribute('class') || '')
+            .split(/\s+/).filter(c => c && !/\d/.test(c)).sort().join('.');
+        feed(depth + tag + '.' + cls + ';');
+        if (el.shadowRoot) for (const c of el.shadowRoot.children) walk(c, depth + 1);
+        for (const c of el.children) walk(c, depth + 1);
+    };
+    const roots = [];
+    for (const sel of (rootSelectors || [])) {
+        try { roots.push(...document.querySelectorAll(sel)); } catch (e) {}
+    }
+    if (!roots.length && document.body) roots.push(document.body);
+    for (const r of roots) walk(r, 0);
+    const hex = n => (n >>> 0).toString(16).padStart(8, '0');
+    return {hash: hex(h1) + hex(h2), nodes: count};
+}
+"""
+
+
+def page_key(url: str) -> str:
+    """host + path (senza query/fragment): stessa pagina logica, parametri diversi."""
+    try:
+        parts = urlsplit(url or "")
+        return f"{parts.netloc}{parts.path}"
+    except ValueError:
+        return url or ""
+
+
+def compute_fingerprint(page, roots=None, logger=None):
+    """Hash strutturale della pagina (o dei sottoalberi `roots`). None se la lettura fallisce."""
+    try:
+        result = page.evaluate(FINGERPRINT_JS, list(roots or []))
+        return result.get("hash") if result else None
+    except Exception as exc:
+        (logger or logging.getLogger("DomFingerprint")).debug(f"Non-critical exception fingerprint: {exc}")
+        return None
@@ -0,0 +1,100 @@
+"""
+DomProbe — Batch several DOM reads into a single page.evaluate round-trip.
+
+A small JS helper (window.__saProbe) is injected once per page: as an init
+script for future navigations and evaluated directly for the current
+document. A probe spec maps names to (selector alternatives, read) pairs:
+
+    probe.read(page, {
+        "balance": ([".hm-Balance"], "text"),
+        "slip_open": ([".bs-BetSlip", ".bs-Content"], "visible"),
+    })
+
+Reads: "visible", "text", "count", "enabled", "value", "attr:<name>".
+Alternatives are tried in order and the first one that matches wins.
+Playwright-only engines (text=, xpath=, >>) cannot run in querySelector and
+are skipped in-page; the caller falls back to locators for those.
+"""
+import logging
+
+PROBE_HELPER_JS = """
+(() => {
+    if (window.__saProbe) return;
+    const visible = el => {
+        if (!el || !el.isConnected) return false;
+        const st = getComputedStyle(el);
+        if (st.visibility === 'hidden' || st.display === 'none' || parseFloat(st.opacity) === 0) return false;
+        const r = el.getBoundingClientRect();
+        return r.width > 0 && r.height > 0;
+    };
+    const read = (els, how) => {
+        const el = els[0];
+        if (how === 'count') return els.length;
+        if (how === 'visible') return els.some(visible);
+        if (!el) return null;
+        if (how === 'text') return (el.innerText || el.textContent || '').trim();
+        if (how === 'enabled') return !el.disabled && el.getAttribute('aria-disabled') !== 'true';
+        if (how === 'value') return el.value !== undefined ? el.value : null;
+        if (how.startsWith('attr:')) return el.getAttribute(how.slice(5));
+        return null;
+    };
+    window.__saProbe = spec => {
+        const out = {};
+        for (const [name, [alts, how]] of Object.entries(spec)) {
+            let els = [];
+            for (const sel of alts) {
+                try { els = Array.from(document.querySelectorAll(sel)); } catch (e) { els = []; }
+                if (els.length) break;
+            }
+            out[name] = read(els, how);
+        }
+        return out;
+    };
+})();
+"""
+
+CALL_JS = "spec => window.__saProbe ? window.__saProbe(spec) : null"
+
+_PW_ENGINE_PREFIXES = ("text=", "xpath=", "css=", "id=", "role=", "data-testid=", "//", "'", '"')
+
+
+def css_only(alternatives) -> list:
+    """Filtra le alternative eseguibili con querySelectorAll (niente motori Playwright)."""
+    out = []
+    for alt in alternatives:
+        a = alt.strip()
+        if not a or a.startswith(_PW_ENGINE_PREFIXES) or ">>" in a or ":has-text(" in a:
+            continue
+        out.append(a)
+    return out
+
+
+class DomProbe:
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("DomProbe")
+        self._page = None
+        self.calls = 0
+
+    def ensure(self, page):
+        """Inietta l'helper una sola volta per pagina."""
+        if self._page is page:
+            return
+        page.add_init_script(PROBE_HELPER_JS)
+        page.evaluate(PROBE_HELPER_JS)
+        self._page = page
+
+    def read(self, page, spec) -> dict:
+        """Esegue tutte le letture di `spec` in un solo evaluate. Ritorna {} se il probe fallisce."""
+        payload = {name: [css_only(alts), how] for name, (alts, how) in spec.items()}
+        try:
+            self.ensure(page)
+            result = page.evaluate(CALL_JS, payload)
+            if result is None:
+                # Documento nuovo senza helper (es. about:blank → navigazione): re-iniezione
+                page.evaluate(PROBE_HELPER_JS)
+                result = page.evaluate(CALL_JS, payload)
+            self.calls += 1
+            return result or {}
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception dom probe: {exc}")
+            return {}
@@ -1,11 +1,60 @@
 import logging
+from collections import OrderedDict
 # NESSUN altro import custom qui per evitare Circular Import
+# (core.dom_fingerprint e core.dom_probe non importano nulla del core)
+from core.dom_fingerprint import compute_fingerprint, page_key
+from core.dom_probe import css_only
+
+# Sottoalbero (chiave del registry) che contiene il campo: il fingerprint copre solo
+# quello, così un cambio altrove nella pagina non invalida la cache. Senza voce: body
+HEAL_ROOTS = {
+    "stake_input": "bet_slip",
+    "place_button": "bet_slip",
+    "bet_button": "bet_slip",
+    "odds_value": "market_group",
+}
 
 class DOMSelfHealing:
+    # Mapping completi per (pagina, sottoalbero, fingerprint strutturale) tenuti in memoria
+    CACHE_SIZE = 32
+
     def __init__(self, executor):
         self.executor = executor
         self.logger = logging.getLogger("SelfHealing")
         self._heal_count = 0
+        self._cache = OrderedDict()
+        self.cache_hits = 0
+        self.full_scans = 0
+
+    def _roots(self, key):
+        """Selettori CSS del contenitore di `key` (dal registry dell'executor), [] = tutta la pagina."""
+        registry = getattr(self.executor, "selectors", None)
+        container = HEAL_ROOTS.get(key)
+        if not container or registry is None:
+            return []
+        try:
+            return css_only(registry.alternatives(container))
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception heal roots: {exc}")
+            return []
+
+    def _cached(self, page, cache_key, key):
+        """(hit, selettore) dalla cache; un selettore che non risolve più invalida la voce."""
+        if cache_key not in self._cache:
+            return False, None
+        cached = self._cache[cache_key].get(key)
+        if cached:
+            try:
+                alive = page.locator(cached).count() > 0
+            except Exception:
+                alive = False
+            if not alive:
+                self.logger.info(f"♻️ SELF-HEAL cache scartata, {cached} non risolve più")
+                self._cache.pop(cache_key, None)
+                return False, None
+        self._cache.move_to_end(cache_key)
+        self.cache_hits += 1
+        return True, cached
 
     def heal(self, key):
         # 1. Check sicurezza
@@ -14,66 +63,69 @@ class DOMSelfHealing:
         page = getattr(self.executor, "page", None)
         if not page: return None
 
-        # 2. Anti-Loop
-        if self._heal_count > 2:
-            self.logger.error("Healing limit reached. Abort.")
-            return None
-
-        self._heal_count += 1
-        self.logger.warning(f"♻️ SELF-HEAL START: {key}")
-
         current_url = None
         try: current_url = page.url
         except: pass
 
+        # 2. Lock Thread Safe: fingerprint, verifica della cache e scan vedono la stessa pagina
+        lock = getattr(self.executor, "_internal_lock", None)
+        if lock: lock.acquire()
         try:
-            # 3. IMPORT LOCALE (Deferred)
+            # Struttura del contenitore invariata dall'ultimo scan → risultato in cache, senza rescan
+            roots = self._roots(key)
+            fingerprint = compute_fingerprint(page, roots, logger=self.logger)
+            cache_key = (page_key(current_url), tuple(roots), fingerprint) if fingerprint else None
+            hit, cached = self._cached(page, cache_key, key)
+            if hit:
+                self.logger.info(f"♻️ SELF-HEAL cache ({fingerprint}): {key} -> {cached}")
+                return cached
+
+            # 3. Anti-Loop
+            if self._heal_count > 2:
+                self.logger.error("Healing limit reached. Abort.")
+                return None
+
+            self._heal_count += 1
+            self.logger.warning(f"♻️ SELF-HEAL START: {key}")
+
+            # 4. IMPORT LOCALE (Deferred)
             # Questo rompe il cerchio dell'importazione
             from core.auto_mapper_worker import AutoMapperWorker
-            
+
             target_url = current_url if current_url else page.url
             mapper = AutoMapperWorker(self.executor, target_url)
 
-            # 4. Lock Thread Safe
-            lock = getattr(self.executor, "_internal_lock", None)
-            if lock: lock.acquire()
+            # Estrazione in-page (fallback CDP dentro scan_page)
+            elements = mapper.scan_page(page)
+            selectors = mapper._ai_match(elements)
+            self.full_scans += 1
 
-            try:
-                # CDP Session
-                cdp = page.context.new_cdp_session(page)
-                cdp.send("DOM.enable")
-                resp = cdp.send("DOM.getFlattenedDocument", {"depth": -1, "pierce": True})
-                
-                try: cdp.detach()
-                except: pass
-
-                nodes = resp.get("nodes", [])
-                
-                # Metodi interni del mapper
-                elements = mapper._extract(nodes)
-                selectors = mapper._ai_match(elements)
-
-                if selectors: mapper._save(selectors)
-
-            finally:
-                if lock: lock.release()
-
-            # 5. Ripristino Navigazione
-            try:
-                if current_url and page.url != current_url:
-                    page.goto(current_url, timeout=15000)
-                    page.wait_for_load_state("domcontentloaded")
-            except Exception as nav_err:
-                self.logger.warning(f"Return navigation fail: {nav_err}")
-
-            # 6. Risultato
-            new_sel = selectors.get(key) if selectors else None
-            if new_sel:
-                self.logger.info(f"✅ HEALED: {key} -> {new_sel}")
-                self._heal_count = 0
-                return new_sel
+            if selectors: mapper._save(selectors)
 
         except Exception as e:
             self.logger.error(f"Self-heal error: {e}")
+            return None
+
+        finally:
+            if lock: lock.release()
 
-        return None
\ No newline at end of file
+        # 5. Ripristino Navigazione
+        try:
+            if current_url and page.url != current_url:
+                page.goto(current_url, timeout=15000)
+                page.wait_for_load_state("domcontentloaded")
+        except Exception as nav_err:
+            self.logger.warning(f"Return navigation fail: {nav_err}")
+
+        if cache_key:
+            self._cache[cache_key] = dict(selectors or {})
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        # 6. Risultato
+        new_sel = selectors.get(key) if selectors else None
+        if new_sel:
+            self.logger.info(f"✅ HEALED: {key} -> {new_sel}")
+            self._heal_count = 0
+            return new_sel
+        return None
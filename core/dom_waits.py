@@ -0,0 +1,185 @@
+"""
+DomWaiter — Condition-based waits for DomExecutorPlaywright.
+
+Replaces fixed `page.wait_for_timeout(...)` sleeps with waits on concrete
+readiness conditions, each bounded by an upper timeout:
+  - selector attached / visible / hidden
+  - network idle for requests matching a URL pattern
+  - DOM mutation quiescence (MutationObserver in-page)
+
+Every wait records how long it actually waited under a step name, so the
+per-step cost of a bet cycle is visible via `stats()`.
+"""
+import re
+import time
+import logging
+import threading
+from collections import deque
+
+from core.tracing import tracer
+
+# MutationObserver in-page: risolve quando il DOM resta fermo per `quiet` ms (o a `timeout`)
+DOM_QUIET_JS = """
+({quiet, timeout}) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const obs = new MutationObserver(() => { last = performance.now(); });
+    obs.observe(document.documentElement || document, {subtree: true, childList: true, attributes: true, characterData: true});
+    const tick = () => {
+        const now = performance.now();
+        if (now - last >= quiet || now - start >= timeout) {
+            obs.disconnect();
+            resolve(now - last >= quiet);
+        } else {
+            setTimeout(tick, Math.min(50, quiet));
+        }
+    };
+    setTimeout(tick, Math.min(50, quiet));
+})
+"""
+
+
+class DomWaiter:
+    MAX_SAMPLES = 200
+    POLL_MS = 50
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger("DomWaiter")
+        self.page = None
+        self._inflight = {}
+        self._net_lock = threading.Lock()
+        self._last_net_activity = time.monotonic()
+        self._samples = deque(maxlen=self.MAX_SAMPLES)
+        self.last = {}
+        # callback(locator, ok, waited_ms) sull'esito delle attese di presenza (es. SelectorRegistry.report)
+        self.on_outcome = None
+
+    # ------------------------------------------------------------------
+    #  Page binding
+    # ------------------------------------------------------------------
+    def attach(self, page):
+        """Lega il waiter a una nuova pagina (dopo launch/recycle) e ne traccia le richieste."""
+        self.page = page
+        with self._net_lock:
+            self._inflight.clear()
+        self._last_net_activity = time.monotonic()
+        try:
+            page.on("request", self._on_request)
+            page.on("requestfinished", self._on_request_done)
+            page.on("requestfailed", self._on_request_done)
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception waiter attach: {exc}")
+
+    def _on_request(self, request):
+        with self._net_lock:
+            self._inflight[id(request)] = request.url
+        self._last_net_activity = time.monotonic()
+
+    def _on_request_done(self, request):
+        with self._net_lock:
+            self._inflight.pop(id(request), None)
+        self._last_net_activity = time.monotonic()
+
+    # ------------------------------------------------------------------
+    #  Bookkeeping
+    # ------------------------------------------------------------------
+    def _report(self, locator, ok, started):
+        if self.on_outcome is None or isinstance(locator, str):
+            return
+        try:
+            self.on_outcome(locator, ok, (time.monotonic() - started) * 1000)
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception wait outcome: {exc}")
+
+    def _record(self, step, started, ok, timeout_ms):
+        waited_ms = (time.monotonic() - started) * 1000
+        self.last[step] = waited_ms
+        self._samples.append((step, waited_ms, ok, timeout_ms))
+        tracer.record(f"wait.{step}", waited_ms, ok)
+        self.logger.debug(f"⏱️ wait[{step}] {waited_ms:.0f}ms / max {timeout_ms}ms ({'ok' if ok else 'timeout'})")
+        return ok
+
+    def stats(self) -> dict:
+        """Per step: numero di attese, media/max ms attesi e quante sono scadute."""
+        out = {}
+        for step, ms, ok, _ in list(self._samples):
+            s = out.setdefault(step, {"count": 0, "avg_ms": 0.0, "max_ms": 0.0, "timeouts": 0})
+            s["count"] += 1
+            s["avg_ms"] += (ms - s["avg_ms"]) / s["count"]
+            s["max_ms"] = max(s["max_ms"], ms)
+            if not ok:
+                s["timeouts"] += 1
+        return out
+
+    # ------------------------------------------------------------------
+    #  Conditions
+    # ------------------------------------------------------------------
+    def for_selector(self, selector, state="visible", timeout_ms=3000, step=None):
+        """Attende che il selettore sia attached/visible/hidden/detached. Ritorna True se raggiunto."""
+        started = time.monotonic()
+        ok = False
+        try:
+            target = self.page.locator(selector).first if isinstance(selector, str) else selector.first
+            target.wait_for(state=state, timeout=timeout_ms)
+            ok = True
+        except Exception:
+            ok = False
+        if state in ("attached", "visible"):
+            self._report(selector, ok, started)
+        return self._record(step or f"{state}:{selector}", started, ok, timeout_ms)
+
+    def for_any(self, selectors, state="visible", timeout_ms=3000, step=None):
+        """Come for_selector ma su più selettori alternativi (il primo che compare vince)."""
+        joined = ", ".join(s for s in selectors if s)
+        return self.for_selector(joined, state=state, timeout_ms=timeout_ms, step=step)
+
+    def for_enabled(self, locator, timeout_ms=2000, step=None):
+        started = time.monotonic()
+        deadline = started + timeout_ms / 1000
+        ok = False
+        while True:
+            try:
+                if locator.is_enabled():
+                    ok = True
+                    break
+            except Exception:
+                pass
+            if time.monotonic() >= deadline:
+                break
+            self.page.wait_for_timeout(self.POLL_MS)
+        self._report(locator, ok, started)
+        return self._record(step or "enabled", started, ok, timeout_ms)
+
+    def for_network_idle(self, url_pattern=None, quiet_ms=300, timeout_ms=5000, step=None):
+        """Attende che nessuna richiesta (che matcha `url_pattern`, regex) sia in volo per `quiet_ms`."""
+        started = time.monotonic()
+        deadline = started + timeout_ms / 1000
+        rx = re.compile(url_pattern) if isinstance(url_pattern, str) else url_pattern
+        ok = False
+        idle_since = self._last_net_activity if rx is None else started
+        while True:
+            with self._net_lock:
+                busy = any(rx is None or rx.search(url) for url in self._inflight.values())
+            now = time.monotonic()
+            if busy:
+                idle_since = now
+            elif rx is None:
+                idle_since = max(idle_since, self._last_net_activity)
+            if not busy and (now - idle_since) * 1000 >= quiet_ms:
+                ok = True
+                break
+            if time.monotonic() >= deadline:
+                break
+            # wait_for_timeout fa girare il loop di Playwright → gli eventi request arrivano
+            self.page.wait_for_timeout(self.POLL_MS)
+        return self._record(step or "network_idle", started, ok, timeout_ms)
+
+    def for_dom_quiet(self, quiet_ms=250, timeout_ms=2000, step=None):
+        """Attende che il DOM non muti per `quiet_ms` (MutationObserver), con tetto `timeout_ms`."""
+        started = time.monotonic()
+        ok = False
+        try:
+            ok = bool(self.page.evaluate(DOM_QUIET_JS, {"quiet": quiet_ms, "timeout": timeout_ms}))
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception dom quiet: {exc}")
+        return self._record(step or "dom_quiet", started, ok, timeout_ms)
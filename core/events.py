@@ -13,3 +13,4 @@ class AppEvent(str, Enum):
     BET_UNKNOWN = "BET_UNKNOWN"
     STATE_CHANGE = "STATE_CHANGE"
     BET_ERROR = "BET_ERROR"
+    TASK_EXPIRED = "TASK_EXPIRED"
@@ -2,14 +2,26 @@ import time
 import logging
 import traceback
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
+from core.tracing import tracer
+
 class ExecutionEngine:
+    # Tetto di attesa per i pre-check in parallelo (DB) prima della navigazione
+    PRECHECK_TIMEOUT_S = 10
+    # Età massima del saldo letto insieme alla quota (stesso probe DOM)
+    BALANCE_MAX_AGE_S = 3.0
+
     def __init__(self, bus, executor, logger=None):
         self.bus = bus
         self.executor = executor
         self.logger = logger or logging.getLogger("ExecutionEngine")
         self.betting_enabled = False # Partiamo disabilitati
+        # True mentre un segnale è in lavorazione (login → navigazione → bet): letto da BrowserLifecycleManager
+        self.in_flight = False
+        # Lavoro non-browser (pending, bankroll, limiti robot) in parallelo alla navigazione
+        self._side = ThreadPoolExecutor(max_workers=2, thread_name_prefix="EnginePrecheck")
 
     def _safe_float(self, value: Any) -> float:
         if isinstance(value, (int, float)): return float(value)
@@ -28,7 +40,48 @@ class ExecutionEngine:
         except ValueError:
             return 0.0
 
+    def _robot_limits(self, payload: Dict[str, Any]) -> Dict[str, float]:
+        limits = {}
+        max_stake = self._safe_float(payload.get("max_stake"))
+        if max_stake > 0:
+            limits["max_stake"] = max_stake
+        return limits
+
+    def _prechecks(self, money_manager, payload, trace):
+        """Eseguito sul thread laterale: nessuna chiamata al browser qui."""
+        with tracer.activate(trace):
+            with tracer.span("precheck.pending"):
+                has_pending = bool(money_manager.pending())
+            prefetch = getattr(money_manager, "prefetch", None)
+            if prefetch:
+                # Bankroll e stato staking letti ora: get_stake non tocca il DB sul percorso critico
+                robot = payload.get("robot")
+                with tracer.span("precheck.bankroll"):
+                    if robot:
+                        prefetch(robot)
+                    else:
+                        prefetch()
+            return has_pending, self._robot_limits(payload)
+
+    def _real_balance(self):
+        cached = getattr(self.executor, "cached_balance", None)
+        if callable(cached):
+            value = cached(self.BALANCE_MAX_AGE_S)
+            if isinstance(value, (int, float)):
+                return float(value)
+        return self._safe_float(self.executor.get_balance())
+
     def process_signal(self, payload: Dict[str, Any], money_manager) -> None:
+        self.in_flight = True
+        try:
+            with tracer.trace("process_signal", teams=payload.get("teams", ""), market=payload.get("market", "")) as tr:
+                self._process_signal(payload, money_manager)
+        finally:
+            self.in_flight = False
+        if tr is not None and hasattr(tr, "trace_id"):
+            self.logger.info(f"⏱️ Trace {tr.trace_id}: {(tr.end_ns - tr.start_ns) / 1e6:.0f} ms")
+
+    def _process_signal(self, payload: Dict[str, Any], money_manager) -> None:
         self.logger.info(f"⚙️ Avvio processing segnale: {payload.get('teams')}")
         
         # 🔴 Blocco Betting Globale
@@ -48,14 +101,24 @@ class ExecutionEngine:
 
         try:
             if hasattr(self.executor, 'ensure_login'):
-                self.executor.ensure_login()
+                with tracer.span("executor.ensure_login"):
+                    self.executor.ensure_login()
 
-            is_open = self.executor.check_open_bet()
-            if not is_open:
-                time.sleep(1.5)
-                is_open = self.executor.check_open_bet()
+            # Pre-check DB in parallelo: pending, bankroll per lo stake, limiti del robot
+            prechecks = self._side.submit(self._prechecks, money_manager, payload, tracer.current())
 
-            if money_manager.pending() or is_open:
+            with tracer.span("executor.check_open_bet"):
+                is_open = self.executor.check_open_bet()
+            if not is_open:
+                with tracer.span("sleep.open_bet_retry"):
+                    time.sleep(1.5)
+                with tracer.span("executor.check_open_bet", retry=True):
+                    is_open = self.executor.check_open_bet()
+
+            # Il pending da DB decide prima della navigazione: nessun navigate per un segnale da scartare
+            with tracer.span("engine.await_prechecks"):
+                has_pending, limits = prechecks.result(timeout=self.PRECHECK_TIMEOUT_S)
+            if is_open or has_pending:
                 self.logger.warning("⚠️ Bet già aperta o pending. Salto segnale.")
                 self.bus.emit("BET_FAILED", {"reason": "Bet already open"})
                 return
@@ -63,32 +126,45 @@ class ExecutionEngine:
             teams = payload.get("teams", "")
             market = payload.get("market", "")
 
-            nav_ok = self.executor.navigate_to_match(teams)
+            with tracer.span("executor.navigate_to_match"):
+                nav_ok = self.executor.navigate_to_match(teams)
             if not nav_ok:
                 self.bus.emit("BET_FAILED", {"reason": "Match not found"})
                 return
 
-            raw_odds = self.executor.find_odds(teams, market)
+            # La stessa lettura DOM della quota aggiorna anche il saldo (cached_balance)
+            with tracer.span("executor.find_odds"):
+                raw_odds = self.executor.find_odds(teams, market)
             odds = self._safe_float(raw_odds)
             if odds <= 0:
                 self.bus.emit("BET_FAILED", {"reason": "Odds not found or invalid"})
                 return
 
-            stake = self._safe_float(money_manager.get_stake(odds))
+            # Config staking del robot (mm_mode, stake_value...) se il segnale arriva da un robot
+            robot = payload.get("robot")
+            with tracer.span("money.get_stake"):
+                raw_stake = money_manager.get_stake(odds, robot=robot) if robot else money_manager.get_stake(odds)
+                stake = self._safe_float(raw_stake)
+            if "max_stake" in limits and stake > limits["max_stake"]:
+                self.logger.info(f"🔒 Stake limitato dal robot: {stake} → {limits['max_stake']}")
+                stake = limits["max_stake"]
             if stake <= 0:
                 self.bus.emit("BET_FAILED", {"reason": "Stake zero"})
                 return
 
-            real_balance = self._safe_float(self.executor.get_balance())
+            with tracer.span("executor.get_balance"):
+                real_balance = self._real_balance()
             if real_balance > 0 and real_balance < stake:
                 self.logger.error(f"❌ Saldo bookmaker insufficiente ({real_balance} < {stake})")
                 self.bus.emit("BET_FAILED", {"reason": "Insufficient real balance"})
                 return
 
-            tx_id = money_manager.reserve(stake)
+            with tracer.span("money.reserve"):
+                tx_id = money_manager.reserve(stake, robot=robot, odds=odds) if robot else money_manager.reserve(stake)
 
             try:
-                bet_ok = self.executor.place_bet(teams, market, stake)
+                with tracer.span("executor.place_bet", stake=stake, odds=odds):
+                    bet_ok = self.executor.place_bet(teams, market, stake)
             except Exception as e:
                 self.logger.error(f"Crash di rete o browser durante la bet: {e}")
                 money_manager.refund(tx_id)
@@ -120,4 +196,4 @@ class ExecutionEngine:
                     saldo_book=self.executor.get_balance()
                 )
             
-            self.bus.emit("BET_FAILED", {"tx_id": tx_id, "reason": str(e)})
\ No newline at end of file
+            self.bus.emit("BET_FAILED", {"tx_id": tx_id, "reason": str(e)})
@@ -89,8 +89,9 @@ class SystemWatchdog(QThread):
                     if self.logger:
                         self.logger.warning(f"[Watchdog] Check failed: {e}")
 
-            # 4. Browser memory recycle trigger (pure psutil, no executor dependency)
-            if PSUTIL_AVAILABLE:
+            # 4. Browser memory recycle trigger (pure psutil, no executor dependency).
+            #    Skipped when a BrowserLifecycleManager owns recycle scheduling.
+            if PSUTIL_AVAILABLE and not getattr(self.executor, "lifecycle", None):
                 try:
                     parent = psutil.Process()
                     browser_mem = 0
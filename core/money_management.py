@@ -1,23 +1,103 @@
 import uuid
+import time
 import threading
 import logging
 import math
 
+from core.staking import DEFAULT_STRATEGY, strategy_from_config
+
 class MoneyManager:
+    # Validità del bankroll pre-letto da prefetch() per il calcolo dello stake
+    BANKROLL_HINT_TTL_S = 15.0
+
     def __init__(self, db):
         self.db = db
         self.logger = logging.getLogger("MoneyManager")
         self._lock = threading.RLock()
+        self._bankroll_hint = None  # (monotonic ts, bankroll)
+        # Per robot: strategia costruita una volta per configurazione + stato (step progressione)
+        self._strategies = {}   # nome -> (config robot, strategia)
+        self._states = {}       # nome -> stato
 
     def bankroll(self) -> float:
         with self._lock:
             return float(self.db.get_balance())
 
+    def prefetch(self, robot=None) -> float:
+        """Legge bankroll (e stato staking del robot) in anticipo: get_stake li riusa senza query."""
+        with self._lock:
+            br = self.bankroll()
+            self._bankroll_hint = (time.monotonic(), br)
+            if robot and robot.get("name"):
+                self._state_for(robot["name"], self.strategy_for(robot), br)
+            return br
+
+    def _stake_bankroll(self) -> float:
+        hint = self._bankroll_hint
+        if hint and time.monotonic() - hint[0] <= self.BANKROLL_HINT_TTL_S:
+            return hint[1]
+        return self.bankroll()
+
     def pending(self):
         with self._lock:
             return self.db.pending()
 
-    def reserve(self, amount: float) -> str:
+    def strategy_for(self, robot=None):
+        """Strategia di staking del robot; senza robot la percentuale standard (5%, max 50€)."""
+        name = (robot or {}).get("name")
+        if not name:
+            return DEFAULT_STRATEGY
+        with self._lock:
+            cached = self._strategies.get(name)
+            if cached and cached[0] == robot:
+                return cached[1]
+            strategy = strategy_from_config(robot, self.logger)
+            # Config del robot modificata: lo stato in memoria va riletto (e ripartirà da zero)
+            if cached and cached[1].config() != strategy.config():
+                self._states.pop(name, None)
+            self._strategies[name] = (dict(robot), strategy)
+            return strategy
+
+    def _state_for(self, name, strategy, bankroll):
+        state = self._states.get(name)
+        if state is None:
+            stored = self.db.get_staking_state(name) if hasattr(self.db, "get_staking_state") else None
+            # Stato salvato con un'altra configurazione (robot modificato): si riparte da zero
+            if stored and stored.get("config") == strategy.config():
+                state = stored.get("state") or {}
+            else:
+                state = strategy.initial_state(bankroll)
+            self._states[name] = state
+        return state
+
+    def _save_state(self, name, strategy, state):
+        self._states[name] = state
+        if hasattr(self.db, "save_staking_state"):
+            self.db.save_staking_state(name, {"config": strategy.config(), "state": state})
+
+    def _settle_robot(self, tx_id, won):
+        """Avanza lo stato del robot che ha piazzato la scommessa (progressioni)."""
+        if not hasattr(self.db, "get_tx"):
+            return
+        tx = self.db.get_tx(tx_id)
+        name = (tx or {}).get("robot")
+        if not name:
+            return
+        cached = self._strategies.get(name)
+        if cached:
+            strategy = cached[1]
+        else:
+            # Dopo un riavvio: strategia ricostruita dalla config salvata con lo stato
+            stored = self.db.get_staking_state(name) or {}
+            if not stored.get("config"):
+                return
+            strategy = strategy_from_config(stored["config"], self.logger)
+            self._strategies[name] = (None, strategy)
+        br = self.bankroll()
+        state = strategy.update(self._state_for(name, strategy, br), won, br)
+        self._save_state(name, strategy, state)
+
+    def reserve(self, amount: float, robot=None, odds=None) -> str:
         with self._lock:
             amount = float(amount)
             # 🔴 FIX MATH POISONING: Blocca alla radice NaN, Infinito o negativi
@@ -25,26 +105,37 @@ class MoneyManager:
                 raise ValueError(f"Stake matematicamente invalido: {amount}")
             
             tx_id = str(uuid.uuid4())
-            self.db.reserve(tx_id, amount)
+            self._bankroll_hint = None
+            if robot:
+                self.db.reserve(tx_id, amount, robot=robot.get("name"), odds=odds)
+            else:
+                self.db.reserve(tx_id, amount)
             return tx_id
 
     def refund(self, tx_id: str) -> None:
         with self._lock:
+            self._bankroll_hint = None
             self.db.rollback(tx_id)
 
     def win(self, tx_id: str, payout: float) -> None:
         with self._lock:
+            self._bankroll_hint = None
             self.db.commit(tx_id, payout)
+            self._settle_robot(tx_id, won=True)
 
     def loss(self, tx_id: str) -> None:
         with self._lock:
+            self._bankroll_hint = None
             self.db.commit(tx_id, 0.0)
+            self._settle_robot(tx_id, won=False)
 
-    def get_stake(self, odds: float) -> float:
+    def get_stake(self, odds: float, robot=None) -> float:
         with self._lock:
-            br = self.bankroll()
-            stake = min(br * 0.05, 50.0)
-            return round(stake, 2)
+            br = self._stake_bankroll()
+            strategy = self.strategy_for(robot)
+            name = (robot or {}).get("name")
+            state = self._state_for(name, strategy, br) if name else {}
+            return strategy.stake(br, float(odds or 0.0), state)
 
     def reconcile_balances(self, real_balance: float) -> bool:
         with self._lock:
@@ -53,6 +144,7 @@ class MoneyManager:
             if abs(current - real_balance) > 0.01:
                 if hasattr(self.db, 'update_bankroll'):
                     self.logger.warning(f"Riconciliazione forzata: DB {current} -> Bookmaker {real_balance}")
+                    self._bankroll_hint = None
                     self.db.update_bankroll(real_balance)
                 return True
             return False
\ No newline at end of file
@@ -1,22 +1,216 @@
+import os
+import sys
 import time
+import queue
 import logging
+import argparse
+import threading
+import yaml
 from core.auto_mapper_worker import AutoMapperWorker
+from core.config_paths import CONFIG_DIR
+# Mapping combinato dei siti: {url: {campo: selettore}}, letto da SelectorRegistry per il sito corrente
+from core.selector_registry import SITES_SELECTORS_FILE
+
 
 class MultiSiteScanner:
-    def __init__(self, executor):
+    """Mappa più siti in parallelo, ognuno in un contesto browser isolato.
+
+    L'API sync di Playwright è legata al thread che l'ha avviata: ogni worker
+    apre quindi il proprio Playwright + Chromium, prende URL da una coda
+    condivisa e usa un contesto nuovo per ogni URL. I risultati arrivano
+    man mano che i job finiscono (scan_iter / on_result).
+
+    Il mapping finisce in selectors_sites.yaml, da cui SelectorRegistry prende
+    le voci del sito su cui gira l'executor. Da riga di comando:
+        python -m core.multi_site_scanner https://www.bet365.it https://www.sisal.it
+    """
+    DEFAULT_WORKERS = 4
+    DEFAULT_URL_TIMEOUT_S = 60
+    # Margine oltre url_timeout_s prima di abbandonare un worker bloccato
+    DEADLINE_GRACE_S = 10
+    WATCHDOG_TICK_S = 1.0
+
+    def __init__(self, executor=None, max_workers=None, url_timeout_s=None, headless=True, logger=None):
         self.executor = executor
-        self.logger = logging.getLogger("Scanner")
+        self.logger = logger or logging.getLogger("Scanner")
+        self.max_workers = int(max_workers or self.DEFAULT_WORKERS)
+        self.url_timeout_s = float(url_timeout_s or self.DEFAULT_URL_TIMEOUT_S)
+        self.headless = headless
 
-    def scan(self, urls):
+    def scan(self, urls, on_result=None, save=True):
+        """Scansiona tutti gli URL e ritorna {url: risultato}; salva il mapping combinato."""
         results = {}
+        for url, result in self.scan_iter(urls):
+            results[url] = result
+            if on_result:
+                try:
+                    on_result(url, result)
+                except Exception as e:
+                    self.logger.error(f"Scan callback error {url}: {e}")
+        if save:
+            self._save(results)
+        return results
+
+    def scan_iter(self, urls):
+        """Generatore (url, risultato) nell'ordine di completamento.
+
+        Il timeout per URL è una scadenza vera: i timeout Playwright valgono per
+        singola operazione (e page.evaluate non ne ha), quindi è questo ciclo a
+        controllare da quanto ogni worker è sull'URL corrente. Oltre
+        url_timeout_s + DEADLINE_GRACE_S l'URL è segnalato in errore e il worker
+        abbandonato: quando si sblocca chiude il browser senza prendere altri job.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return
+        jobs = queue.Queue()
         for url in urls:
+            jobs.put(url)
+        out = queue.Queue()
+        n_workers = min(self.max_workers, len(urls))
+        cancelled = {}
+        for i in range(n_workers):
+            name = f"Scanner_{i}"
+            cancelled[name] = threading.Event()
+            threading.Thread(target=self._worker, args=(name, jobs, out, cancelled[name]),
+                             daemon=True, name=name).start()
+
+        running = {}    # worker -> (url, inizio monotonic)
+        alive = n_workers
+        while alive > 0:
+            try:
+                kind, worker, payload = out.get(timeout=self.WATCHDOG_TICK_S)
+            except queue.Empty:
+                kind = None
+            if kind is not None and not cancelled[worker].is_set():
+                if kind == "start":
+                    running[worker] = (payload, time.monotonic())
+                elif kind == "result":
+                    running.pop(worker, None)
+                    yield payload
+                else:
+                    alive -= 1
+
+            now = time.monotonic()
+            for worker, (url, started) in list(running.items()):
+                if now - started <= self.url_timeout_s + self.DEADLINE_GRACE_S:
+                    continue
+                del running[worker]
+                cancelled[worker].set()
+                alive -= 1
+                self.logger.error(f"Scan {url}: scadenza di {self.url_timeout_s:.0f}s superata, worker {worker} abbandonato")
+                yield url, {"status": "error", "error": "timeout", "selectors": {},
+                            "seconds": round(now - started, 1)}
+
+        # URL rimasti in coda senza più worker attivi (tutti abbandonati)
+        while True:
             try:
-                self.logger.info(f"Scan sito: {url}")
-                mapper = AutoMapperWorker(self.executor, url)
-                mapper.run()
-                results[url] = "Done"
-                time.sleep(3)
+                url = jobs.get_nowait()
+            except queue.Empty:
+                break
+            yield url, {"status": "error", "error": "nessun worker disponibile", "selectors": {}}
+
+    # ------------------------------------------------------------------
+    #  Worker thread
+    # ------------------------------------------------------------------
+    def _worker(self, name, jobs, out, cancelled):
+        pw = browser = None
+        try:
+            from playwright.sync_api import sync_playwright
+            pw = sync_playwright().start()
+            browser = pw.chromium.launch(headless=self.headless, args=["--no-sandbox"])
+            while not cancelled.is_set():
+                try:
+                    url = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                out.put(("start", name, url))
+                out.put(("result", name, (url, self._map_url(browser, url))))
+        except Exception as e:
+            self.logger.error(f"Scanner worker error: {e}")
+            # URL rimasti senza browser: segnalati come errore invece di perderli
+            while not cancelled.is_set():
+                try:
+                    url = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                out.put(("result", name, (url, {"status": "error", "error": str(e), "selectors": {}})))
+        finally:
+            try:
+                if browser: browser.close()
+                if pw: pw.stop()
             except Exception as e:
-                self.logger.error(f"Scan error {url}: {e}")
-                results[url] = str(e)
-        return results
+                self.logger.debug(f"Non-critical exception scanner close: {e}")
+            out.put(("done", name, None))
+
+    def _map_url(self, browser, url):
+        started = time.time()
+        deadline_ms = int(self.url_timeout_s * 1000)
+        context = None
+        try:
+            self.logger.info(f"Scan sito: {url}")
+            context = browser.new_context(viewport={"width": 1280, "height": 720})
+            page = context.new_page()
+            # Ogni operazione del job è limitata dal timeout per URL
+            page.set_default_timeout(deadline_ms)
+            page.goto(url, timeout=deadline_ms, wait_until="domcontentloaded")
+
+            mapper = AutoMapperWorker(None, url)
+            mapper._auto_scroll(page)
+            selectors = mapper._ai_match(mapper.scan_page(page))
+            elapsed = time.time() - started
+            self.logger.info(f"Scan completato {url}: {len(selectors)} campi in {elapsed:.1f}s")
+            return {"status": "done", "selectors": selectors, "seconds": round(elapsed, 1)}
+        except Exception as e:
+            self.logger.error(f"Scan error {url}: {e}")
+            return {"status": "error", "error": str(e), "selectors": {}, "seconds": round(time.time() - started, 1)}
+        finally:
+            if context:
+                try: context.close()
+                except Exception: pass
+
+    def _save(self, results):
+        mapped = {url: r["selectors"] for url, r in results.items() if r.get("selectors")}
+        if not mapped:
+            return
+        # I siti non scansionati in questo giro restano nel file
+        existing = {}
+        try:
+            with open(SITES_SELECTORS_FILE, "r", encoding="utf-8") as f:
+                existing = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            self.logger.debug(f"Non-critical exception reading sites selectors: {e}")
+        if not isinstance(existing, dict):
+            existing = {}
+        existing.update(mapped)
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        tmp = f"{SITES_SELECTORS_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            yaml.dump(existing, f)
+        # Sostituzione atomica: l'hot reload del registry non legge mai un file a metà
+        os.replace(tmp, SITES_SELECTORS_FILE)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mappa i selettori di più siti in parallelo e li salva in selectors_sites.yaml."
+    )
+    parser.add_argument("urls", nargs="+", help="URL dei siti da mappare")
+    parser.add_argument("--workers", type=int, default=MultiSiteScanner.DEFAULT_WORKERS)
+    parser.add_argument("--timeout", type=float, default=MultiSiteScanner.DEFAULT_URL_TIMEOUT_S,
+                        help="Secondi massimi per URL")
+    parser.add_argument("--headed", action="store_true", help="Mostra i browser")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    scanner = MultiSiteScanner(max_workers=args.workers, url_timeout_s=args.timeout, headless=not args.headed)
+    results = scanner.scan(
+        args.urls,
+        on_result=lambda url, r: print(f"{'✅' if r['status'] == 'done' else '❌'} {url}: "
+                                       f"{r.get('selectors') or r.get('error')}")
+    )
+    return 0 if any(r.get("selectors") for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,55 @@
 import threading
 import queue
+import itertools
+import time
 import traceback
 import logging
 
+# Priorità dei task (numero più basso = eseguito prima)
+PRIORITY_CONTROL = 0
+PRIORITY_LIVE = 10
+PRIORITY_NORMAL = 50
+PRIORITY_SETTLEMENT = 80
+PRIORITY_HOUSEKEEPING = 100
+
+
+class _Task:
+    __slots__ = ("priority", "seq", "func", "args", "kwargs", "name", "enqueued_at", "deadline", "key", "versions")
+
+    def __init__(self, priority, seq, func, args, kwargs, ttl=None, key=None):
+        self.priority = priority
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = getattr(func, "__name__", repr(func)) if func else "STOP"
+        self.enqueued_at = time.monotonic()
+        self.deadline = self.enqueued_at + ttl if ttl else None
+        self.key = key
+        self.versions = 1
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def expired(self, now) -> bool:
+        return self.deadline is not None and now > self.deadline
+
+
 class PlaywrightWorker:
-    def __init__(self, logger=None):
+    def __init__(self, logger=None, bus=None):
         self.logger = logger or logging.getLogger("PlaywrightWorker")
-        self.q = queue.Queue()
+        self.bus = bus
+        self.q = queue.PriorityQueue()
         self.running = False
         self.thread = None
         self.executor = None
+        self._seq = itertools.count()
+        self._current = None
+        self._keyed = {}
+        self._lock = threading.Lock()
+        self.metrics = {"submitted": 0, "executed": 0, "expired": 0, "failed": 0, "coalesced": 0,
+                        "last_wait_s": 0.0, "max_wait_s": 0.0}
+        self.coalesced_by_key = {}
 
     def start(self):
         self.running = True
@@ -20,37 +60,114 @@ class PlaywrightWorker:
     def stop(self):
         self.logger.info("Arresto Playwright Worker richiesto...")
         self.running = False
-        self.q.put((None, None, None))
+        self.q.put(_Task(PRIORITY_CONTROL, next(self._seq), None, (), {}))
         if self.thread:
             self.thread.join(timeout=2)
         self.logger.info("Playwright Worker arrestato.")
 
-    def submit(self, func, *args, **kwargs):
-        self.q.put((func, args, kwargs))
+    def submit(self, func, *args, priority=PRIORITY_NORMAL, ttl=None, key=None, **kwargs):
+        """Accoda un task. `priority` più bassa = prima; `ttl` (s) oltre cui il task viene scartato.
+
+        Con `key`: se un task con la stessa chiave è ancora in coda, viene sostituito
+        sul posto (stessa posizione) dalla versione più recente invece di accodarne un altro.
+        """
+        self.metrics["submitted"] += 1
+        if key is not None:
+            with self._lock:
+                queued = self._keyed.get(key)
+                if queued is not None:
+                    queued.func, queued.args, queued.kwargs = func, args, kwargs
+                    queued.deadline = time.monotonic() + ttl if ttl else None
+                    queued.versions += 1
+                    self.metrics["coalesced"] += 1
+                    self.coalesced_by_key[key] = self.coalesced_by_key.get(key, 0) + 1
+                    self.logger.info(f"🔀 Task {queued.name} [{key}] sostituito in coda dalla versione più recente")
+                    return queued
+                task = _Task(priority, next(self._seq), func, args, kwargs, ttl, key)
+                self._keyed[key] = task
+                self.q.put(task)
+                return task
+
+        task = _Task(priority, next(self._seq), func, args, kwargs, ttl)
+        self.q.put(task)
+        return task
 
     def is_alive(self):
         return self.thread and self.thread.is_alive()
 
+    def pending(self) -> list:
+        """Snapshot della coda in ordine di esecuzione: posizione, priorità e attesa."""
+        now = time.monotonic()
+        with self.q.mutex:
+            tasks = sorted(t for t in self.q.queue if t.func is not None)
+        return [
+            {
+                "position": pos,
+                "name": t.name,
+                "priority": t.priority,
+                "waited_s": round(now - t.enqueued_at, 3),
+                "expires_in_s": round(t.deadline - now, 3) if t.deadline is not None else None,
+                "key": t.key,
+                "versions": t.versions,
+            }
+            for pos, t in enumerate(tasks)
+        ]
+
+    def stats(self) -> dict:
+        data = dict(self.metrics)
+        data["queued"] = self.q.qsize()
+        data["current"] = self._current
+        return data
+
+    def _expire(self, task, now):
+        waited = now - task.enqueued_at
+        self.metrics["expired"] += 1
+        self.logger.warning(f"⌛ Task scaduto scartato: {task.name} (in coda da {waited:.1f}s, priorità {task.priority})")
+        if self.bus:
+            self.bus.emit("TASK_EXPIRED", {"task": task.name, "priority": task.priority, "waited_s": round(waited, 3)})
+
     def _run(self):
         self.logger.info("Worker Loop Iniziato.")
         while self.running:
             try:
                 task = self.q.get(timeout=1)
-                func, args, kwargs = task
-                if func is None:
+                if task.func is None:
                     break
-                
-                # 🔴 FIX WORKER: Isolamento totale del task. 
+
+                # Da qui in poi la chiave non è più "in coda": nuovi submit creano un task nuovo
+                if task.key is not None:
+                    with self._lock:
+                        if self._keyed.get(task.key) is task:
+                            del self._keyed[task.key]
+
+                now = time.monotonic()
+                if task.expired(now):
+                    self._expire(task, now)
+                    self.q.task_done()
+                    continue
+
+                waited = now - task.enqueued_at
+                self.metrics["last_wait_s"] = waited
+                if waited > self.metrics["max_wait_s"]:
+                    self.metrics["max_wait_s"] = waited
+                self.logger.debug(f"▶️ Task {task.name} avviato dopo {waited:.2f}s in coda")
+                self._current = task.name
+
+                # 🔴 FIX WORKER: Isolamento totale del task.
                 # Se crasha, il worker logga l'errore ma SOPRAVVIVE e passa al task successivo.
                 try:
-                    func(*args, **kwargs)
+                    task.func(*task.args, **task.kwargs)
+                    self.metrics["executed"] += 1
                 except Exception as e:
+                    self.metrics["failed"] += 1
                     self.logger.error(f"❌ Worker Task Crash: {e}\n{traceback.format_exc()}")
+                finally:
+                    self._current = None
 
                 self.q.task_done()
             except queue.Empty:
                 continue
             except Exception as e:
                 self.logger.error(f"Errore critico nella coda worker: {e}")
-                
-        self.logger.info("Worker Loop Terminato.")
\ No newline at end of file
+
+        self.logger.info("Worker Loop Terminato.")
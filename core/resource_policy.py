@@ -0,0 +1,262 @@
+"""
+ResourcePolicy — Network filtering and on-disk HTTP cache for browser contexts.
+
+Installed with `context.route(...)` on every context the executor creates
+(main and standby), it:
+  - aborts requests by resource type (default: image, media, font) and by
+    URL pattern (analytics / trackers)
+  - serves cacheable static GETs (scripts, stylesheets) from a cache
+    directory that survives browser recycles
+
+Playwright routes can only be filtered by URL, so the route is a regex of the
+block patterns plus the file extensions of the blocked and cacheable types:
+documents, XHR/fetch and websockets never pass through the Python handler
+(and the Playwright thread). Resources of a blocked type served without a
+recognizable extension are therefore not blocked.
+
+Playwright disables Chromium's own HTTP cache as soon as routing is enabled,
+and non-persistent contexts never write a disk cache anyway, which is why
+the cache lives here at the route layer.
+
+Per page it reports requests blocked by type, bytes served from cache,
+bytes fetched, and an estimate of bytes saved by blocking. Blocked requests
+are never downloaded, so their size is estimated from EST_BYTES.
+
+Config (config.yaml):
+    rpa:
+      resource_policy:
+        enabled: true
+        block_types: [image, media, font]
+        block_patterns: [google-analytics.com, doubleclick.net]
+        cache_dir: ~/.superagent_data/http_cache
+        cache_max_mb: 200
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+DEFAULT_BLOCK_TYPES = ("image", "media", "font")
+DEFAULT_BLOCK_PATTERNS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "facebook.net",
+    "hotjar.com", "clarity.ms", "scorecardresearch.com", "adservice.google",
+)
+CACHEABLE_TYPES = ("script", "stylesheet")
+DEFAULT_CACHE_DIR = os.path.join(str(Path.home()), ".superagent_data", "http_cache")
+
+# Stima dimensione media per tipo (byte) — usata solo per il report dei byte risparmiati
+EST_BYTES = {"image": 40_000, "media": 400_000, "font": 50_000, "script": 60_000, "other": 10_000}
+
+# Estensioni per tipo: solo queste URL (più i pattern bloccati) passano dal route handler
+TYPE_EXTENSIONS = {
+    "image": ("png", "jpe?g", "gif", "webp", "avif", "svg", "ico", "bmp"),
+    "media": ("mp4", "webm", "m3u8", "mp3", "ogg", "wav", "m4a"),
+    "font": ("woff2?", "ttf", "otf", "eot"),
+    "script": ("m?js",),
+    "stylesheet": ("css",),
+}
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+# Header da non riproporre: il body salvato è già decodificato
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ResourcePolicy:
+    CACHE_MAX_MB = 200
+
+    def __init__(self, block_types=DEFAULT_BLOCK_TYPES, block_patterns=DEFAULT_BLOCK_PATTERNS,
+                 cache_dir=DEFAULT_CACHE_DIR, cache_max_mb=None, logger=None):
+        self.logger = logger or logging.getLogger("ResourcePolicy")
+        self.block_types = frozenset(t.lower() for t in (block_types or ()))
+        self.block_patterns = tuple(p.lower() for p in (block_patterns or ()))
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.cache_max_bytes = int(cache_max_mb or self.CACHE_MAX_MB) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._pages = {}
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config, logger=None):
+        """Policy da config.yaml (rpa.resource_policy). None se disabilitata."""
+        conf = ((config or {}).get("rpa", {}) or {}).get("resource_policy", {}) or {}
+        if not conf.get("enabled", True):
+            return None
+        return cls(
+            block_types=conf.get("block_types", DEFAULT_BLOCK_TYPES),
+            block_patterns=conf.get("block_patterns", DEFAULT_BLOCK_PATTERNS),
+            cache_dir=conf.get("cache_dir", DEFAULT_CACHE_DIR),
+            cache_max_mb=conf.get("cache_max_mb"),
+            logger=logger,
+        )
+
+    # ------------------------------------------------------------------
+    #  Decisions
+    # ------------------------------------------------------------------
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_types:
+            return True
+        low = url.lower()
+        return any(p in low for p in self.block_patterns)
+
+    def is_cacheable(self, method: str, resource_type: str) -> bool:
+        return bool(self.cache_dir) and method == "GET" and resource_type in CACHEABLE_TYPES
+
+    @staticmethod
+    def cache_ttl(headers: dict) -> int:
+        """Secondi di validità secondo Cache-Control; 0 = non cachare."""
+        cc = (headers.get("cache-control") or "").lower()
+        if "no-store" in cc or "no-cache" in cc or "private" in cc:
+            return 0
+        m = _MAX_AGE_RE.search(cc)
+        return int(m.group(1)) if m else 0
+
+    # ------------------------------------------------------------------
+    #  Disk cache
+    # ------------------------------------------------------------------
+    def _paths(self, url):
+        h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, h[:2], h)
+        return base + ".json", base + ".bin"
+
+    def cache_get(self, url):
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if time.time() > meta["expires"]:
+                return None
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def cache_put(self, url, status, headers, body, ttl):
+        meta_path, body_path = self._paths(url)
+        try:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            with open(body_path, "wb") as f:
+                f.write(body)
+            clean = {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "status": status, "headers": clean, "expires": time.time() + ttl}, f)
+        except OSError as exc:
+            self.logger.debug(f"Non-critical exception http cache write: {exc}")
+
+    def prune_cache(self):
+        """Elimina le voci più vecchie finché la cache supera cache_max_mb."""
+        if not self.cache_dir:
+            return
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for n in names:
+                if n.endswith(".bin"):
+                    p = os.path.join(root, n)
+                    try:
+                        st = os.stat(p)
+                        files.append((st.st_mtime, st.st_size, p))
+                    except OSError:
+                        pass
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files):
+            if total <= self.cache_max_bytes:
+                break
+            for victim in (p, p[:-4] + ".json"):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            total -= size
+
+    # ------------------------------------------------------------------
+    #  Playwright wiring
+    # ------------------------------------------------------------------
+    def route_pattern(self):
+        """Regex delle URL da intercettare; None se non c'è nulla da bloccare né da cachare."""
+        types = set(self.block_types)
+        if self.cache_dir:
+            types.update(CACHEABLE_TYPES)
+        exts = [e for t in sorted(types) for e in TYPE_EXTENSIONS.get(t, ())]
+        parts = [re.escape(p) for p in self.block_patterns]
+        if exts:
+            parts.append(r"\.(?:%s)(?:[?#]|$)" % "|".join(exts))
+        return re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+    def install(self, context):
+        pattern = self.route_pattern()
+        if pattern is not None:
+            context.route(pattern, self._handle)
+        self.prune_cache()
+
+    def _page_stats(self, request):
+        try:
+            page = request.frame.page
+        except Exception:
+            page = None
+        key = id(page)
+        with self._lock:
+            st = self._pages.get(key)
+            if st is None:
+                st = self._pages[key] = {"url": "", "blocked": {}, "bytes_saved_est": 0,
+                                         "bytes_from_cache": 0, "bytes_fetched": 0, "cache_hits": 0}
+                if page is not None:
+                    # id() viene riusato dopo la chiusura: le statistiche muoiono con la pagina
+                    page.on("close", lambda _page, key=key: self._drop_page(key))
+            if request.resource_type == "document" and page is not None and request.frame == page.main_frame:
+                st["url"] = request.url
+        return st
+
+    def _drop_page(self, key):
+        with self._lock:
+            self._pages.pop(key, None)
+
+    def _handle(self, route, request):
+        rtype = request.resource_type
+        url = request.url
+        try:
+            st = self._page_stats(request)
+            if self.should_block(url, rtype):
+                with self._lock:
+                    st["blocked"][rtype] = st["blocked"].get(rtype, 0) + 1
+                    st["bytes_saved_est"] += EST_BYTES.get(rtype, EST_BYTES["other"])
+                route.abort("blockedbyclient")
+                return
+
+            if self.is_cacheable(request.method, rtype):
+                hit = self.cache_get(url)
+                if hit:
+                    meta, body = hit
+                    with self._lock:
+                        st["cache_hits"] += 1
+                        st["bytes_from_cache"] += len(body)
+                    route.fulfill(status=meta["status"], headers=meta["headers"], body=body)
+                    return
+                response = route.fetch()
+                body = response.body()
+                headers = response.headers
+                ttl = self.cache_ttl(headers)
+                if response.status == 200 and ttl > 0:
+                    self.cache_put(url, response.status, headers, body, ttl)
+                with self._lock:
+                    st["bytes_fetched"] += len(body)
+                route.fulfill(response=response, body=body)
+                return
+
+            route.continue_()
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception resource route: {exc}")
+            try:
+                route.continue_()
+            except Exception:
+                pass
+
+    def report(self, page=None):
+        """Statistiche per pagina (o di una sola pagina se indicata)."""
+        with self._lock:
+            if page is not None:
+                return dict(self._pages.get(id(page), {}))
+            return [dict(v) for v in self._pages.values()]
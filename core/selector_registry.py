@@ -0,0 +1,517 @@
+"""
+SelectorRegistry — Single source of truth for the DOM selectors used by
+DomExecutorPlaywright.
+
+Sources (highest priority first):
+  1. SelectorManager (UI tab "Selettori", ~/.superagent_data/selectors.json)
+  2. selectors_auto.yaml written by AutoMapperWorker / DOMSelfHealing
+  3. config/selectors.yaml
+  4. built-in defaults (the selectors historically hard-coded in the executor)
+  5. selectors_sites.yaml written by MultiSiteScanner: only the entries whose
+     URL has the same host as `site_url`. These are unverified first-hit
+     guesses of a batch scan, so they only fill keys no other source defines.
+
+Precedence per logical key:
+  - an entry of the vault or of selectors_auto.yaml (chosen by hand or
+    produced by healing) replaces every lower layer;
+  - a plain config/selectors.yaml entry is appended after the built-in
+    default as extra fallbacks, so a stale value never shadows a working
+    default; with `override: true` it replaces the default instead:
+        place_button:
+          selectors: ["button.my-PlaceBet"]
+          override: true
+    a key without a default is simply defined by the config entry;
+  - selectors_sites.yaml only fills keys no other source defines.
+
+Each logical key resolves to an ordered list of alternatives. Every
+alternative is checked with ai_selector_validator.validate_selector before
+use. Locators are built once per page and cached, so resolving a selector in
+the hot path is a dict lookup. Files are re-read automatically when their
+mtime changes (checked at most every RELOAD_CHECK_S seconds), so healed
+selectors take effect without a restart.
+
+`resolve()` never touches the browser: it returns the cached locator of
+the historically winning alternative, or the union of all alternatives
+when none has won yet. Hit/miss counters come from the caller's real
+outcome (`report()`, fed by DomWaiter and the executor's clicks); which
+alternative matched inside a union is found by `discover()`, queued as
+housekeeping via `schedule_discovery`. `stats()` / `export_stats()` expose
+the counters so dead alternatives can be pruned.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+import yaml
+
+from core.config_paths import CONFIG_DIR, SELECTORS_FILE
+from core.ai_selector_validator import validate_selector
+
+AUTO_SELECTORS_FILE = CONFIG_DIR / "selectors_auto.yaml"
+# Mapping per sito di MultiSiteScanner: {url: {campo: selettore}}
+SITES_SELECTORS_FILE = CONFIG_DIR / "selectors_sites.yaml"
+
+DEFAULT_SELECTORS = {
+    "login_prompt":     ["text='Accedi'", "text='Login'"],
+    "balance":          [".hm-Balance"],
+    "login_button":     [".hm-MainHeaderRHSLoggedOutWide_Login", "text='Login'", "text='Accedi'"],
+    "login_username":   [".lms-StandardLogin_Username", "input[type='text']"],
+    "login_password":   [".lms-StandardLogin_Password", "input[type='password']"],
+    "login_submit":     [".lms-LoginButton"],
+    "search_button":    [".hm-MainHeaderCentreWide_SearchIcon", ".hm-MainHeader_SearchIcon"],
+    "search_input":     ["input.hm-MainHeaderCentreWide_SearchInput", "input.sml-SearchInput"],
+    "search_result":    [".sml-SearchParticipant_Name", ".sml-EventParticipant"],
+    "odds_value":       [".gl-Participant_General > .gl-Participant_Odds"],
+    "odds_button":      [".gl-Participant_Odds"],
+    "bet_slip":         [".bs-BetSlip", ".bs-Content"],
+    "betslip_status":   [".bs-MessageContainer", ".bs-Footer_Message", ".bs-BetSlip", ".bs-Content"],
+    "stake_input":      ["input.bs-Stake_Input", "input.st-Stake_Input"],
+    "betslip_close":    [".bs-BetSlipHeader_Close"],
+    "place_button":     ["button.bs-PlaceBetButton", "button.st-PlaceBetButton"],
+    "receipt":          [".bs-Receipt", ".st-Receipt"],
+    "receipt_done":     ["button.bs-Receipt_Done"],
+    "my_bets_button":   [".hm-MainHeaderCentreWide_MyBets", ".hm-MainHeader_MyBets"],
+    "open_bets_tab":    ["text='In corso'", "text='Open'"],
+    "open_bet_item":    [".myb-BetItem", ".myb-BetParticipant"],
+    "open_bets_empty":  [".myb-NoBetsMessage", ".myb-MyBetsEmpty"],
+    "my_bets_close":    [".myb-CloseButton", ".myb-MyBetsHeader_CloseButton"],
+    "settled_tab":      ["text='Risolute'", "text='Settled'"],
+    "settled_bet_item": [".myb-SettledBetItem", ".myb-BetItem"],
+    "settled_payout":   [".myb-BetItem_Return", ".myb-SettledBetItem_Returns"],
+}
+
+# Nomi usati da selectors.yaml / AutoMapper / UI → chiave logica del registry
+KEY_ALIASES = {
+    "bet_button": "place_button",
+    "search_box": "search_input",
+    "pulsante_scommetti": "place_button",
+    "pulsante_quota": "odds_button",
+}
+
+
+def site_host(url) -> str:
+    """Host di un URL senza 'www.' (bet365.it e www.bet365.it sono lo stesso sito)."""
+    url = str(url or "")
+    host = urlparse(url if "//" in url else f"//{url}").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [str(value).strip()] if str(value).strip() else []
+
+
+class SelectorRegistry:
+    RELOAD_CHECK_S = 2.0
+
+    def __init__(self, logger=None, bookmaker=None, site_url=None, config_file=None, auto_file=None,
+                 sites_file=None, manual_file=None):
+        self.logger = logger or logging.getLogger("SelectorRegistry")
+        self.bookmaker = bookmaker
+        self.site_url = site_url
+        self.config_file = str(config_file or SELECTORS_FILE)
+        self.auto_file = str(auto_file or AUTO_SELECTORS_FILE)
+        self.sites_file = str(sites_file or SITES_SELECTORS_FILE)
+        self.manual_file = manual_file
+        self._lock = threading.RLock()
+        self._alternatives = {}
+        self._mtimes = {}
+        self._next_check = 0.0
+        self._cache_page = None
+        self._cache = {}
+        self._stats = {}
+        self._winner = {}
+        self._origin = {}       # id(locator) restituito da resolve() -> (chiave, alternativa o None se unione)
+        self._pending = {}      # chiave da (ri)scoprire -> URL della pagina che ha prodotto l'esito
+        # Callable senza argomenti che accoda discover() fuori dal percorso critico (impostato dall'executor)
+        self.schedule_discovery = None
+        self.rejected = {}
+        self.reload()
+
+    # ------------------------------------------------------------------
+    #  Loading
+    # ------------------------------------------------------------------
+    def _manual_path(self):
+        if self.manual_file:
+            return str(self.manual_file)
+        try:
+            from core.secure_storage import SELECTORS_FILE as MANUAL_FILE
+            self.manual_file = MANUAL_FILE
+            return str(MANUAL_FILE)
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception selector vault path: {exc}")
+            return None
+
+    def _watched_files(self):
+        return [p for p in (self.config_file, self.sites_file, self.auto_file, self._manual_path()) if p]
+
+    def _read_yaml(self, path):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            return data if isinstance(data, dict) else {}
+        except Exception as exc:
+            self.logger.warning(f"⚠️ Selettori illeggibili in {path}: {exc}")
+            return {}
+
+    def _read_manual(self, path):
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            from core.secure_storage import _load
+            entries = _load(path, [])
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception selector vault: {exc}")
+            return {}
+        out = {}
+        for entry in entries or []:
+            if not isinstance(entry, dict):
+                continue
+            book = entry.get("bookmaker")
+            if self.bookmaker and book and str(book).lower() != str(self.bookmaker).lower():
+                continue
+            key = entry.get("id") or str(entry.get("name", "")).lower().replace(" ", "_")
+            if key:
+                out.setdefault(key, []).extend(_as_list(entry.get("value")))
+        return out
+
+    def _read_sites(self, path):
+        """Voci di selectors_sites.yaml per il sito corrente (stesso host di site_url)."""
+        host = site_host(self.site_url)
+        if not host:
+            return {}
+        out = {}
+        for url, fields in self._read_yaml(path).items():
+            if site_host(url) != host or not isinstance(fields, dict):
+                continue
+            for key, value in fields.items():
+                bucket = out.setdefault(key, [])
+                bucket.extend(v for v in _as_list(value) if v not in bucket)
+        return out
+
+    @staticmethod
+    def _entry(value):
+        """(alternative, override) da una voce: valore/lista o {selectors: [...], override: true}."""
+        if isinstance(value, dict):
+            return _as_list(value.get("selectors", value.get("value"))), bool(value.get("override"))
+        return _as_list(value), False
+
+    def _layer(self, data, rejected):
+        """{chiave logica: ([alternative valide], override)} per una sorgente; gli scarti in `rejected`."""
+        out = {}
+        for raw_key, value in data.items():
+            key = KEY_ALIASES.get(str(raw_key), str(raw_key))
+            alts, override = self._entry(value)
+            bucket, prev_override = out.get(key, ([], False))
+            for alt in alts:
+                if alt in bucket:
+                    continue
+                if not validate_selector(alt):
+                    rejected.setdefault(key, []).append(alt)
+                    continue
+                bucket.append(alt)
+            if bucket:
+                out[key] = (bucket, override or prev_override)
+        return out
+
+    def reload(self):
+        """Rilegge tutte le sorgenti, valida i selettori e svuota la cache dei locator."""
+        rejected = {}
+        manual = self._layer(self._read_manual(self._manual_path()), rejected)
+        auto = self._layer(self._read_yaml(self.auto_file), rejected)
+        config = self._layer(self._read_yaml(self.config_file), rejected)
+        defaults = self._layer(DEFAULT_SELECTORS, rejected)
+        sites = self._layer(self._read_sites(self.sites_file), rejected)
+
+        merged = {}
+        for key in {**manual, **auto, **config, **defaults, **sites}:
+            if key in manual or key in auto:
+                # Selettori scelti a mano o curati dall'healing: sostituiscono il resto
+                merged[key] = (manual.get(key) or auto[key])[0]
+            elif key in config and (config[key][1] or key not in defaults):
+                merged[key] = config[key][0]
+            elif key in defaults:
+                # Voce di config senza override: fallback in coda al default, mai davanti
+                extra = config.get(key, ((), False))[0]
+                merged[key] = defaults[key][0] + [alt for alt in extra if alt not in defaults[key][0]]
+            else:
+                merged[key] = sites[key][0]
+
+        with self._lock:
+            self._alternatives = {k: v for k, v in merged.items() if v}
+            self.rejected = rejected
+            self._mtimes = {p: self._mtime(p) for p in self._watched_files()}
+            self._cache = {}
+            self._origin = {}
+            self._cache_page = None
+            self._next_check = time.monotonic() + self.RELOAD_CHECK_S
+
+        for key, bad in rejected.items():
+            self.logger.warning(f"⛔ Selettore non valido scartato [{key}]: {bad}")
+        self.logger.info(f"🧩 Selector registry caricato: {len(self._alternatives)} chiavi")
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.RELOAD_CHECK_S
+        changed = any(self._mtime(p) != self._mtimes.get(p) for p in self._watched_files())
+        if changed:
+            self.logger.info("♻️ File selettori modificati → hot reload")
+            self.reload()
+
+    # ------------------------------------------------------------------
+    #  Resolution
+    # ------------------------------------------------------------------
+    def keys(self):
+        return list(self._alternatives)
+
+    def alternatives(self, key) -> list:
+        self._maybe_reload()
+        alts = self._alternatives.get(KEY_ALIASES.get(key, key))
+        if not alts:
+            raise KeyError(f"Selettore sconosciuto: {key}")
+        return list(alts)
+
+    def selector(self, key) -> str:
+        """Selettore come stringa unica (alternative separate da virgola)."""
+        return ", ".join(self.alternatives(key))
+
+    def _build(self, root, alts):
+        loc = root.locator(alts[0])
+        for alt in alts[1:]:
+            loc = loc.or_(root.locator(alt))
+        return loc
+
+    def locator(self, page, key, first=False, root=None):
+        """Locator (unione delle alternative) per `key`, costruito una volta per pagina.
+
+        Con `root` (un Locator) costruisce un locator annidato, non cachato.
+        """
+        if root is not None:
+            loc = self._build(root, self.alternatives(key))
+            return loc.first if first else loc
+
+        self._maybe_reload()
+        with self._lock:
+            if self._cache_page is not page:
+                self._cache_page = page
+                self._cache = {}
+                self._origin = {}
+            cache_key = (key, first)
+            loc = self._cache.get(cache_key)
+            if loc is None:
+                loc = self._build(page, self.alternatives(key))
+                if first:
+                    loc = loc.first
+                self._cache[cache_key] = loc
+            return loc
+
+    # ------------------------------------------------------------------
+    #  Ordered fallback chain + hit statistics
+    # ------------------------------------------------------------------
+    def ordered(self, key) -> list:
+        """Ultima alternativa vincente in testa, poi per successi storici (a parità: priorità sorgente)."""
+        key = KEY_ALIASES.get(key, key)
+        alts = self.alternatives(key)
+        stats = self._stats.get(key, {})
+        winner = self._winner.get(key)
+        return sorted(alts, key=lambda a: (a != winner, -stats.get(a, (0, 0, 0.0))[0], stats.get(a, (0, 0, 0.0))[1]))
+
+    def _single(self, page, alt, first):
+        cache_key = ("alt", alt, first)
+        loc = self._cache.get(cache_key)
+        if loc is None:
+            loc = page.locator(alt)
+            if first:
+                loc = loc.first
+            self._cache[cache_key] = loc
+        return loc
+
+    def _record(self, key, alt, hit, elapsed_ms):
+        with self._lock:
+            hits, misses, total_ms = self._stats.setdefault(key, {}).get(alt, (0, 0, 0.0))
+            self._stats[key][alt] = (hits + (1 if hit else 0), misses + (0 if hit else 1), total_ms + elapsed_ms)
+            if hit:
+                self._winner[key] = alt
+
+    def resolve(self, page, key, first=False):
+        """Locator per `key` senza round-trip al browser.
+
+        Se un'alternativa ha già vinto torna quella da sola, altrimenti l'unione.
+        Le statistiche arrivano dall'esito reale dell'uso (report()) e
+        l'alternativa vincente di un'unione si individua fuori dal percorso
+        critico (discover()).
+        """
+        key = KEY_ALIASES.get(key, key)
+        alts = self.alternatives(key)
+        with self._lock:
+            if self._cache_page is not page:
+                self._cache_page = page
+                self._cache = {}
+                self._origin = {}
+            winner = self._winner.get(key)
+            if len(alts) > 1 and winner in alts:
+                loc = self._single(page, winner, first)
+                self._origin[id(loc)] = (key, winner)
+                return loc
+        loc = self.locator(page, key, first=first)
+        with self._lock:
+            self._origin[id(loc)] = (key, None if len(alts) > 1 else alts[0])
+        return loc
+
+    @staticmethod
+    def _page_url(locator):
+        try:
+            return locator.page.url
+        except Exception:
+            return None
+
+    def report(self, locator, ok, elapsed_ms=0.0):
+        """Esito di un uso reale (attesa/click) di un locator tornato da resolve().
+
+        Un fallimento conta come miss solo se il locator non risolve a nessun
+        elemento: un pulsante presente ma disabilitato o nascosto non è un
+        selettore rotto.
+        """
+        origin = self._origin.get(id(locator))
+        if origin is None:
+            return
+        if not ok:
+            try:
+                if locator.count() > 0:
+                    return
+            except Exception as exc:
+                self.logger.debug(f"Non-critical exception selector miss check: {exc}")
+                return
+        key, alt = origin
+        url = self._page_url(locator)
+        if alt is not None:
+            self._record(key, alt, ok, elapsed_ms)
+            if not ok and len(self._alternatives.get(key, ())) > 1:
+                with self._lock:
+                    # Il vincente non risponde più: si torna all'unione e si ricerca il nuovo
+                    if self._winner.get(key) == alt:
+                        self._winner.pop(key, None)
+                    self._pending[key] = url
+        elif ok:
+            with self._lock:
+                self._pending[key] = url
+        if self._pending and self.schedule_discovery:
+            try:
+                self.schedule_discovery()
+            except Exception as exc:
+                self.logger.debug(f"Non-critical exception schedule discovery: {exc}")
+
+    def pending_discovery(self) -> list:
+        return sorted(self._pending)
+
+    def discover(self, page, max_keys=8):
+        """Individua quale alternativa matcha per le chiavi in attesa (lavoro di housekeeping).
+
+        Le alternative CSS sono contate in un solo page.evaluate; i motori
+        Playwright (text=...) con locator.count(). Una chiave la cui richiesta
+        è nata su un altro URL viene scartata: la pagina non è più quella del miss.
+        """
+        with self._lock:
+            queued = {k: self._pending.pop(k) for k in sorted(self._pending)[:max_keys]}
+        if not queued or page is None:
+            return {}
+        try:
+            current = page.url
+        except Exception:
+            current = None
+        keys = [k for k, url in queued.items() if url is None or url == current]
+        if len(keys) < len(queued):
+            self.logger.debug(f"🔁 Discovery saltata (URL cambiato): {sorted(set(queued) - set(keys))}")
+        from core.dom_probe import css_only
+        chains = {k: self.ordered(k) for k in keys if k in self._alternatives}
+        css = sorted({a for chain in chains.values() for a in css_only(chain)})
+        started = time.monotonic()
+        try:
+            counts = page.evaluate(
+                "(sels) => Object.fromEntries(sels.map(s => { try { return [s, document.querySelectorAll(s).length]; }"
+                " catch (e) { return [s, 0]; } }))", css) if css else {}
+        except Exception as exc:
+            self.logger.debug(f"Non-critical exception selector discover: {exc}")
+            counts = {}
+        css_ms = (time.monotonic() - started) * 1000 / max(1, len(css))
+
+        found = {}
+        for key, chain in chains.items():
+            for alt in chain:
+                if alt in counts:
+                    hit, elapsed = counts[alt] > 0, css_ms
+                else:
+                    t0 = time.monotonic()
+                    try:
+                        hit = page.locator(alt).count() > 0
+                    except Exception:
+                        hit = False
+                    elapsed = (time.monotonic() - t0) * 1000
+                self._record(key, alt, hit, elapsed)
+                if hit:
+                    found[key] = alt
+                    self.logger.debug(f"🔁 Selettore [{key}] vincente ora: {alt}")
+                    break
+        return found
+
+    def stats(self) -> dict:
+        """{chiave: [{selector, hits, misses, hit_rate, avg_ms}]} nell'ordine di prova attuale."""
+        out = {}
+        with self._lock:
+            snapshot = {k: dict(v) for k, v in self._stats.items()}
+        for key, per_alt in snapshot.items():
+            rows = []
+            for alt in self.ordered(key) if key in self._alternatives else per_alt:
+                hits, misses, total_ms = per_alt.get(alt, (0, 0, 0.0))
+                checks = hits + misses
+                rows.append({
+                    "selector": alt,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / checks, 3) if checks else None,
+                    "avg_ms": round(total_ms / checks, 2) if checks else None,
+                })
+            out[key] = rows
+        return out
+
+    def dead_alternatives(self, min_checks=20) -> dict:
+        """Alternative mai vincenti per chiavi con almeno `min_checks` risoluzioni discriminanti."""
+        dead = {}
+        for key, rows in self.stats().items():
+            checks = sum(r["hits"] for r in rows)
+            if checks < min_checks:
+                continue
+            losers = [r["selector"] for r in rows if r["hits"] == 0]
+            if losers:
+                dead[key] = losers
+        return dead
+
+    def export_stats(self, path=None) -> str:
+        path = str(path or os.path.join("logs", "selector_stats.json"))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"stats": self.stats(), "dead": self.dead_alternatives()}, f, indent=4)
+        return path
+
+    def invalidate(self):
+        with self._lock:
+            self._cache = {}
+            self._origin = {}
+            self._cache_page = None
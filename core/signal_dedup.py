@@ -0,0 +1,165 @@
+"""
+SignalDeduplicator — Near-duplicate suppression for incoming Telegram signals.
+
+The same tip often arrives from several selected_chats, or as an edit of a
+message a few seconds later. Every copy would otherwise go through robot
+matching and ExecutionEngine.process_signal, burning browser time before the
+open-bet check rejects it.
+
+Each signal is reduced to:
+  - a structural key: normalized (teams, market, score)
+  - a 64-bit SimHash of the raw text
+
+Two signals are duplicates when they share the structural key and their
+SimHashes differ by at most `max_distance` bits, inside a sliding time window.
+Entries live in a time-bounded ring (deque) with a per-key bucket index, so a
+lookup only compares against signals with the same key.
+
+Only a signal that becomes a bet enters the window: the controller checks
+after robot matching and registers the payload only when it names a match
+(`is_bet`), so chatter or an unparseable message never suppresses the real
+tip that follows.
+"""
+import re
+import time
+import hashlib
+import threading
+import logging
+from collections import deque
+
+from core.signal_parser import TelegramSignalParser
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_SCORE_RE = re.compile(r"(\d+)\s*-\s*(\d+)")
+# Segnaposto del Controller per i messaggi arrivati come testo grezzo
+_PLACEHOLDER_TEAMS = "analisi auto"
+_parser = TelegramSignalParser()
+
+
+def _normalize(value) -> str:
+    return " ".join(_TOKEN_RE.findall(str(value or "").lower()))
+
+
+def simhash64(text: str) -> int:
+    """64-bit SimHash over word tokens (and word bigrams for word order)."""
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    if not tokens:
+        return 0
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * 64
+    for feat in features:
+        h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming64(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SignalDeduplicator:
+    DEFAULT_WINDOW_S = 90.0
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_MAX_DISTANCE = 6
+
+    def __init__(self, window_s=None, max_entries=None, max_distance=None, logger=None):
+        self.logger = logger or logging.getLogger("SignalDedup")
+        self.window_s = float(window_s if window_s is not None else self.DEFAULT_WINDOW_S)
+        self.max_distance = int(max_distance if max_distance is not None else self.DEFAULT_MAX_DISTANCE)
+        self._ring = deque(maxlen=int(max_entries or self.DEFAULT_MAX_ENTRIES))
+        self._index = {}
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.dropped = 0
+
+    @staticmethod
+    def signal_key(payload) -> tuple:
+        teams = _normalize(payload.get("teams", ""))
+        market = _normalize(payload.get("market", ""))
+        score = payload.get("score", "")
+        if not score:
+            m = _SCORE_RE.search(payload.get("raw_text", "") or "")
+            score = f"{m.group(1)}-{m.group(2)}" if m else ""
+        return (teams, market, _normalize(score))
+
+    @staticmethod
+    def queue_key(payload):
+        """Chiave di coalescenza in coda: segnali con la stessa chiave ancora in coda → resta il più recente.
+
+        Partita del payload o, per il testo grezzo, quella estratta dal messaggio;
+        se non si ricava, hash del testo normalizzato (coalescono solo copie identiche).
+        """
+        teams = _normalize(payload.get("teams", ""))
+        raw = payload.get("raw_text", "") or ""
+        if (not teams or teams == _PLACEHOLDER_TEAMS) and raw:
+            teams = _normalize(_parser.parse(raw).get("teams", ""))
+            if not teams:
+                text = _normalize(raw)
+                return ("text", hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()) if text else None
+        if not teams or teams == _PLACEHOLDER_TEAMS:
+            return None
+        return ("live", teams)
+
+    def _evict(self, now):
+        # Scadenza per tempo: il ring è ordinato per timestamp di inserimento
+        while self._ring and now - self._ring[0][0] > self.window_s:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        ts, key, fp = self._ring.popleft()
+        bucket = self._index.get(key)
+        if bucket:
+            try:
+                bucket.remove((ts, fp))
+            except ValueError:
+                pass
+            if not bucket:
+                del self._index[key]
+
+    @staticmethod
+    def is_bet(payload) -> bool:
+        """Il segnale individua una partita (teams nel payload o estraibili dal testo grezzo)?"""
+        teams = _normalize(payload.get("teams", ""))
+        if teams and teams != _PLACEHOLDER_TEAMS:
+            return True
+        return bool(_normalize(_parser.parse(payload.get("raw_text", "") or "").get("teams", "")))
+
+    def is_duplicate(self, payload, now=None, register=True) -> bool:
+        """Returns True if the payload duplicates a recent signal; otherwise registers it (if `register`)."""
+        if isinstance(payload, str):
+            payload = {"raw_text": payload}
+        now = time.monotonic() if now is None else now
+        key = self.signal_key(payload)
+        text = payload.get("raw_text") or f"{payload.get('teams', '')} {payload.get('market', '')}"
+        fp = simhash64(text)
+
+        with self._lock:
+            self.seen += 1
+            self._evict(now)
+            for ts, other in self._index.get(key, ()):
+                if hamming64(fp, other) <= self.max_distance:
+                    self.dropped += 1
+                    self.logger.info(f"♻️ Segnale duplicato scartato ({now - ts:.1f}s dopo l'originale): {key}")
+                    return True
+
+            if not register:
+                return False
+            if len(self._ring) == self._ring.maxlen:
+                self._drop_oldest()
+            self._ring.append((now, key, fp))
+            self._index.setdefault(key, []).append((now, fp))
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"seen": self.seen, "dropped": self.dropped, "tracked": len(self._ring)}
+
+    def clear(self):
+        with self._lock:
+            self._ring.clear()
+            self._index.clear()
@@ -0,0 +1,325 @@
+"""
+Staking — Pluggable stake strategies for MoneyManager.
+
+Every strategy answers the same two questions, once per bet:
+    stake(bankroll, odds, state)     -> stake amount
+    update(state, won, bankroll)     -> state after the bet is settled
+
+`state` is a small JSON-able dict (progression step, cycle unit); the
+MoneyManager keeps it per robot and persists it in the DB, so a restart
+resumes a progression where it stopped.
+
+Shipped strategies (robot config `mm_mode` / `stake_value`; a robot from the
+robots tab only has `stake`, "Stake Fisso (€)", and runs as FixedStake):
+  - FixedStake        "Fisso (€)"            stake_value euro per bet
+  - PercentageStake   "Percentuale (%)"      stake_value % of bankroll (default: 5%, max 50€)
+  - KellyStake        "Kelly"                fractional Kelly on an assumed edge over the odds
+  - ProgressionStake  "Roserpina (Progressione)"
+                      loss-recovery progression; the stake multipliers are
+                      precomputed once per configuration at a reference odds,
+                      so the hot path is a table lookup
+
+Each strategy also has a vectorized twin (stake_vec / update_vec) working on
+NumPy arrays, one element per simulated path; simulate() runs a strategy
+over a sequence of (odds, outcome) with the same rules, e.g. the journal
+history or the paths generated by core.bankroll_sim. A single history runs
+through the scalar methods (no per-element NumPy overhead: ~5k bets in a
+few ms); many paths run through the vectorized ones, one step at a time.
+"""
+import functools
+import logging
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Chiavi di un robot (vault / tab Robot) rilevanti per lo staking
+STAKING_KEYS = ("mm_mode", "stake_value", "stake", "mode", "fraction", "edge", "cap",
+                "unit", "unit_pct", "ref_odds", "max_steps")
+
+class StakingStrategy:
+    name = "base"
+
+    def config(self) -> dict:
+        """Parametri che identificano la strategia (salvati insieme allo stato)."""
+        return {"mode": self.name}
+
+    def initial_state(self, bankroll: float) -> dict:
+        return {}
+
+    def stake(self, bankroll: float, odds: float, state: dict) -> float:
+        raise NotImplementedError
+
+    def update(self, state: dict, won: bool, bankroll: float) -> dict:
+        return state
+
+    # --- Versione vettoriale (un elemento per percorso simulato) ---
+    def initial_state_vec(self, bankroll):
+        return {}
+
+    def stake_vec(self, bankroll, odds, state):
+        raise NotImplementedError
+
+    def update_vec(self, state, won, bankroll):
+        return state
+
+
+class FixedStake(StakingStrategy):
+    name = "fixed"
+
+    def __init__(self, amount: float):
+        self.amount = max(0.0, float(amount))
+
+    def config(self):
+        return {"mode": self.name, "amount": self.amount}
+
+    def stake(self, bankroll, odds, state):
+        return round(min(self.amount, max(bankroll, 0.0)), 2)
+
+    def stake_vec(self, bankroll, odds, state):
+        return np.minimum(self.amount, np.maximum(bankroll, 0.0))
+
+
+class PercentageStake(StakingStrategy):
+    name = "percentage"
+
+    def __init__(self, fraction: float = 0.05, cap: float = 50.0):
+        self.fraction = max(0.0, float(fraction))
+        self.cap = float(cap) if cap else None
+
+    def config(self):
+        return {"mode": self.name, "fraction": self.fraction, "cap": self.cap}
+
+    def stake(self, bankroll, odds, state):
+        stake = max(bankroll, 0.0) * self.fraction
+        if self.cap is not None:
+            stake = min(stake, self.cap)
+        return round(stake, 2)
+
+    def stake_vec(self, bankroll, odds, state):
+        stake = np.maximum(bankroll, 0.0) * self.fraction
+        return np.minimum(stake, self.cap) if self.cap is not None else stake
+
+
+class KellyStake(StakingStrategy):
+    """Kelly frazionario. Senza un modello di probabilità si assume un margine
+    `edge` sulla probabilità implicita della quota: p = (1 + edge) / odds,
+    quindi f* = edge / (odds - 1)."""
+    name = "kelly"
+
+    def __init__(self, fraction: float = 0.25, edge: float = 0.03, cap: float = None):
+        self.fraction = max(0.0, float(fraction))
+        self.edge = float(edge)
+        self.cap = float(cap) if cap else None
+
+    def config(self):
+        return {"mode": self.name, "fraction": self.fraction, "edge": self.edge, "cap": self.cap}
+
+    def stake(self, bankroll, odds, state):
+        if odds <= 1.0 or self.edge <= 0:
+            return 0.0
+        stake = max(bankroll, 0.0) * self.fraction * self.edge / (odds - 1.0)
+        if self.cap is not None:
+            stake = min(stake, self.cap)
+        return round(stake, 2)
+
+    def stake_vec(self, bankroll, odds, state):
+        if self.edge <= 0:
+            return np.zeros_like(bankroll, dtype=float)
+        margin = np.where(odds > 1.0, odds - 1.0, np.inf)
+        stake = np.maximum(bankroll, 0.0) * self.fraction * self.edge / margin
+        return np.minimum(stake, self.cap) if self.cap is not None else stake
+
+
+@functools.lru_cache(maxsize=64)
+def progression_table(ref_odds: float, max_steps: int) -> tuple:
+    """Moltiplicatori dell'unità per step: ogni puntata, vinta a `ref_odds`,
+    recupera le perdite del ciclo e guadagna (ref_odds - 1) unità nette
+    (una sola unità a quota 2.0)."""
+    margin = ref_odds - 1.0
+    table = []
+    lost = 0.0
+    for _ in range(max_steps):
+        mult = (lost + margin) / margin
+        table.append(round(mult, 6))
+        lost += mult
+    return tuple(table)
+
+
+class ProgressionStake(StakingStrategy):
+    """Progressione a recupero (stile Roserpina).
+
+    L'unità del ciclo è `unit` euro oppure, se 0, `unit_pct` del bankroll a
+    inizio ciclo. Una vincita chiude il ciclo; dopo `max_steps` perdite
+    consecutive il ciclo si chiude in perdita (stop loss) e si riparte.
+    """
+    name = "progression"
+
+    def __init__(self, unit: float = 0.0, unit_pct: float = 0.01, ref_odds: float = 2.0,
+                 max_steps: int = 6, cap: float = None):
+        self.unit = max(0.0, float(unit or 0.0))
+        self.unit_pct = max(0.0, float(unit_pct))
+        self.ref_odds = max(1.01, float(ref_odds))
+        self.max_steps = max(1, int(max_steps))
+        self.cap = float(cap) if cap else None
+        self.table = progression_table(self.ref_odds, self.max_steps)
+        if NUMPY_AVAILABLE:
+            self._table_arr = np.asarray(self.table)
+
+    def config(self):
+        return {"mode": self.name, "unit": self.unit, "unit_pct": self.unit_pct,
+                "ref_odds": self.ref_odds, "max_steps": self.max_steps, "cap": self.cap}
+
+    def _unit_for(self, bankroll):
+        return self.unit or max(bankroll, 0.0) * self.unit_pct
+
+    def initial_state(self, bankroll):
+        return {"step": 0, "unit": round(self._unit_for(bankroll), 2)}
+
+    def stake(self, bankroll, odds, state):
+        step = int(state.get("step", 0))
+        unit = state.get("unit") or self._unit_for(bankroll)
+        stake = unit * self.table[min(step, self.max_steps - 1)]
+        if self.cap is not None:
+            stake = min(stake, self.cap)
+        return round(min(stake, max(bankroll, 0.0)), 2)
+
+    def update(self, state, won, bankroll):
+        step = int(state.get("step", 0)) + 1
+        if won or step >= self.max_steps:
+            return self.initial_state(bankroll)
+        return {"step": step, "unit": state.get("unit") or round(self._unit_for(bankroll), 2)}
+
+    def initial_state_vec(self, bankroll):
+        bankroll = np.asarray(bankroll, dtype=float)
+        return {"step": np.zeros(bankroll.shape, dtype=np.int64),
+                "unit": np.broadcast_to(self._unit_for_vec(bankroll), bankroll.shape).copy()}
+
+    def _unit_for_vec(self, bankroll):
+        if self.unit:
+            return np.full_like(bankroll, self.unit)
+        return np.round(np.maximum(bankroll, 0.0) * self.unit_pct, 2)
+
+    def stake_vec(self, bankroll, odds, state):
+        stake = state["unit"] * self._table_arr[state["step"]]
+        if self.cap is not None:
+            stake = np.minimum(stake, self.cap)
+        return np.minimum(stake, np.maximum(bankroll, 0.0))
+
+    def update_vec(self, state, won, bankroll):
+        step = state["step"] + 1
+        reset = won | (step >= self.max_steps)
+        return {"step": np.where(reset, 0, step),
+                "unit": np.where(reset, self._unit_for_vec(bankroll), state["unit"])}
+
+
+DEFAULT_STRATEGY = PercentageStake()
+
+
+def _mode_of(mm_mode: str) -> str:
+    mode = (mm_mode or "").lower()
+    if "fiss" in mode or "fixed" in mode:
+        return "fixed"
+    if "kelly" in mode:
+        return "kelly"
+    if "roserpina" in mode or "progress" in mode:
+        return "progression"
+    if "%" in mode or "percent" in mode:
+        return "percentage"
+    return ""
+
+
+def strategy_from_config(robot: dict, logger=None) -> StakingStrategy:
+    """Strategia dalla configurazione di un robot (mm_mode, stake_value, parametri opzionali).
+
+    Un robot del tab Robot ha solo `stake` (stake fisso in euro): equivale a
+    mm_mode "Fisso (€)" con stake_value = stake.
+    """
+    robot = robot or {}
+    mode = robot.get("mode") or _mode_of(robot.get("mm_mode"))
+    if not mode and not robot.get("stake_value") and robot.get("stake") not in (None, ""):
+        mode, robot = "fixed", dict(robot, stake_value=robot["stake"])
+    try:
+        value = float(robot.get("stake_value") or robot.get("amount") or 0.0)
+        if mode == "fixed" and value > 0:
+            return FixedStake(value)
+        if mode == "percentage":
+            fraction = robot.get("fraction") or (value / 100.0 if value > 0 else None)
+            return PercentageStake(fraction or PercentageStake().fraction, robot.get("cap"))
+        if mode == "kelly":
+            return KellyStake(robot.get("fraction", 0.25), robot.get("edge", 0.03), robot.get("cap"))
+        if mode == "progression":
+            return ProgressionStake(unit=robot.get("unit", value), unit_pct=robot.get("unit_pct", 0.01),
+                                    ref_odds=robot.get("ref_odds", 2.0), max_steps=robot.get("max_steps", 6),
+                                    cap=robot.get("cap"))
+    except (TypeError, ValueError) as exc:
+        (logger or logging.getLogger("Staking")).warning(f"Config staking non valida {robot.get('name')}: {exc}")
+        return DEFAULT_STRATEGY
+    if mode:
+        (logger or logging.getLogger("Staking")).warning(
+            f"mm_mode '{robot.get('mm_mode')}' senza stake_value valido: uso la percentuale standard")
+    return DEFAULT_STRATEGY
+
+
+def simulate(strategy: StakingStrategy, odds, won, bankroll: float = 1000.0, stop_below: float = 0.01) -> dict:
+    """Applica `strategy` a una sequenza di scommesse, vettoriale sui percorsi.
+
+    odds / won: array (n_bets,) per un solo storico o (n_paths, n_bets).
+    Ritorna {"bankroll": curve (n_paths, n_bets + 1), "stakes": (n_paths, n_bets)}.
+    Un percorso sotto `stop_below` smette di puntare (rovina).
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("NumPy non installato: simulazione non disponibile")
+    odds = np.atleast_2d(np.asarray(odds, dtype=float))
+    won = np.atleast_2d(np.asarray(won, dtype=bool))
+    if odds.shape != won.shape:
+        odds = np.broadcast_to(odds, won.shape)
+    n_paths, n_bets = won.shape
+    if n_paths == 1:
+        return _simulate_single(strategy, odds[0], won[0], float(bankroll), stop_below)
+
+    curve = np.empty((n_paths, n_bets + 1))
+    stakes = np.zeros((n_paths, n_bets))
+    curve[:, 0] = float(bankroll)
+    for i, br, stake in iter_steps(strategy, odds, won, bankroll, stop_below):
+        stakes[:, i] = stake
+        curve[:, i + 1] = br
+    return {"bankroll": curve, "stakes": stakes}
+
+
+def iter_steps(strategy: StakingStrategy, odds, won, bankroll=1000.0, stop_below: float = 0.01):
+    """Generatore (i, bankroll dopo la scommessa i, stake) su array (n_paths, n_bets).
+
+    Per chi aggrega statistiche al volo (core.bankroll_sim) senza tenere la curva intera.
+    """
+    n_paths, n_bets = won.shape
+    br = np.broadcast_to(np.asarray(bankroll, dtype=float), (n_paths,)).copy()
+    state = strategy.initial_state_vec(br)
+    for i in range(n_bets):
+        alive = br >= stop_below
+        stake = np.where(alive, np.round(strategy.stake_vec(br, odds[:, i], state), 2), 0.0)
+        w = won[:, i]
+        br = br - stake + np.where(w, stake * odds[:, i], 0.0)
+        new_state = strategy.update_vec(state, w, br)
+        # I percorsi che non hanno puntato non avanzano la progressione
+        state = {k: np.where(alive, v, state[k]) for k, v in new_state.items()}
+        yield i, br, stake
+
+
+def _simulate_single(strategy, odds, won, bankroll, stop_below):
+    # Un solo storico: il ciclo scalare evita l'overhead NumPy per elemento (stesse regole)
+    n = len(won)
+    curve = [bankroll]
+    stakes = [0.0] * n
+    state = strategy.initial_state(bankroll)
+    br = bankroll
+    for i, (o, w) in enumerate(zip(odds.tolist(), won.tolist())):
+        if br >= stop_below:
+            stake = strategy.stake(br, o, state)
+            br = br - stake + (stake * o if w else 0.0)
+            stakes[i] = stake
+            state = strategy.update(state, w, br)
+        curve.append(br)
+    return {"bankroll": np.asarray([curve]), "stakes": np.asarray([stakes])}
@@ -1,7 +1,10 @@
 import time
+import bisect
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
-from typing import Callable, List
+from typing import Callable
 
 # 🔴 FIX PYSIDE6 IN GITHUB ACTIONS
 try:
@@ -51,71 +54,133 @@ VALID_TRANSITIONS = {
     AgentState.SHUTDOWN:     [],
 }
 
+# Tabella compilata all'import: un bit per stato, una maschera di destinazioni ammesse per stato.
+# transition() fa un AND invece di una ricerca lineare nella lista.
+STATE_BITS = {s: 1 << i for i, s in enumerate(AgentState)}
+TRANSITION_MASKS = {
+    s: sum(STATE_BITS[t] for t in set(VALID_TRANSITIONS.get(s, ()))) for s in AgentState
+}
+
+# Limiti superiori (s) dei bucket dell'istogramma del tempo passato in ogni stato
+DWELL_BUCKETS_S = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600)
+
+
 class StateManager(QObject):
+    """Macchina a stati dell'agente.
+
+    Le letture (state / is_idle / is_state) sono un semplice load di
+    attributo, atomico in CPython: nessun lock. Il lock serializza solo le
+    scritture. Ogni transizione è registrata nello storico (deque a
+    dimensione fissa) con il tempo passato nello stato precedente, finisce
+    nell'istogramma dei tempi per stato e, se è stato passato un bus, viene
+    pubblicata come evento STATE_CHANGE.
+
+    Le callback sono tuple precostruite per stato (ricostruite solo alla
+    registrazione). on_exit gira con il lock preso, prima del cambio di stato;
+    on_enter gira fuori dal lock, oppure su un thread dedicato (in ordine) se
+    registrata con background=True, così una callback lenta non blocca chi
+    ha chiamato transition().
+    """
     state_changed = Signal(object)
+    HISTORY_SIZE = 100
 
-    def __init__(self, logger, initial_state: AgentState = AgentState.BOOT):
+    def __init__(self, logger, initial_state: AgentState = AgentState.BOOT, bus=None):
         super().__init__()
         self.logger = logger
+        self.bus = bus
         self._state = initial_state
+        self._entered_at = time.monotonic()
         self._lock = threading.RLock()
-        self._on_enter_callbacks: dict[AgentState, List[Callable]] = {}
-        self._on_exit_callbacks: dict[AgentState, List[Callable]] = {}
-        self._history: list[tuple] = []
+        # stato -> tuple di (callback, background); copy-on-write alla registrazione
+        self._on_enter_callbacks: dict[AgentState, tuple] = {s: () for s in AgentState}
+        self._on_exit_callbacks: dict[AgentState, tuple] = {s: () for s in AgentState}
+        self._callback_pool = None
+        self._history: deque = deque(maxlen=self.HISTORY_SIZE)
+        # stato -> [conteggi per bucket (+ overflow), secondi totali, numero di permanenze]
+        self._dwell = {s: [[0] * (len(DWELL_BUCKETS_S) + 1), 0.0, 0] for s in AgentState}
 
     @property
     def state(self) -> AgentState:
-        with self._lock:
-            return self._state
+        return self._state
 
     @property
     def current(self) -> AgentState:
-        return self.state
+        return self._state
 
     def is_idle(self) -> bool:
-        with self._lock:
-            return self._state == AgentState.IDLE
+        return self._state is AgentState.IDLE
 
     def is_state(self, *states: AgentState) -> bool:
-        with self._lock:
-            return self._state in states
+        return self._state in states
 
-    def on_enter(self, state: AgentState, callback: Callable):
-        self._on_enter_callbacks.setdefault(state, []).append(callback)
+    def time_in_state(self) -> float:
+        """Secondi trascorsi nello stato corrente."""
+        return time.monotonic() - self._entered_at
+
+    def on_enter(self, state: AgentState, callback: Callable, background: bool = False):
+        with self._lock:
+            self._on_enter_callbacks[state] = self._on_enter_callbacks[state] + ((callback, background),)
+            if background and self._callback_pool is None:
+                # Un solo worker: le callback in background restano nell'ordine delle transizioni
+                self._callback_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="StateCallbacks")
 
     def on_exit(self, state: AgentState, callback: Callable):
-        self._on_exit_callbacks.setdefault(state, []).append(callback)
+        with self._lock:
+            self._on_exit_callbacks[state] = self._on_exit_callbacks[state] + (callback,)
+
+    def _run_callback(self, cb: Callable, kind: str):
+        try:
+            cb()
+        except Exception as e:
+            self.logger.error("[StateMachine] %s callback error (%s): %s", kind, cb, e)
 
     def transition(self, new_state: AgentState) -> bool:
         with self._lock:
             old = self._state
-            allowed = VALID_TRANSITIONS.get(old, [])
-            if new_state not in allowed:
+            if not TRANSITION_MASKS[old] & STATE_BITS[new_state]:
                 self.logger.warning("[StateMachine] Invalid transition: %s -> %s", old.name, new_state.name)
                 return False
 
-            for cb in self._on_exit_callbacks.get(old, []):
-                try:
-                    cb()
-                except Exception as e:
-                    self.logger.error("[StateMachine] on_exit callback error (%s): %s", cb, e)
+            for cb in self._on_exit_callbacks[old]:
+                self._run_callback(cb, "on_exit")
 
+            event = self._record(old, new_state)
             self._state = new_state
-            self._history.append((time.time(), old, new_state))
-            if len(self._history) > 100:
-                self._history = self._history[-100:]
+            on_enter = self._on_enter_callbacks[new_state]
 
-            self.logger.info("[StateMachine] %s -> %s", old.name, new_state.name)
+            self.logger.info("[StateMachine] %s -> %s (%.1fs in %s)", old.name, new_state.name,
+                             event["time_in_state_s"], old.name)
 
-        for cb in self._on_enter_callbacks.get(new_state, []):
-            try:
-                cb()
-            except Exception as e:
-                self.logger.error("[StateMachine] on_enter callback error (%s): %s", cb, e)
+        for cb, background in on_enter:
+            if background:
+                self._callback_pool.submit(self._run_callback, cb, "on_enter")
+            else:
+                self._run_callback(cb, "on_enter")
 
         self.state_changed.emit(new_state)
+        self._publish(event)
         return True
 
+    def _record(self, old: AgentState, new: AgentState, forced: bool = False) -> dict:
+        """Chiude la permanenza in `old` (storico + istogramma). Da chiamare con il lock preso."""
+        now = time.monotonic()
+        dwell = now - self._entered_at
+        self._entered_at = now
+        ts = time.time()
+        self._history.append((ts, old, new))
+        entry = self._dwell[old]
+        entry[0][bisect.bisect_left(DWELL_BUCKETS_S, dwell)] += 1
+        entry[1] += dwell
+        entry[2] += 1
+        return {"ts": ts, "old": old.name, "new": new.name, "time_in_state_s": round(dwell, 3), "forced": forced}
+
+    def _publish(self, event: dict):
+        if self.bus is not None:
+            try:
+                self.bus.emit("STATE_CHANGE", event)
+            except Exception as e:
+                self.logger.error("[StateMachine] STATE_CHANGE publish error: %s", e)
+
     def set_state(self, new_state: AgentState):
         if not self.transition(new_state):
             self.force_state(new_state)
@@ -123,10 +188,46 @@ class StateManager(QObject):
     def force_state(self, state: AgentState):
         with self._lock:
             old = self._state
+            # Anche le transizioni forzate chiudono la permanenza: storico e istogramma restano coerenti
+            event = self._record(old, state, forced=True)
             self._state = state
-            self.logger.warning("[StateMachine] FORCED: %s -> %s", old.name, state.name)
+            self.logger.warning("[StateMachine] FORCED: %s -> %s (%.1fs in %s)", old.name, state.name,
+                                event["time_in_state_s"], old.name)
         self.state_changed.emit(state)
+        self._publish(event)
+
+    def shutdown(self):
+        """Chiude il thread delle callback in background (se creato)."""
+        if self._callback_pool is not None:
+            self._callback_pool.shutdown(wait=False)
 
     def get_history(self, last_n: int = 20) -> list:
+        # Copia della deque: atomica rispetto alle append (GIL), nessun lock
+        history = list(self._history)
+        return history[-last_n:] if last_n else history
+
+    def dwell_stats(self, include_current: bool = True) -> dict:
+        """Per stato: permanenze, secondi totali/medi e istogramma {"<=Xs": n, ">3600s": n}.
+
+        Con include_current la permanenza in corso è conteggiata nei secondi totali.
+        """
+        with self._lock:
+            snapshot = {s: (list(b), total, count) for s, (b, total, count) in self._dwell.items()}
+            current, elapsed = self._state, time.monotonic() - self._entered_at
+        out = {}
+        for s, (buckets, total, count) in snapshot.items():
+            if include_current and s is current:
+                total += elapsed
+            if not count and not total:
+                continue
+            hist = {f"<={b:g}s": n for b, n in zip(DWELL_BUCKETS_S, buckets)}
+            hist[f">{DWELL_BUCKETS_S[-1]:g}s"] = buckets[-1]
+            out[s.name] = {"count": count, "total_s": round(total, 3),
+                           "avg_s": round(total / count, 3) if count else None, "histogram": hist}
+        return out
+
+    def reset_dwell(self):
+        """Azzera l'istogramma (es. a inizio giornata); lo stato corrente riparte da adesso."""
         with self._lock:
-            return list(self._history[-last_n:])
\ No newline at end of file
+            self._dwell = {s: [[0] * (len(DWELL_BUCKETS_S) + 1), 0.0, 0] for s in AgentState}
+            self._entered_at = time.monotonic()
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Tracing — Lightweight per-signal latency traces.
+
+    with tracer.trace("process_signal", teams=teams):
+        with tracer.span("executor.find_odds"):
+            ...
+
+A trace gets a short trace ID; spans are timed with perf_counter_ns and
+nest through a thread-local stack, so executor and DB calls made inside an
+engine step appear as its children. Spans opened on a thread with no
+active trace cost one attribute lookup and record nothing. Work handed to
+another thread joins the trace with `tracer.activate(trace)`.
+
+`traced(name)` decorates a function so each call is a span (used on the
+Database methods).
+
+Completed traces are kept in a ring buffer (last N) and can be exported as
+plain JSON or in Chrome trace-event format (chrome://tracing, Perfetto).
+"""
+import os
+import json
+import time
+import uuid
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "attrs", "start_ns", "end_ns", "wall_ts", "spans", "_lock", "_seq")
+
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.wall_ts = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def next_id(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        end = self.end_ns or time.perf_counter_ns()
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "ts": self.wall_ts,
+            "duration_ms": round((end - self.start_ns) / 1e6, 3),
+            "spans": [
+                {
+                    "id": s["id"], "parent": s["parent"], "name": s["name"], "thread": s["thread"],
+                    "start_ms": round((s["start_ns"] - self.start_ns) / 1e6, 3),
+                    "duration_ms": round((s["end_ns"] - s["start_ns"]) / 1e6, 3),
+                    "error": s["error"], "attrs": s["attrs"],
+                }
+                for s in sorted(self.spans, key=lambda s: s["start_ns"])
+            ],
+        }
+
+
+class Tracer:
+    DEFAULT_CAPACITY = 200
+
+    def __init__(self, capacity=None):
+        self.enabled = True
+        self._traces = deque(maxlen=int(capacity or self.DEFAULT_CAPACITY))
+        self._buf_lock = threading.Lock()
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------
+    #  Context
+    # ------------------------------------------------------------------
+    def current(self):
+        """Trace attiva sul thread corrente (None se assente)."""
+        return getattr(self._local, "trace", None)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def trace(self, name, **attrs):
+        if not self.enabled or self.current() is not None:
+            # Trace annidata: diventa uno span della trace già attiva
+            with self.span(name, **attrs) as s:
+                yield s
+            return
+        tr = Trace(name, attrs)
+        self._local.trace = tr
+        self._local.stack = []
+        try:
+            yield tr
+        finally:
+            tr.end_ns = time.perf_counter_ns()
+            self._local.trace = None
+            self._local.stack = []
+            with self._buf_lock:
+                self._traces.append(tr)
+
+    @contextmanager
+    def activate(self, trace, parent=None):
+        """Fa proseguire `trace` su un altro thread (es. lavoro in parallelo alla navigazione)."""
+        prev_trace = self.current()
+        prev_stack = getattr(self._local, "stack", None)
+        self._local.trace = trace
+        self._local.stack = [parent] if parent else []
+        try:
+            yield trace
+        finally:
+            self._local.trace = prev_trace
+            self._local.stack = prev_stack if prev_stack is not None else []
+
+    @contextmanager
+    def span(self, name, **attrs):
+        tr = self.current()
+        if tr is None:
+            yield None
+            return
+        stack = self._stack()
+        span = {"id": tr.next_id(), "parent": stack[-1] if stack else None, "name": name,
+                "thread": threading.current_thread().name, "attrs": attrs, "error": None,
+                "start_ns": time.perf_counter_ns(), "end_ns": None}
+        stack.append(span["id"])
+        try:
+            yield span
+        except BaseException as exc:
+            span["error"] = f"{type(exc).__name__}: {exc}"[:200]
+            raise
+        finally:
+            span["end_ns"] = time.perf_counter_ns()
+            if stack and stack[-1] == span["id"]:
+                stack.pop()
+            tr.add(span)
+
+    def record(self, name, duration_ms, ok=True, **attrs):
+        """Registra uno span già misurato altrove che termina adesso (es. attese del DomWaiter)."""
+        tr = self.current()
+        if tr is None:
+            return
+        stack = self._stack()
+        end = time.perf_counter_ns()
+        tr.add({"id": tr.next_id(), "parent": stack[-1] if stack else None, "name": name,
+                "thread": threading.current_thread().name, "attrs": attrs,
+                "error": None if ok else "timeout",
+                "start_ns": end - int(duration_ms * 1e6), "end_ns": end})
+
+    # ------------------------------------------------------------------
+    #  Buffer & export
+    # ------------------------------------------------------------------
+    def traces(self, last_n=None) -> list:
+        with self._buf_lock:
+            items = list(self._traces)
+        if last_n:
+            items = items[-last_n:]
+        return [t.to_dict() for t in items]
+
+    def summary(self) -> dict:
+        """Per nome span: count, media, p95 e max (ms) sulle trace nel buffer."""
+        durations = {}
+        for t in self.traces():
+            durations.setdefault(t["name"], []).append(t["duration_ms"])
+            for s in t["spans"]:
+                durations.setdefault(s["name"], []).append(s["duration_ms"])
+        out = {}
+        for name, values in durations.items():
+            values.sort()
+            out[name] = {
+                "count": len(values),
+                "avg_ms": round(sum(values) / len(values), 3),
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return out
+
+    def export_json(self, path="logs/traces.json", last_n=None) -> str:
+        return self._write(path, self.traces(last_n))
+
+    def export_chrome(self, path="logs/traces_chrome.json", last_n=None) -> str:
+        """Formato Chrome trace-event: una trace per 'pid', thread come 'tid'."""
+        events = []
+        for pid, t in enumerate(self.traces(last_n), start=1):
+            base_us = t["ts"] * 1e6
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+                           "args": {"name": f"{t['name']} {t['trace_id']}"}})
+            events.append({"ph": "X", "name": t["name"], "pid": pid, "tid": "trace", "ts": base_us,
+                           "dur": t["duration_ms"] * 1000, "args": dict(t["attrs"], trace_id=t["trace_id"])})
+            for s in t["spans"]:
+                args = dict(s["attrs"])
+                if s["error"]:
+                    args["error"] = s["error"]
+                events.append({"ph": "X", "name": s["name"], "pid": pid, "tid": s["thread"],
+                               "ts": base_us + s["start_ms"] * 1000, "dur": s["duration_ms"] * 1000,
+                               "args": args})
+        return self._write(path, {"traceEvents": events, "displayTimeUnit": "ms"})
+
+    @staticmethod
+    def _write(path, data) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+        return path
+
+    def clear(self):
+        with self._buf_lock:
+            self._traces.clear()
+
+
+tracer = Tracer()
+
+
+def traced(name):
+    """Decoratore: esegue la funzione dentro uno span `name` (no-op fuori da una trace)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if tracer.current() is None:
+                return fn(*args, **kwargs)
+            with tracer.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -9,6 +9,7 @@ from ui.desktop_app import run_app
 # Core imports
 from core.controller import SuperAgentController
 from core.ai_trainer import AITrainerEngine
+from core.ai_backends import build_backend
 from core.health import HealthMonitor
 from core.lifecycle import SystemWatchdog
 from core.command_parser import CommandParser
@@ -35,7 +36,7 @@ def main():
         controller = SuperAgentController(logger)
         executor = controller.worker.executor
         
-        trainer = AITrainerEngine(logger=logger)
+        trainer = AITrainerEngine(vision_learner=build_backend(controller.config, logger), logger=logger)
         trainer.set_executor(executor)
         
         monitor = HealthMonitor(logger, executor)
@@ -0,0 +1,44 @@
+import sys
+import os
+
+# 🔴 FIX PATH ASSOLUTO PER GITHUB ACTIONS
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+sys.path.insert(0, ROOT)
+
+import time
+
+from core.bankroll_sim import BankrollSimulator, SyntheticSource, JournalSource
+from core.staking import FixedStake, PercentageStake, KellyStake, ProgressionStake
+
+PATHS = 100_000
+BETS = 300
+SOURCE = SyntheticSource(odds_low=1.6, odds_high=2.4, edge=0.02)
+
+
+def run(strategy, processes=1):
+    sim = BankrollSimulator(strategy, bankroll=1000.0, seed=42)
+    r = sim.run(SOURCE, n_paths=PATHS, n_bets=BETS, processes=processes)
+    print(f"{strategy.name:<12} proc={processes} {r['seconds']:>6.2f}s | rovina {r['ruin_probability']:>7.2%} | "
+          f"DD p50 {r['max_drawdown']['p50']:>6.1%} p95 {r['max_drawdown']['p95']:>6.1%} | "
+          f"finale p5/p50/p95 {r['final']['p5']:.0f}/{r['final']['p50']:.0f}/{r['final']['p95']:.0f}")
+    return r
+
+
+if __name__ == "__main__":
+    print(f"Monte Carlo bankroll: {PATHS} percorsi x {BETS} scommesse (quote 1.6-2.4, edge 2%)")
+    for strategy in (PercentageStake(), FixedStake(10.0), KellyStake(), ProgressionStake()):
+        run(strategy)
+
+    # Stessi seed per blocco: il risultato in multiprocessing deve coincidere con quello seriale
+    single = run(ProgressionStake(), processes=1)
+    multi = run(ProgressionStake(), processes=4)
+    same = single["final"] == multi["final"] and single["ruin_probability"] == multi["ruin_probability"]
+    print(f"Multiprocessing coerente con seriale: {'OK' if same else 'DIVERSO'}")
+
+    # Bootstrap da uno storico finto (in produzione: JournalSource.from_db(db))
+    hist = SyntheticSource(1.5, 3.0, 0.0).sample(__import__("numpy").random.default_rng(7), 1, 2000)
+    journal = JournalSource(hist[0][0], hist[1][0])
+    print(f"Storico bootstrap: {journal.stats()}")
+    t = time.perf_counter()
+    r = BankrollSimulator(PercentageStake(), seed=1).run(journal, n_paths=PATHS, n_bets=BETS)
+    print(f"Bootstrap journal: rovina {r['ruin_probability']:.2%} in {time.perf_counter() - t:.2f}s")
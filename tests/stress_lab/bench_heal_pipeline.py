@@ -0,0 +1,91 @@
+import sys
+import os
+
+# 🔴 FIX PATH ASSOLUTO PER GITHUB ACTIONS
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+sys.path.insert(0, ROOT)
+
+import logging
+import tempfile
+import time
+
+from core.ai_trainer import AITrainerEngine
+from core.ai_backends import LocalRuleBackend, RecordReplayBackend
+
+ROUNDS = 50
+
+# Pagina finta con schedina aperta: ~300 quote + controlli della schedina
+PAGE_HTML = "<html><head><script>var x=1;</script></head><body>" + "".join(
+    f'<div class="gl-Participant"><span class="gl-Participant_Name">Team {i}</span>'
+    f'<span class="gl-Participant_Odds">{1.5 + i / 100:.2f}</span></div>' for i in range(300)
+) + ('<div class="bs-BetSlip"><input class="bss-StakeBox_StakeValueInput" placeholder="Importo">'
+     '<button class="bsf-PlaceBetButton"><span>Scommetti</span></button></div></body></html>')
+
+CASES = [
+    ("button.bsf-OldPlaceBet", "Pulsante Piazza Scommessa", "button.bsf-PlaceBetButton"),
+    ("input.bss-OldStake", "Campo importo puntata", "input.bss-StakeBox_StakeValueInput"),
+]
+
+
+class _Locator:
+    def count(self):
+        return 1
+
+
+class _Page:
+    def locator(self, selector):
+        return _Locator()
+
+    def evaluate(self, script, arg=None):
+        return {"hash": "bench"}
+
+
+class _Executor:
+    page = _Page()
+
+    def get_dom_snapshot(self):
+        return PAGE_HTML
+
+    def take_screenshot_b64(self):
+        return ""
+
+
+def make_trainer(backend, cache_dir):
+    trainer = AITrainerEngine(vision_learner=backend, logger=logging.getLogger("bench"))
+    trainer._heal_cache_file = os.path.join(cache_dir, "heal_cache.json")
+    trainer._heal_cache = {}
+    trainer.set_executor(_Executor())
+    return trainer
+
+
+def bench(label, trainer, use_cache):
+    timings = []
+    errors = 0
+    for _ in range(ROUNDS):
+        for broken, description, expected in CASES:
+            if not use_cache:
+                trainer._heal_cache = {}
+            t0 = time.perf_counter()
+            result = trainer.heal_selector(broken, description)
+            timings.append((time.perf_counter() - t0) * 1000)
+            if result != expected:
+                errors += 1
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"{label:<22} p50 {p50:7.2f} ms | p95 {p95:7.2f} ms | errori {errors}")
+    return errors
+
+
+def run_bench():
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = os.path.join(tmp, "recordings")
+        errors = bench("local (no cache)", make_trainer(LocalRuleBackend(), tmp), use_cache=False)
+        errors += bench("record (no cache)", make_trainer(RecordReplayBackend(LocalRuleBackend(), recordings), tmp), use_cache=False)
+        errors += bench("replay (no cache)", make_trainer(RecordReplayBackend(None, recordings, "replay"), tmp), use_cache=False)
+        errors += bench("local + heal cache", make_trainer(LocalRuleBackend(), tmp), use_cache=True)
+    return errors
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run_bench() else 0)
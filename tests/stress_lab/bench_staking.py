@@ -0,0 +1,212 @@
+import sys
+import os
+
+# 🔴 FIX PATH ASSOLUTO PER GITHUB ACTIONS
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+sys.path.insert(0, ROOT)
+
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import core.database as database
+from core.money_management import MoneyManager
+from core.staking import (FixedStake, PercentageStake, KellyStake, ProgressionStake,
+                          strategy_from_config, simulate)
+
+ROUNDS = 5
+# Robot come arrivano dal controller (payload["robot"])
+ROBOT_PROGRESSION = {"name": "R_prog", "mm_mode": "Roserpina (Progressione)", "stake_value": 10, "max_steps": 4}
+ROBOT_FIXED = {"name": "R_fixed", "mm_mode": "Fisso (€)", "stake_value": 7}
+# Robot creato dal tab Robot: solo "stake" (stringa dal QLineEdit)
+ROBOT_UI = {"name": "R_ui", "stake": "3.5"}
+
+failures = []
+
+
+def check(label, ok, detail=""):
+    print(f"{'✅' if ok else '❌'} {label}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(label)
+
+
+def open_db(path):
+    """Database del progetto su un file temporaneo (DB_PATH letto alla connessione)."""
+    database.DB_PATH = path
+    return database.Database()
+
+
+def bet(mm, robot, odds, won):
+    stake = mm.get_stake(odds, robot=robot)
+    tx = mm.reserve(stake, robot=robot, odds=odds)
+    if won:
+        mm.win(tx, round(stake * odds, 2))
+    else:
+        mm.loss(tx)
+    return stake
+
+
+def check_strategies():
+    print("--- stake per strategia ---")
+    fixed = FixedStake(10)
+    check("fisso: 10€ a bankroll pieno", fixed.stake(1000, 2.0, {}) == 10)
+    check("fisso: mai oltre il bankroll", fixed.stake(4, 2.0, {}) == 4)
+    pct = PercentageStake()
+    check("percentuale: 5% del bankroll", pct.stake(400, 2.0, {}) == 20)
+    check("percentuale: tetto 50€", pct.stake(2000, 2.0, {}) == 50)
+    kelly = KellyStake(fraction=0.25, edge=0.03)
+    check("kelly: 1000 x 0.25 x 0.03 / (2.0 - 1)", kelly.stake(1000, 2.0, {}) == 7.5)
+    check("kelly: quota <= 1 → nessuna puntata", kelly.stake(1000, 1.0, {}) == 0.0)
+
+    prog = ProgressionStake(unit=10, ref_odds=2.0, max_steps=4)
+    state = prog.initial_state(1000)
+    stakes = []
+    for _ in range(4):
+        stakes.append(prog.stake(1000, 2.0, state))
+        state = prog.update(state, False, 1000)
+    check("progressione: 10/20/40/80 sulle perdite", stakes == [10, 20, 40, 80], stakes)
+    check("progressione: stop loss dopo max_steps perdite", state["step"] == 0)
+    state = prog.update(prog.update(prog.initial_state(1000), False, 1000), True, 1000)
+    check("progressione: la vincita chiude il ciclo", state["step"] == 0 and prog.stake(1000, 2.0, state) == 10)
+    # Ogni step vinto a ref_odds recupera il ciclo e guadagna (ref_odds - 1) unità
+    for ref_odds in (2.0, 3.0):
+        prog = ProgressionStake(unit=10, ref_odds=ref_odds, max_steps=4)
+        state = prog.initial_state(1000)
+        lost = 0.0
+        ok = True
+        for _ in range(4):
+            s = prog.stake(1000, ref_odds, state)
+            ok &= abs(s * (ref_odds - 1) - lost - 10 * (ref_odds - 1)) < 0.05
+            lost += s
+            state = prog.update(state, False, 1000)
+        check(f"progressione a quota {ref_odds}: ogni vincita netta = +{ref_odds - 1:g} unità", ok)
+
+    check("mapping mm_mode → strategia",
+          isinstance(strategy_from_config(ROBOT_FIXED), FixedStake)
+          and isinstance(strategy_from_config(ROBOT_PROGRESSION), ProgressionStake)
+          and isinstance(strategy_from_config({"mm_mode": "Percentuale (%)", "stake_value": 3}), PercentageStake))
+    check("fisso senza stake_value → percentuale standard",
+          isinstance(strategy_from_config({"name": "x", "mm_mode": "Fisso (€)"}), PercentageStake))
+    ui = strategy_from_config(ROBOT_UI)
+    check("robot del tab Robot: stake → fisso", isinstance(ui, FixedStake) and ui.amount == 3.5)
+    check("stake non numerico → percentuale standard",
+          isinstance(strategy_from_config({"name": "x", "stake": "abc"}), PercentageStake))
+
+
+def check_money_manager(tmp):
+    print("--- MoneyManager su DB temporaneo ---")
+    path = os.path.join(tmp, "money.sqlite")
+    db = open_db(path)
+    mm = MoneyManager(db)
+    stakes = [bet(mm, ROBOT_PROGRESSION, 2.0, False) for _ in range(2)]
+    check("progressione avanzata dal settlement", stakes == [10, 20], stakes)
+    pending_stake = mm.get_stake(2.0, robot=ROBOT_PROGRESSION)
+    tx = mm.reserve(pending_stake, robot=ROBOT_PROGRESSION, odds=2.0)
+    db.close()
+
+    # Riavvio: stesso file, processo "nuovo"
+    db = open_db(path)
+    mm = MoneyManager(db)
+    tx_row = db.get_tx(tx)
+    check("journal con robot e quota", tx_row["robot"] == "R_prog" and tx_row["odds"] == 2.0)
+    check("stato ripreso dopo il riavvio", mm.get_stake(2.0, robot=ROBOT_PROGRESSION) == 40 == pending_stake)
+    db.close()
+
+    # Settlement dopo un riavvio senza get_stake: strategia ricostruita dallo stato salvato
+    db = open_db(path)
+    mm = MoneyManager(db)
+    mm.loss(tx)
+    check("settlement dopo riavvio avanza lo step", db.get_staking_state("R_prog")["state"]["step"] == 3)
+    check("stop loss al 4° ko", bet(mm, ROBOT_PROGRESSION, 2.0, False) == 80
+          and mm.get_stake(2.0, robot=ROBOT_PROGRESSION) == 10)
+
+    changed = dict(ROBOT_PROGRESSION, stake_value=5)
+    bet(mm, ROBOT_PROGRESSION, 2.0, False)
+    mm2 = MoneyManager(db)
+    check("config del robot cambiata → stato ripartito", mm2.get_stake(2.0, robot=changed) == 5)
+    bet(mm, ROBOT_PROGRESSION, 2.0, False)
+    check("config cambiata senza riavvio → stato ripartito", mm.get_stake(2.0, robot=changed) == 5)
+    check("stake del tab Robot applicato", mm.get_stake(2.0, robot=ROBOT_UI) == 3.5)
+
+    fixed = [bet(mm, ROBOT_FIXED, 1.8, i % 3 == 0) for i in range(6)]
+    check("fisso: stesso stake su vincite e perdite", fixed == [7] * 6, fixed)
+    br = mm.bankroll()
+    check("senza robot: 5% del bankroll, max 50", mm.get_stake(2.0) == round(min(br * 0.05, 50), 2))
+    db.close()
+
+
+def check_migration(tmp):
+    print("--- migrazione journal ---")
+    path = os.path.join(tmp, "legacy.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE journal (id INTEGER PRIMARY KEY AUTOINCREMENT, tx_id TEXT UNIQUE, amount REAL, "
+                 "status TEXT, payout REAL DEFAULT 0, timestamp INTEGER)")
+    conn.execute("INSERT INTO journal (tx_id, amount, status, timestamp) VALUES ('old', 10, 'PENDING', 1)")
+    conn.commit()
+    conn.close()
+
+    db = open_db(path)
+    cols = {row["name"] for row in db.conn.execute("PRAGMA table_info(journal)")}
+    check("ALTER TABLE: colonne robot e odds aggiunte", {"robot", "odds"} <= cols)
+    old = db.get_tx("old")
+    check("riga pre-migrazione intatta", old["amount"] == 10 and old["robot"] is None)
+
+    mm = MoneyManager(db)
+    mm.loss("old")
+    check("settlement di una bet senza robot", db.get_tx("old")["status"] == "SETTLED")
+    bet(mm, ROBOT_PROGRESSION, 2.0, False)
+    bet(mm, ROBOT_PROGRESSION, 2.0, True)
+    check("settlement su DB migrato: vincita chiude il ciclo",
+          db.get_staking_state("R_prog")["state"]["step"] == 0
+          and [r["robot"] for r in db.history()] == [None, "R_prog", "R_prog"])
+    db.close()
+    # Seconda apertura: la migrazione non si ripete (un ALTER doppio solleverebbe)
+    db = open_db(path)
+    names = [row["name"] for row in db.conn.execute("PRAGMA table_info(journal)")]
+    check("migrazione idempotente", names.count("robot") == 1 and names.count("odds") == 1)
+    db.close()
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def check_simulate():
+    print("--- simulate() ---")
+    rng = np.random.default_rng(47)
+    strategies = (FixedStake(10), PercentageStake(), KellyStake(), ProgressionStake(unit_pct=0.01, max_steps=6))
+
+    odds = rng.uniform(1.5, 2.5, 5000)
+    won = rng.random(5000) < 1.0 / odds
+    for strategy in strategies:
+        secs, single = best_of(lambda: simulate(strategy, odds, won))
+        print(f"1 storico x 5000 bet (scalare) {strategy.name:<12} {secs * 1000:6.1f} ms")
+    check("curva di un solo storico", single["bankroll"].shape == (1, 5001))
+
+    odds = rng.uniform(1.5, 2.5, (2000, 1000))
+    won = rng.random((2000, 1000)) < 1.0 / odds
+    for strategy in strategies:
+        secs, multi = best_of(lambda: simulate(strategy, odds, won))
+        print(f"2000 percorsi x 1000 bet (vettoriale) {strategy.name:<12} {secs:5.2f} s")
+
+    # Stesse regole nei due percorsi di calcolo (ultima strategia: la progressione)
+    one = simulate(strategy, odds[3], won[3])
+    check("scalare e vettoriale coincidono", np.allclose(one["bankroll"][0], multi["bankroll"][3])
+          and np.allclose(one["stakes"][0], multi["stakes"][3]))
+
+
+if __name__ == "__main__":
+    check_strategies()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_money_manager(tmp)
+        check_migration(tmp)
+    check_simulate()
+    print(f"\n{'OK' if not failures else f'{len(failures)} controlli falliti'}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,142 @@
+import sys
+import os
+
+# 🔴 FIX PATH ASSOLUTO PER GITHUB ACTIONS
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+sys.path.insert(0, ROOT)
+
+import logging
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from core.resource_policy import ResourcePolicy
+
+try:
+    from playwright.sync_api import sync_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+# Sito statico di prova: una pagina con immagine, font, script/css cachabili,
+# un tracker (bloccato per pattern) e una chiamata fetch che non deve passare dal route
+FILES = {
+    "index.html": (
+        "<html><head><link rel='stylesheet' href='/static/app.css'>"
+        "<script src='/static/app.js'></script>"
+        "<script src='/tracker/pixel.js'></script></head>"
+        "<body><img src='/static/logo.png'><div id='out'>...</div>"
+        "<script>fetch('/api/data.json').then(r => r.json()).then(d => out.textContent = d.ok)</script>"
+        "</body></html>"
+    ),
+    "static/app.css": "@font-face{font-family:F;src:url(/static/font.woff2)} body{font-family:F}",
+    "static/app.js": "window.APP = " + "1;" * 20000,
+    "static/logo.png": "\x89PNG" + "x" * 50000,
+    "static/font.woff2": "wOF2" + "x" * 30000,
+    "tracker/pixel.js": "window.TRACKED = true;",
+    "api/data.json": '{"ok": "yes"}',
+}
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    served = []
+
+    def end_headers(self):
+        if self.path.startswith("/static/"):
+            self.send_header("Cache-Control", "public, max-age=3600")
+        super().end_headers()
+
+    def do_GET(self):
+        _Handler.served.append(self.path.split("?")[0])
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(root):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_site(root):
+    for rel, content in FILES.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="latin-1") as f:
+            f.write(content)
+
+
+def visit(browser, policy, url):
+    context = browser.new_context()
+    policy.install(context)
+    page = context.new_page()
+    page.goto(url)
+    page.wait_for_function("document.getElementById('out').textContent === 'yes'")
+    report = policy.report(page)
+    page.close()
+    context.close()
+    return report
+
+
+def run_check():
+    if not PLAYWRIGHT_AVAILABLE:
+        print("⚠️ Playwright non installato: check saltato")
+        return 0
+
+    failures = []
+
+    def check(label, ok):
+        print(f"{'✅' if ok else '❌'} {label}")
+        if not ok:
+            failures.append(label)
+
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as cache:
+        write_site(site)
+        server = start_server(site)
+        url = f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+        policy = ResourcePolicy(block_patterns=("/tracker/",), cache_dir=cache,
+                                logger=logging.getLogger("check"))
+        # URL che arrivano al route handler (path relativo al sito)
+        routed = []
+        handle = policy._handle
+
+        def spy(route, request):
+            routed.append(request.url.split("/", 3)[-1])
+            handle(route, request)
+
+        policy._handle = spy
+
+        with sync_playwright() as pw:
+            browser = pw.chromium.launch(headless=True)
+            first = visit(browser, policy, url)
+            # Secondo contesto = browser riciclato: script e css dalla cache su disco
+            second = visit(browser, policy, url)
+            browser.close()
+        server.shutdown()
+
+    print(f"1ª visita: {first}")
+    print(f"2ª visita: {second}")
+    served = _Handler.served
+    check("immagine, font e tracker mai scaricati",
+          not {"/static/logo.png", "/static/font.woff2", "/tracker/pixel.js"} & set(served))
+    check("bloccati per tipo e per pattern",
+          first["blocked"].get("image") == 1 and first["blocked"].get("font") == 1
+          and first["blocked"].get("script") == 1)
+    check("byte risparmiati stimati > 0", first["bytes_saved_est"] > 0)
+    check("1ª visita: script e css scaricati e messi in cache",
+          first["bytes_fetched"] > 0 and first["cache_hits"] == 0)
+    check("2ª visita: script e css serviti dalla cache",
+          second["cache_hits"] == 2 and second["bytes_fetched"] == 0
+          and served.count("/static/app.js") == 1 and served.count("/static/app.css") == 1)
+    check("documento e fetch API fuori dal route handler",
+          not any(u.startswith(("index.html", "api/")) for u in routed) and served.count("/api/data.json") == 2)
+    check("statistiche delle pagine chiuse eliminate", policy.report() == [])
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run_check())